@@ -0,0 +1,316 @@
+"""
+Local stand-in for GraphDB, for load tests without a real triple store.
+
+    python benchmarks/fake_graphdb.py --port 7300 --concepts 5000 --latency-ms 20 --error-rate 0.01
+
+Serves the query endpoint (/repositories/<repo>) and the statements endpoint
+(/repositories/<repo>/statements) the app talks to. The hierarchy SELECT returns realistic
+bindings for a synthetic taxonomy (labels and definitions in several languages, GROUP_CONCAT
+format), CONSTRUCT returns the same taxonomy as Turtle or N-Triples, ASK answers "exists, no
+cycle". Updates, uploads and RDF4J transactions are accepted and discarded, so the data does not
+drift between runs; only the write-revision marker used for read-your-writes routing is kept.
+GET /fake/stats returns request counters and that revision.
+
+Read replicas for routing tests: start more instances with --replica-of pointing at the first one;
+they copy its revision after --replication-lag-ms.
+
+    python benchmarks/fake_graphdb.py --port 7301 --replica-of http://127.0.0.1:7300 --replication-lag-ms 500
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NAMESPACE = "http://example.org/taxonomy/"
+REVISION_PREDICATE = "urn:x-taxonomy:revision"
+REVISION_VALUE = re.compile(r"INSERT\s*\{[^}]*" + re.escape(REVISION_PREDICATE) + r">\s*(\d+)")
+LANGUAGES = ("uk", "en", "de")
+
+
+def concept_uri(index: int) -> str:
+    return f"{NAMESPACE}Concept{index}"
+
+
+def parent_index(index: int, fan_out: int):
+    """Concepts form a complete fan_out-ary tree; every 50th concept starts a new root."""
+    if index == 0 or index % 50 == 0:
+        return None
+    return (index - 1) // fan_out
+
+
+class SyntheticTaxonomy:
+    def __init__(self, concepts: int, fan_out: int, languages: int):
+        self.concepts = concepts
+        self.fan_out = fan_out
+        self.languages = LANGUAGES[:max(1, languages)]
+        self._hierarchy_json = None
+        self._turtle = None
+        self._ntriples = None
+
+    def literals(self, index: int, kind: str) -> str:
+        if kind == "label":
+            values = [f"Concept {index} {lang}|{lang}" for lang in self.languages]
+        else:
+            values = [f"Definition of concept {index}, a synthetic node used for load tests|{lang}"
+                      for lang in self.languages[:1]]
+        return "||".join(values)
+
+    def children(self):
+        children = {}
+        for index in range(self.concepts):
+            parent = parent_index(index, self.fan_out)
+            if parent is not None and parent < self.concepts:
+                children.setdefault(parent, []).append(index)
+        return children
+
+    def hierarchy_json(self) -> bytes:
+        """Bindings shaped like get_taxonomy_hierarchy_query results: one row per edge, one per leaf."""
+        if self._hierarchy_json is None:
+            variables = ["class", "classLabelsInfo", "classCommentsInfo",
+                         "subClass", "subClassLabelsInfo", "subClassCommentsInfo"]
+            children = self.children()
+            bindings = []
+            for index in range(self.concepts):
+                row = {
+                    "class": {"type": "uri", "value": concept_uri(index)},
+                    "classLabelsInfo": {"type": "literal", "value": self.literals(index, "label")},
+                    "classCommentsInfo": {"type": "literal", "value": self.literals(index, "definition")},
+                }
+                if index not in children:
+                    bindings.append(row)
+                for child in children.get(index, ()):
+                    bindings.append({
+                        **row,
+                        "subClass": {"type": "uri", "value": concept_uri(child)},
+                        "subClassLabelsInfo": {"type": "literal", "value": self.literals(child, "label")},
+                        "subClassCommentsInfo": {"type": "literal", "value": self.literals(child, "definition")},
+                    })
+            self._hierarchy_json = json.dumps({"head": {"vars": variables},
+                                               "results": {"bindings": bindings}}).encode("utf-8")
+        return self._hierarchy_json
+
+    def _triples(self):
+        rdf_type = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+        rdfs = "http://www.w3.org/2000/01/rdf-schema#"
+        for index in range(self.concepts):
+            subject = f"<{concept_uri(index)}>"
+            yield f"{subject} {rdf_type} <{rdfs}Class> ."
+            parent = parent_index(index, self.fan_out)
+            if parent is not None:
+                yield f"{subject} <{rdfs}subClassOf> <{concept_uri(parent)}> ."
+            for kind, predicate in (("label", "label"), ("definition", "comment")):
+                for literal in self.literals(index, kind).split("||"):
+                    value, lang = literal.rsplit("|", 1)
+                    yield f'{subject} <{rdfs}{predicate}> "{value}"@{lang} .'
+
+    def ntriples(self) -> bytes:
+        if self._ntriples is None:
+            self._ntriples = ("\n".join(self._triples()) + "\n").encode("utf-8")
+        return self._ntriples
+
+    def turtle(self) -> bytes:
+        # N-Triples is valid Turtle
+        if self._turtle is None:
+            self._turtle = b"@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n" + self.ntriples()
+        return self._turtle
+
+
+class FakeGraphDBHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGraphDB/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _count(self, key: str):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _simulate(self) -> bool:
+        """Applies latency; returns False (after sending a 503) for an injected error."""
+        config = self.server.config
+        delay = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        if delay:
+            time.sleep(delay)
+        if random.random() < config.error_rate:
+            self._count("injected_errors")
+            self._send(503, b"Injected failure")
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/fake/stats":
+            with self.server.stats_lock:
+                body = json.dumps({**self.server.stats, "revision": self.server.revision}).encode("utf-8")
+            return self._send(200, body, "application/json")
+        query = parse_qs(url.query).get("query", [None])[0]
+        self._dispatch(url.path, query, None, b"")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._read_body()
+        content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip()
+        query = None
+        if content_type == "application/x-www-form-urlencoded":
+            form = parse_qs(body.decode("utf-8"))
+            query = (form.get("query") or form.get("update") or [None])[0]
+        elif content_type in ("application/sparql-query", "application/sparql-update"):
+            query = body.decode("utf-8")
+        self._dispatch(url.path, query, content_type, body)
+
+    def do_PUT(self):
+        """Transaction actions (?action=ADD|UPDATE|COMMIT|...)."""
+        url = urlparse(self.path)
+        body = self._read_body()
+        if not url.path.startswith(f"/repositories/{self.server.config.repository}/transactions/"):
+            return self._send(404, b"Unknown transaction")
+        action = parse_qs(url.query).get("action", [""])[0].upper()
+        self._count(f"transaction_{action.lower() or 'unknown'}")
+        if self._simulate():
+            if action == "UPDATE":
+                self._record_marker(body.decode("utf-8", errors="replace"))
+            self._send(200)
+
+    def do_DELETE(self):
+        self._count("transaction_rollback")
+        self._send(204)
+
+    def _record_marker(self, update: str):
+        marker = REVISION_VALUE.search(update or "")
+        if marker:
+            with self.server.stats_lock:
+                self.server.revision = max(self.server.revision, int(marker.group(1)))
+
+    def _dispatch(self, path: str, query, content_type, body: bytes):
+        base = f"/repositories/{self.server.config.repository}"
+        if path == f"{base}/transactions":
+            self._count("transaction_begin")
+            if self._simulate():
+                self.send_response(201)
+                self.send_header("Location", f"{base}/transactions/{uuid.uuid4()}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+        elif path == f"{base}/statements":
+            self._count("updates" if content_type == "application/sparql-update" else "uploads")
+            if self._simulate():
+                self._record_marker(query)
+                self._send(204)
+        elif path == base:
+            if not query:
+                return self._send(400, b"Missing query")
+            self._count("queries")
+            if self._simulate():
+                self._answer_query(query)
+        else:
+            self._send(404, b"Unknown repository")
+
+    def _answer_query(self, query: str):
+        taxonomy = self.server.taxonomy
+        accept = self.headers.get("Accept") or ""
+        form = re.sub(r"(?im)^\s*(PREFIX|BASE)\s+\S+\s*<[^>]*>|#[^\n]*", "", query).lstrip().split(None, 1)[0].upper()
+
+        if form == "ASK":
+            # Concepts exist and nothing is a descendant of anything, so moves and merges validate
+            answer = "subClassOf*" not in query and "subClassOf+" not in query
+            return self._send(200, json.dumps({"head": {}, "boolean": answer}).encode(),
+                              "application/sparql-results+json")
+        if REVISION_PREDICATE in query and form == "SELECT":
+            bindings = [{"revision": {"type": "literal", "value": str(self.server.revision),
+                                      "datatype": "http://www.w3.org/2001/XMLSchema#integer"}}]
+            return self._send(200, json.dumps({"head": {"vars": ["revision"]},
+                                               "results": {"bindings": bindings if self.server.revision else []}}
+                                              ).encode(), "application/sparql-results+json")
+        if form in ("CONSTRUCT", "DESCRIBE"):
+            if "n-triples" in accept:
+                return self._send(200, taxonomy.ntriples(), "application/n-triples")
+            return self._send(200, taxonomy.turtle(), "text/turtle")
+        if "classLabelsInfo" in query or "?subClass" in query:
+            return self._send(200, taxonomy.hierarchy_json(), "application/sparql-results+json")
+        # Other SELECTs (streamed tree, stats) get an empty result in the requested format
+        variables = re.findall(r"\?(\w+)", query.split("WHERE", 1)[0].split("SELECT", 1)[-1])
+        if "text/csv" in accept:
+            return self._send(200, (",".join(dict.fromkeys(variables)) + "\r\n").encode(), "text/csv")
+        return self._send(200, json.dumps({"head": {"vars": list(dict.fromkeys(variables))},
+                                           "results": {"bindings": []}}).encode(),
+                          "application/sparql-results+json")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Fake GraphDB server for load tests.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7300)
+    parser.add_argument("--repository", default="loadtest")
+    parser.add_argument("--concepts", type=int, default=2000, help="Size of the synthetic taxonomy")
+    parser.add_argument("--fan-out", type=int, default=5)
+    parser.add_argument("--languages", type=int, default=2, help=f"Label languages, up to {len(LANGUAGES)}")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Mean latency added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=3.0, help="Standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--replica-of", help="Base URL of another fake instance to copy the write revision from")
+    parser.add_argument("--replication-lag-ms", type=float, default=200.0)
+    return parser
+
+
+def follow_primary(server, primary_url: str, lag_seconds: float):
+    """Replica mode: the revision seen on the primary becomes visible here lag_seconds later."""
+    while True:
+        try:
+            with urllib.request.urlopen(f"{primary_url.rstrip('/')}/fake/stats", timeout=5) as response:
+                revision = json.load(response).get("revision", 0)
+        except (OSError, ValueError):
+            revision = None
+        time.sleep(lag_seconds)
+        if revision is not None:
+            with server.stats_lock:
+                server.revision = max(server.revision, revision)
+
+
+def make_server(config) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((config.host, config.port), FakeGraphDBHandler)
+    server.daemon_threads = True
+    server.config = config
+    server.taxonomy = SyntheticTaxonomy(config.concepts, config.fan_out, config.languages)
+    server.taxonomy.hierarchy_json()
+    server.stats = {}
+    server.revision = 0
+    server.stats_lock = threading.Lock()
+    if config.replica_of:
+        threading.Thread(target=follow_primary, args=(server, config.replica_of, config.replication_lag_ms / 1000),
+                         daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    config = build_parser().parse_args(argv)
+    server = make_server(config)
+    print(f"Fake GraphDB listening on http://{config.host}:{server.server_address[1]}/repositories/"
+          f"{config.repository} ({config.concepts} concepts)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
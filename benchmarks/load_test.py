@@ -0,0 +1,306 @@
+"""
+End-to-end load test: starts the fake GraphDB, runs the app under uvicorn with different
+worker counts and drives a mixed read/write workload against it.
+
+    python -m benchmarks.load_test --workers 1 2 4 --concurrency 32 --duration 30
+    python -m benchmarks.load_test --mix tree=70,label=20,export=10 --latency-ms 40 --error-rate 0.01
+    python -m benchmarks.load_test --replicas 2 --read-your-writes   # read routing across fake replicas
+    python -m benchmarks.load_test --app-url http://127.0.0.1:8000 --duration 60   # an app you started yourself
+
+For every worker count it prints throughput and p50/p95/p99 latency per route; --json writes
+the same numbers to a file so runs can be compared for regressions.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from .fake_graphdb import concept_uri
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_MIX = "tree=50,tree_projected=15,label=20,import=5,export=10"
+
+IMPORT_TTL = """@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ex: <http://example.org/taxonomy/> .
+
+ex:LoadTest{n} a rdfs:Class ;
+    rdfs:label "Load test {n}"@en .
+ex:LoadTest{n}Child a rdfs:Class ;
+    rdfs:subClassOf ex:LoadTest{n} ;
+    rdfs:label "Load test child {n}"@en .
+"""
+
+
+def op_tree(session, base_url, rng, concepts):
+    return "GET /taxonomy-tree", lambda: session.get(f"{base_url}/taxonomy-tree")
+
+
+def op_tree_projected(session, base_url, rng, concepts):
+    return "GET /taxonomy-tree?lang&fields", lambda: session.get(f"{base_url}/taxonomy-tree",
+                                                                 params={"lang": "uk,en", "fields": "title,labels"})
+
+
+def op_label(session, base_url, rng, concepts):
+    # Random mix of label additions and removals on random concepts
+    payload = {"concept_uri": concept_uri(rng.randrange(concepts)),
+               "literal": {"value": f"Edited {rng.randrange(1000)}", "lang": "en"}}
+    route = "/add_concept_label" if rng.random() < 0.5 else "/delete_concept_label"
+    return f"POST {route}", lambda: session.post(f"{base_url}{route}", json=payload)
+
+
+def op_import(session, base_url, rng, concepts):
+    ttl = IMPORT_TTL.format(n=rng.randrange(1_000_000)).encode("utf-8")
+    return "POST /import_taxonomy", lambda: session.post(f"{base_url}/import_taxonomy",
+                                                         files={"file": ("load.ttl", ttl, "text/turtle")})
+
+
+def op_export(session, base_url, rng, concepts):
+    return "GET /export_taxonomy", lambda: session.get(f"{base_url}/export_taxonomy", params={"format": "ttl"})
+
+
+# Each operation picks its request and returns (route label, send); errors are counted under the label
+OPERATIONS = {
+    "tree": op_tree,
+    "tree_projected": op_tree_projected,
+    "label": op_label,
+    "import": op_import,
+    "export": op_export,
+}
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation '{name}'. Known: {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float, process: Optional[subprocess.Popen] = None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{process.args[:3]} exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.exceptions.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def start_fake_graphdb(args, port: int, replica_of: Optional[str] = None) -> subprocess.Popen:
+    command = [sys.executable, os.path.join(BENCHMARKS_DIR, "fake_graphdb.py"), "--port", str(port),
+               "--repository", "loadtest", "--concepts", str(args.concepts), "--fan-out", str(args.fan_out),
+               "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+               "--error-rate", str(args.error_rate)]
+    if replica_of:
+        command += ["--replica-of", replica_of, "--replication-lag-ms", str(args.replication_lag_ms)]
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT)
+    wait_for(f"http://127.0.0.1:{port}/fake/stats", 60, process)
+    return process
+
+
+def repository_url(port: int) -> str:
+    return f"http://127.0.0.1:{port}/repositories/loadtest"
+
+
+def start_app(args, workers: int, port: int, graphdb_ports: List[int], snapshot_dir: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    primary_url = repository_url(graphdb_ports[0])
+    env.update({
+        "GRAPHDB_REPOSITORY": "loadtest",
+        "GRAPHDB_ENDPOINT_QUERY": primary_url,
+        "GRAPHDB_ENDPOINT_STATEMENTS": f"{primary_url}/statements",
+        "GRAPHDB_READ_REPLICAS": ",".join(repository_url(replica_port) for replica_port in graphdb_ports[1:]),
+        "GRAPHDB_READ_YOUR_WRITES": "true" if args.read_your_writes else "false",
+        "TREE_SNAPSHOT_DIR": snapshot_dir,
+        "LLM_PROVIDER": "local",
+    })
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--workers", str(workers), "--log-level", "warning", "--no-access-log"]
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL,
+                               stderr=None if args.verbose else subprocess.DEVNULL)
+    wait_for(f"http://127.0.0.1:{port}/", 60, process)
+    return process
+
+
+def graphdb_counters(ports: List[int]) -> dict:
+    counters = {}
+    for index, port in enumerate(ports):
+        stats = requests.get(f"http://127.0.0.1:{port}/fake/stats").json()
+        stats.pop("revision", None)
+        counters["primary" if index == 0 else f"replica{index}"] = stats
+    return counters
+
+
+def drive(base_url: str, weights: Dict[str, float], concurrency: int, duration: float, warmup: float,
+          concepts: int, seed: int) -> dict:
+    names = list(weights)
+    cumulative = [sum(list(weights.values())[:i + 1]) for i in range(len(names))]
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    lock = threading.Lock()
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def worker(worker_id: int):
+        rng = random.Random(seed + worker_id)
+        session = requests.Session()
+        while True:
+            now = time.monotonic()
+            if now >= stop_at:
+                return
+            name = rng.choices(names, cum_weights=cumulative)[0]
+            route, send = OPERATIONS[name](session, base_url, rng, concepts)
+            began = time.perf_counter()
+            try:
+                failed = send().status_code >= 400
+            except requests.exceptions.RequestException:
+                failed = True
+            elapsed = time.perf_counter() - began
+            if now < measure_from:
+                continue
+            with lock:
+                samples.setdefault(route, []).append(elapsed)
+                if failed:
+                    errors[route] = errors.get(route, 0) + 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    routes = {}
+    for route, latencies in sorted(samples.items()):
+        latencies.sort()
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": errors.get(route, 0),
+            "rps": round(len(latencies) / duration, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        }
+    total = sum(route["requests"] for route in routes.values())
+    return {"rps": round(total / duration, 2), "requests": total,
+            "errors": sum(route["errors"] for route in routes.values()), "routes": routes}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank percentile
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def print_report(label: str, result: dict):
+    print(f"\n== {label}: {result['rps']} req/s, {result['requests']} requests, {result['errors']} errors")
+    print(f"{'route':<34}{'req':>8}{'err':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in result["routes"].items():
+        print(f"{route:<34}{stats['requests']:>8}{stats['errors']:>6}{stats['rps']:>9}"
+              f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write load test against a fake GraphDB.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="uvicorn worker counts to compare")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client threads")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds per worker count")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--concepts", type=int, default=2000, help="Size of the fake taxonomy")
+    parser.add_argument("--fan-out", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Fake GraphDB mean latency")
+    parser.add_argument("--jitter-ms", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake GraphDB share of 503 answers")
+    parser.add_argument("--replicas", type=int, default=0, help="Fake read replicas behind the primary")
+    parser.add_argument("--replication-lag-ms", type=float, default=200.0)
+    parser.add_argument("--read-your-writes", action="store_true",
+                        help="Run the app with GRAPHDB_READ_YOUR_WRITES enabled")
+    parser.add_argument("--app-url", help="Load an already running app instead of starting uvicorn")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's log output")
+    args = parser.parse_args()
+
+    results = {}
+    if args.app_url:
+        result = drive(args.app_url.rstrip("/"), args.mix, args.concurrency, args.duration, args.warmup,
+                       args.concepts, args.seed)
+        print_report(args.app_url, result)
+        results[args.app_url] = result
+    else:
+        graphdb_ports = [free_port() for _ in range(args.replicas + 1)]
+        primary = start_fake_graphdb(args, graphdb_ports[0])
+        graphdbs = [primary]
+        try:
+            for replica_port in graphdb_ports[1:]:
+                graphdbs.append(start_fake_graphdb(args, replica_port, replica_of=f"http://127.0.0.1:{graphdb_ports[0]}"))
+            for workers in args.workers:
+                snapshot_dir = tempfile.mkdtemp(prefix="taxonomy-loadtest-")
+                app_port = free_port()
+                app = start_app(args, workers, app_port, graphdb_ports, snapshot_dir)
+                graphdb_before = graphdb_counters(graphdb_ports)
+                try:
+                    result = drive(f"http://127.0.0.1:{app_port}", args.mix, args.concurrency, args.duration,
+                                   args.warmup, args.concepts, args.seed)
+                finally:
+                    stop(app)
+                    shutil.rmtree(snapshot_dir, ignore_errors=True)
+                # GraphDB calls per endpoint and kind during this run, to spot regressions in backend traffic
+                graphdb_after = graphdb_counters(graphdb_ports)
+                result["graphdb"] = {name: {key: count - graphdb_before[name].get(key, 0) for key, count in stats.items()}
+                                     for name, stats in graphdb_after.items()}
+                print_report(f"{workers} worker(s)", result)
+                for name, stats in result["graphdb"].items():
+                    print(f"  graphdb {name}: " + ", ".join(f"{key}={count}" for key, count in sorted(stats.items())))
+                results[f"workers={workers}"] = result
+        finally:
+            for graphdb in graphdbs:
+                stop(graphdb)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": {key: value for key, value in vars(args).items()
+                                  if key not in ("json", "verbose")},
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Cold-start benchmark: how long importing the app takes and how much memory a fresh worker
+holds afterwards. Every sample runs in a new interpreter, like a freshly spawned uvicorn worker.
+
+    python benchmarks/startup_benchmark.py --runs 10
+
+The "eager-llm" scenario imports google.generativeai before the app, which is what every
+worker paid before the LLM providers were loaded lazily.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+if {eager!r}:
+    import google.generativeai
+import main
+elapsed = time.perf_counter() - start
+rss_kb = 0
+try:
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                rss_kb = int(line.split()[1])
+except OSError:
+    import resource
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"seconds": elapsed, "rss_kb": rss_kb, "modules": len(sys.modules)}}))
+"""
+
+SCENARIOS = {
+    "lazy-llm": False,
+    "eager-llm": True,
+}
+
+
+def run_sample(eager: bool) -> dict:
+    result = subprocess.run([sys.executable, "-c", PROBE.format(eager=eager)], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, env=dict(os.environ))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "probe failed")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure app import time and memory per worker.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", choices=list(SCENARIOS), action="append",
+                        help="Scenario to run (default: all)")
+    args = parser.parse_args()
+
+    for name in args.scenario or SCENARIOS:
+        try:
+            samples = [run_sample(SCENARIOS[name]) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:>10}: skipped ({e})")
+            continue
+        seconds = [sample["seconds"] for sample in samples]
+        rss_mb = [sample["rss_kb"] / 1024 for sample in samples]
+        print(f"{name:>10}: import median {statistics.median(seconds) * 1000:8.1f} ms, "
+              f"min {min(seconds) * 1000:8.1f} ms, RSS median {statistics.median(rss_mb):7.1f} MB, "
+              f"modules {samples[0]['modules']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routers import taxonomy_router
+from routers import taxonomy_router, profiling_router, admin_router
+from utils.rdf_validation import shutdown_validation_pool
+from utils.graphdb_routing import GRAPHDB_READ_YOUR_WRITES, read_your_writes_middleware
+from utils.request_profiling import PROFILING_ENABLED, profiling_middleware
 
 app = FastAPI()
 
@@ -22,8 +25,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if GRAPHDB_READ_YOUR_WRITES:
+    app.middleware("http")(read_your_writes_middleware)
+
+# Profiling and the /admin endpoints need PROFILING_TOKEN; nothing is installed without it
+if PROFILING_ENABLED:
+    app.middleware("http")(profiling_middleware)
+    app.include_router(profiling_router.router)
+    app.include_router(admin_router.router)
+
 app.include_router(taxonomy_router.router)
 
+app.add_event_handler("shutdown", shutdown_validation_pool)
+
 
 @app.get("/")
 async def root():
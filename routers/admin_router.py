@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends
+
+from routers.profiling_router import require_profiling_token
+from utils.graphdb_utils import read_router
+from utils.response_cache import response_cache
+
+# Internal endpoint URLs, revision markers and cache internals; same token as /admin/profiles
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_profiling_token)])
+
+
+@router.get("/graphdb/read_endpoints")
+async def read_endpoints_status():
+    return read_router.status()
+
+
+@router.get("/cache/stats")
+async def response_cache_stats():
+    return response_cache.stats()
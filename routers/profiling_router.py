@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Header, Depends
+from fastapi.responses import FileResponse
+from typing import Optional
+import asyncio
+
+from utils.request_profiling import token_matches, list_profiles, load_profile, raw_profile_path
+
+
+async def require_profiling_token(x_profile: Optional[str] = Header(None)):
+    if not token_matches(x_profile):
+        raise HTTPException(status_code=403, detail="Недійсний токен профілювання")
+
+
+router = APIRouter(prefix="/admin/profiles", dependencies=[Depends(require_profiling_token)])
+
+
+@router.get("")
+async def list_profiles_endpoint():
+    return await asyncio.to_thread(list_profiles)
+
+
+@router.get("/{profile_id}")
+async def read_profile_endpoint(profile_id: str):
+    profile = await asyncio.to_thread(load_profile, profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Профіль '{profile_id}' не знайдено")
+    return profile
+
+
+@router.get("/{profile_id}/raw")
+async def download_profile_endpoint(profile_id: str):
+    """cProfile data for snakeviz / pstats."""
+    path = raw_profile_path(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Профіль '{profile_id}' не знайдено")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Query
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query, Header, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from utils.graphdb_utils import (
     get_taxonomy_hierarchy,
     build_hierarchy_tree,
+    build_hierarchy_graph,
+    get_concept_parents,
     clear_graphdb_repository,
     GRAPHDB_STATEMENTS_ENDPOINT,
     import_taxonomy_to_graphdb,
@@ -11,21 +13,37 @@ from utils.graphdb_utils import (
     add_subconcept_to_graphdb,
     delete_concept_from_graphdb, add_rdfs_label_to_graphdb, delete_rdfs_label_from_graphdb, add_rdfs_comment_to_graphdb,
     delete_rdfs_comment_from_graphdb,
+    move_concept_in_graphdb,
+    copy_subtree_in_graphdb,
+    merge_concepts_in_graphdb,
+    mint_concept_uri,
 )
-import tempfile
-import os
-import io
-from pydantic import BaseModel
+import asyncio
+import itertools
+import json
+from pydantic import BaseModel, Field
 from typing import List, Optional
 import logging
 import traceback
 from utils.llm_utils import generate_taxonomy_with_llm
+from utils.llm_streaming import stream_taxonomy_into_graphdb
+from utils.rdf_validation import validate_rdf_async, rdf_format_for_filename, NTRIPLES_CONTENT_TYPE
+from utils.bulk_import import bulk_import_taxonomy
+from utils.outline_import import import_outline, outline_format_for_filename, OUTLINE_FORMATS
+from utils.change_events import publish_change, stream_change_events, change_broker
+from utils.tree_snapshot import tree_snapshot
+from utils.sparql_queries import TREE_FIELDS, LANG_TAG_PATTERN, iri_term
+from utils.duplicate_detection import find_duplicate_concepts
+from utils.tree_stream import iter_tree_ndjson
+from utils.taxonomy_stats import taxonomy_stats
+from utils.graphdb_routing import reading_at_revision
+from utils.request_profiling import span
+from utils.response_cache import response_cache, choose_encoding
 
 router = APIRouter()
 
 logger = logging.getLogger(__name__)
 
-
 class AddSubConceptRequest(BaseModel):
     concept_name: str
     parent_concept_uri: str
@@ -39,6 +57,25 @@ class DeleteConceptRequest(BaseModel):
     concept_uri: str
 
 
+class MoveConceptRequest(BaseModel):
+    concept_uri: str
+    new_parent_uri: Optional[str] = None
+    dry_run: bool = False
+
+
+class CopySubtreeRequest(BaseModel):
+    concept_uri: str
+    target_parent_uri: Optional[str] = None
+    suffix: Optional[str] = Field(None, pattern=r"^[A-Za-z0-9_-]{1,64}$")
+    dry_run: bool = False
+
+
+class MergeConceptsRequest(BaseModel):
+    source_uri: str
+    target_uri: str
+    dry_run: bool = False
+
+
 class LiteralData(BaseModel):
     value: str
     lang: Optional[str] = None
@@ -55,20 +92,159 @@ class ConceptLiteralUpdateRequest(BaseModel):
     new_literal: LiteralData
 
 
+def _parse_tree_projection(lang: Optional[str], fields: Optional[str]):
+    langs = None
+    if lang:
+        langs = [tag.strip() for tag in lang.split(",") if tag.strip()]
+        invalid = [tag for tag in langs if not LANG_TAG_PATTERN.match(tag)]
+        if invalid:
+            raise HTTPException(status_code=400, detail=f"Некоректний код мови: {', '.join(invalid)}")
+    field_list = None
+    if fields:
+        field_list = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in field_list if field not in TREE_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Невідомі поля: {', '.join(unknown)}. Доступні: {', '.join(TREE_FIELDS)}")
+    return langs, field_list
+
+
+def _check_iri(uri: str) -> str:
+    try:
+        iri_term(uri)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return uri
+
+
+def _encode_json(data) -> bytes:
+    # Encoded here rather than by FastAPI so large trees skip jsonable_encoder and the time shows up as a stage
+    with span("encode"):
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def _cached_response(request: Request, endpoint: str, params: dict, revision: int, build,
+                           headers: Optional[dict] = None) -> Response:
+    """
+    Serves build()'s (body, media_type) from the response cache for this revision, compressed
+    with the best encoding the client accepts. Answers 304 when the client already has it.
+    """
+    key = (endpoint, tuple(sorted(params.items())), revision)
+
+    async def build_at_revision():
+        with reading_at_revision(revision):
+            return await build()
+
+    with span("cache"):
+        entry = await response_cache.get_or_build(key, build_at_revision, revision, headers)
+    common_headers = {"ETag": entry.etag, "Vary": "Accept-Encoding", "X-Taxonomy-Revision": str(revision)}
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=common_headers)
+    with span("compress"):
+        encoding, body = await response_cache.variant(key, entry, choose_encoding(request.headers.get("accept-encoding")))
+    response_headers = {**entry.headers, **common_headers}
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=entry.media_type, headers=response_headers)
+
+
+def _build_projected_tree(langs, fields, root_uri=None):
+    bindings = get_taxonomy_hierarchy(langs=langs, fields=fields, root_uri=root_uri)
+    if not bindings:
+        return []
+    return build_hierarchy_tree(bindings, langs=langs, fields=fields)
+
+
 @router.get("/taxonomy-tree")
-async def read_taxonomy_tree():
+async def read_taxonomy_tree(request: Request,
+                             lang: Optional[str] = Query(None, description="Fallback chain, e.g. uk,en"),
+                             fields: Optional[str] = Query(None, description="e.g. title,labels")):
+    try:
+        langs, field_list = _parse_tree_projection(lang, fields)
+        if langs is None and field_list is None:
+            with span("snapshot"):
+                snapshot = await tree_snapshot.get()
+
+            async def build_full():
+                # Served from the shared mapping; the cache entry keeps it mapped until it is evicted
+                return snapshot.payload, "application/json"
+
+            # A snapshot rebuilt after TREE_SNAPSHOT_MAX_AGE_SECONDS keeps its revision, so key on its build time too
+            return await _cached_response(request, "taxonomy-tree", {"built_at": snapshot.built_at},
+                                          snapshot.revision, build_full)
+
+        async def build_projected():
+            tree = await asyncio.to_thread(_build_projected_tree, langs, field_list)
+            return _encode_json(tree), "application/json"
+
+        return await _cached_response(request, "taxonomy-tree", {"lang": lang, "fields": fields},
+                                      tree_snapshot.required_revision(), build_projected)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500,
+                            detail=f"Ошибка при обработке запроса: {e}")
+
+
+@router.get("/taxonomy-graph")
+async def read_taxonomy_graph(request: Request,
+                              lang: Optional[str] = Query(None, description="Fallback chain, e.g. uk,en"),
+                              fields: Optional[str] = Query(None, description="e.g. title,labels")):
+    """Flat node table: every concept once, with the keys of all its parents and children."""
+    try:
+        langs, field_list = _parse_tree_projection(lang, fields)
+
+        async def build():
+            bindings = await asyncio.to_thread(get_taxonomy_hierarchy, langs=langs, fields=field_list)
+            with span("build_graph"):
+                graph = build_hierarchy_graph(bindings, langs=langs, fields=field_list)
+            return _encode_json(graph), "application/json"
+
+        return await _cached_response(request, "taxonomy-graph", {"lang": lang, "fields": fields},
+                                      tree_snapshot.required_revision(), build)
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500,
+                            detail=f"Ошибка при обработке запроса: {e}")
+
+
+@router.get("/taxonomy-tree/stream")
+async def stream_taxonomy_tree(order: str = Query("dfs", pattern="^(dfs|bfs)$"),
+                               lang: Optional[str] = Query(None, description="Fallback chain, e.g. uk,en"),
+                               fields: Optional[str] = Query(None, description="e.g. title,labels")):
     try:
-        bindings = get_taxonomy_hierarchy()
-        print("Debug: read_taxonomy_tree - Получены bindings из get_taxonomy_hierarchy:")
-        print(bindings)
+        langs, field_list = _parse_tree_projection(lang, fields)
+        chunks = iter_tree_ndjson(order, langs, field_list)
+        # Pull the first record here so GraphDB errors still produce a proper error response
+        first_chunk = await asyncio.to_thread(next, chunks, None)
+        body = itertools.chain([first_chunk], chunks) if first_chunk is not None else iter(())
+        return StreamingResponse(body, media_type="application/x-ndjson")
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500,
+                            detail=f"Ошибка при обработке запроса: {e}")
 
-        if not bindings:
-            return []
-        tree_data = build_hierarchy_tree(bindings)
-        print("Debug: read_taxonomy_tree - Результат build_hierarchy_tree:")
-        print(tree_data)
 
-        return tree_data
+@router.get("/taxonomy-subtree")
+async def read_taxonomy_subtree(request: Request,
+                                concept_uri: str = Query(...),
+                                lang: Optional[str] = Query(None, description="Fallback chain, e.g. uk,en"),
+                                fields: Optional[str] = Query(None, description="e.g. title,labels")):
+    try:
+        _check_iri(concept_uri)
+        langs, field_list = _parse_tree_projection(lang, fields)
+
+        async def build():
+            tree_data = await asyncio.to_thread(_build_projected_tree, langs, field_list, concept_uri)
+            if not tree_data:
+                raise HTTPException(status_code=404, detail=f"Концепт '{concept_uri}' не знайдено")
+            return _encode_json(tree_data), "application/json"
+
+        return await _cached_response(request, "taxonomy-subtree",
+                                      {"concept_uri": concept_uri, "lang": lang, "fields": fields},
+                                      tree_snapshot.required_revision(), build)
     except HTTPException as e:
         raise e
     except Exception as e:
@@ -76,30 +252,90 @@ async def read_taxonomy_tree():
                             detail=f"Ошибка при обработке запроса: {e}")
 
 
+@router.get("/concept_parents")
+async def read_concept_parents(concept_uri: str = Query(...),
+                               lang: Optional[str] = Query(None, description="Fallback chain, e.g. uk,en")):
+    try:
+        _check_iri(concept_uri)
+        langs, _ = _parse_tree_projection(lang, None)
+        parents = await asyncio.to_thread(get_concept_parents, concept_uri, langs)
+        return {"concept_uri": concept_uri, "parents": parents}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error reading parents of {concept_uri}: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при отриманні батьківських концептів: {e}")
+
+
+@router.get("/taxonomy/events")
+async def taxonomy_events_endpoint(since: Optional[int] = Query(None),
+                                   last_event_id: Optional[str] = Header(None)):
+    if since is None and last_event_id and last_event_id.isdigit():
+        since = int(last_event_id)
+    return StreamingResponse(stream_change_events(since), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no",
+                                      "X-Taxonomy-Revision": str(change_broker.revision)})
+
+
+@router.get("/taxonomy/duplicates")
+async def find_duplicates_endpoint(threshold: float = Query(0.8, ge=0.0, le=1.0), limit: int = Query(100, ge=1),
+                                   lang: Optional[str] = Query(None, description="Comma-separated languages")):
+    try:
+        langs, _ = _parse_tree_projection(lang, None)
+        bindings = await asyncio.to_thread(get_taxonomy_hierarchy, fields=["labels"])
+        suggestions = await asyncio.to_thread(find_duplicate_concepts, bindings, threshold, limit, langs)
+        return {"count": len(suggestions), "suggestions": suggestions}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error finding duplicate concepts: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при пошуку дублікатів концептів: {e}")
+
+
+@router.get("/taxonomy/stats")
+async def taxonomy_stats_endpoint():
+    try:
+        return await taxonomy_stats.get()
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error computing taxonomy stats: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при обчисленні статистики таксономії: {e}")
+
+
 @router.post("/clear_repository")
 async def clear_repository_endpoint():
     if clear_graphdb_repository(GRAPHDB_STATEMENTS_ENDPOINT):
+        publish_change("repository_cleared")
         return {"message": "Репозиторій успішно очищено"}
     else:
         raise HTTPException(status_code=500, detail="Не вдалося очистити репозиторій")
 
 
 @router.post("/import_taxonomy")
-async def import_taxonomy_endpoint(file: UploadFile = File(...)):
+async def import_taxonomy_endpoint(file: UploadFile = File(...), repair: bool = Query(False)):
     try:
         if not file.filename.endswith((".ttl", ".rdf")):
             raise HTTPException(status_code=400, detail="Непідтримуваний формат файлу. Використовуйте .ttl або .rdf")
 
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file.filename) as tmp_file:
-            contents = await file.read()
-            tmp_file.write(contents)
-            tmp_file_path = tmp_file.name
-
-        import_taxonomy_to_graphdb(tmp_file_path, GRAPHDB_STATEMENTS_ENDPOINT)
+        rdf_format = rdf_format_for_filename(file.filename)
+        contents = await file.read()
+        report, ntriples = await validate_rdf_async(contents, rdf_format, repair=repair, source=file.filename)
+        if not report["valid"]:
+            raise HTTPException(status_code=400, detail={"message": "Файл містить невалідну таксономію",
+                                                         "report": report})
 
-        os.remove(tmp_file_path)
+        await asyncio.to_thread(
+            import_taxonomy_to_graphdb,
+            file_path=None,
+            graphdb_endpoint_statements=GRAPHDB_STATEMENTS_ENDPOINT,
+            file_content_bytes=ntriples,
+            content_type=NTRIPLES_CONTENT_TYPE
+        )
+        publish_change("taxonomy_imported", source=file.filename, triples=report["triple_count"])
 
-        return JSONResponse(content={"message": f"Таксономія з файлу '{file.filename}' успішно імпортована"})
+        return JSONResponse(content={"message": f"Таксономія з файлу '{file.filename}' успішно імпортована",
+                                     "report": report})
 
     except HTTPException as e:
         raise
@@ -107,9 +343,62 @@ async def import_taxonomy_endpoint(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Помилка при імпорті таксономії: {e}")
 
 
-@router.post("/create_taxonomy_from_corpus_llm")
-async def create_taxonomy_from_corpus_llm_endpoint(files: List[UploadFile] = File(...)):
-    logger.info(f"Request to create taxonomy from corpus with {len(files)} file(s).")
+@router.post("/import_outline")
+async def import_outline_endpoint(file: UploadFile = File(...),
+                                  format: Optional[str] = Query(None, description="outline, csv or json; "
+                                                                                  "by file extension if omitted"),
+                                  lang: Optional[str] = Query(None, description="Language of untagged labels"),
+                                  parent_uri: Optional[str] = Query(None, description="Attach the roots under "
+                                                                                      "this concept"),
+                                  dry_run: bool = Query(False)):
+    """Creates a whole tree of concepts from an indented outline, a CSV file or a JSON tree."""
+    outline_format = format or outline_format_for_filename(file.filename)
+    if outline_format not in OUTLINE_FORMATS:
+        raise HTTPException(status_code=400,
+                            detail=f"Непідтримуваний формат: {outline_format}. Доступні: {', '.join(OUTLINE_FORMATS)}")
+    if lang and not LANG_TAG_PATTERN.match(lang):
+        raise HTTPException(status_code=400, detail=f"Некоректний код мови: {lang}")
+    if parent_uri:
+        _check_iri(parent_uri)
+    try:
+        content = await file.read()
+        result = await asyncio.to_thread(import_outline, content, outline_format, GRAPHDB_STATEMENTS_ENDPOINT,
+                                         lang=lang, parent_uri=parent_uri, dry_run=dry_run)
+    except HTTPException as e:
+        raise
+    except Exception as e:
+        logger.error(f"Error during outline import: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при імпорті структури таксономії: {e}")
+
+    if dry_run:
+        return JSONResponse(content={"message": f"Буде імпортовано концептів: {result['concepts']}", **result})
+    publish_change("taxonomy_imported", source=file.filename, triples=result["triples"])
+    return JSONResponse(content={"message": f"Імпортовано концептів: {result['concepts']}", **result})
+
+
+@router.post("/import_taxonomy_bulk")
+async def import_taxonomy_bulk_endpoint(files: List[UploadFile] = File(...), atomic: bool = Query(False),
+                                        repair: bool = Query(False)):
+    if not files:
+        raise HTTPException(status_code=400, detail="Не надано жодного файлу.")
+    try:
+        result = await bulk_import_taxonomy(files, GRAPHDB_STATEMENTS_ENDPOINT, atomic=atomic, repair=repair)
+    except HTTPException as e:
+        raise
+    except Exception as e:
+        logger.error(f"Error during bulk import: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при пакетному імпорті таксономії: {e}")
+
+    if result["committed"]:
+        publish_change("taxonomy_imported", source="bulk", files=result["summary"].get("imported", 0))
+    if atomic and not result["committed"]:
+        raise HTTPException(status_code=400, detail={"message": "Імпорт скасовано: не всі файли вдалося імпортувати",
+                                                     **result})
+    return JSONResponse(content={"message": f"Імпортовано файлів: {result['summary'].get('imported', 0)}",
+                                 **result})
+
+
+async def _read_corpus_files(files: List[UploadFile]) -> str:
     corpus_text_parts = []
     processed_filenames = []
 
@@ -135,6 +424,13 @@ async def create_taxonomy_from_corpus_llm_endpoint(files: List[UploadFile] = Fil
 
     logger.info(
         f"Combined corpus text from {len(processed_filenames)} files ({', '.join(processed_filenames)}), length: {len(combined_corpus_text)} chars.")
+    return combined_corpus_text
+
+
+@router.post("/create_taxonomy_from_corpus_llm")
+async def create_taxonomy_from_corpus_llm_endpoint(files: List[UploadFile] = File(...)):
+    logger.info(f"Request to create taxonomy from corpus with {len(files)} file(s).")
+    combined_corpus_text = await _read_corpus_files(files)
 
     try:
         ttl_taxonomy_data_str = await generate_taxonomy_with_llm(combined_corpus_text)
@@ -143,16 +439,25 @@ async def create_taxonomy_from_corpus_llm_endpoint(files: List[UploadFile] = Fil
             logger.error(f"LLM did not return valid TTL data. Response: {ttl_taxonomy_data_str[:500]}")
             raise HTTPException(status_code=500, detail="ЛЛМ не згенерувала валідну таксономію у форматі TTL.")
 
-        ttl_taxonomy_bytes = ttl_taxonomy_data_str.encode('utf-8')
+        # LLM output is often cut off by the token limit, so drop an unterminated trailing statement
+        report, ntriples = await validate_rdf_async(ttl_taxonomy_data_str.encode('utf-8'), "turtle", repair=True,
+                                                    source="llm")
+        if not report["valid"]:
+            logger.error(f"LLM generated invalid TTL: {report['errors']}")
+            raise HTTPException(status_code=500, detail={"message": "ЛЛМ не згенерувала валідну таксономію у форматі TTL.",
+                                                         "report": report})
 
-        import_taxonomy_to_graphdb(
+        await asyncio.to_thread(
+            import_taxonomy_to_graphdb,
             file_path=None,  # Not using file_path
             graphdb_endpoint_statements=GRAPHDB_STATEMENTS_ENDPOINT,
-            file_content_bytes=ttl_taxonomy_bytes,
-            content_type='application/x-turtle'  # LLM output is TTL
+            file_content_bytes=ntriples,
+            content_type=NTRIPLES_CONTENT_TYPE
         )
         logger.info("Taxonomy from LLM imported successfully into GraphDB.")
-        return JSONResponse(content={"message": "Таксономія успішно створена з корпусу документів та імпортована."})
+        publish_change("taxonomy_imported", source="llm", triples=report["triple_count"])
+        return JSONResponse(content={"message": "Таксономія успішно створена з корпусу документів та імпортована.",
+                                     "report": report})
 
     except ValueError as ve:  # Catch specific errors from LLM util
         logger.error(f"ValueError from LLM processing: {ve}", exc_info=True)
@@ -164,11 +469,25 @@ async def create_taxonomy_from_corpus_llm_endpoint(files: List[UploadFile] = Fil
         raise HTTPException(status_code=500, detail=f"Неочікувана помилка при створенні таксономії з корпусу: {e}")
 
 
+@router.post("/create_taxonomy_from_corpus_llm/stream")
+async def create_taxonomy_from_corpus_llm_stream_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Same as /create_taxonomy_from_corpus_llm, but concepts are inserted while the model is still
+    generating. The response is NDJSON progress: started, batch, skipped, then done or error.
+    """
+    logger.info(f"Request to stream taxonomy from corpus with {len(files)} file(s).")
+    combined_corpus_text = await _read_corpus_files(files)
+
+    async def ndjson():
+        async for event in stream_taxonomy_into_graphdb(combined_corpus_text, GRAPHDB_STATEMENTS_ENDPOINT):
+            yield (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
 @router.get("/export_taxonomy")
-async def export_taxonomy_endpoint(format: str = Query(..., regex="^(ttl|rdf)$")):
+async def export_taxonomy_endpoint(request: Request, format: str = Query(..., regex="^(ttl|rdf)$")):
     try:
-        content = export_taxonomy(format)
-
         if format == "ttl":
             content_type = "application/x-turtle"
             filename = "taxonomy.ttl"
@@ -176,8 +495,13 @@ async def export_taxonomy_endpoint(format: str = Query(..., regex="^(ttl|rdf)$")
             content_type = "application/rdf+xml"
             filename = "taxonomy.rdf"
 
-        return StreamingResponse(io.BytesIO(content.encode()), media_type=content_type,
-                                 headers={"Content-Disposition": f"attachment;filename={filename}"})
+        async def build():
+            content = await asyncio.to_thread(export_taxonomy, format)
+            return content.encode(), content_type
+
+        return await _cached_response(request, "export_taxonomy", {"format": format},
+                                      tree_snapshot.required_revision(), build,
+                                      headers={"Content-Disposition": f"attachment;filename={filename}"})
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Помилка при експорті таксономії: {e}")
@@ -187,10 +511,11 @@ async def export_taxonomy_endpoint(format: str = Query(..., regex="^(ttl|rdf)$")
 async def add_topconcept_endpoint(request: AddTopConceptRequest):
     try:
         concept_name = request.concept_name
-        concept_uri = f"http://example.org/taxonomy/{concept_name}"
+        concept_uri = mint_concept_uri(concept_name)
         print(
             f"Debug: concept_uri={concept_uri}, concept_name={concept_name}")
         add_top_concept_to_graphdb(concept_uri, GRAPHDB_STATEMENTS_ENDPOINT)
+        publish_change("concept_added", concept=concept_uri)
         return {"message": f"Топ концепт '{concept_name}' успішно додано"}
     except HTTPException as e:
         raise e
@@ -202,11 +527,12 @@ async def add_topconcept_endpoint(request: AddTopConceptRequest):
 async def add_subconcept_endpoint(request: AddSubConceptRequest):
     try:
         concept_name = request.concept_name
-        parent_concept_uri = request.parent_concept_uri
-        concept_uri = f"http://example.org/taxonomy/{concept_name}"
+        parent_concept_uri = _check_iri(request.parent_concept_uri)
+        concept_uri = mint_concept_uri(concept_name)
         print(f"Debug: concept_uri={concept_uri}, concept_name={concept_name}, parent_concept_uri={parent_concept_uri}")
         add_subconcept_to_graphdb(concept_uri, parent_concept_uri,
                                   GRAPHDB_STATEMENTS_ENDPOINT)
+        publish_change("concept_added", concept=concept_uri, parent=parent_concept_uri)
         return {"message": f"Концепт '{concept_name}' успішно додано"}
     except HTTPException as e:
         raise e
@@ -219,6 +545,7 @@ async def delete_concept_endpoint(request: DeleteConceptRequest):
     try:
         concept_uri = request.concept_uri
         delete_concept_from_graphdb(concept_uri, GRAPHDB_STATEMENTS_ENDPOINT)
+        publish_change("concept_deleted", concept=concept_uri)
         return {"message": f"Концепт '{concept_uri}' успішно видалено"}
     except HTTPException as e:
         raise e
@@ -226,6 +553,63 @@ async def delete_concept_endpoint(request: DeleteConceptRequest):
         raise HTTPException(status_code=500, detail=f"Помилка при видаленні концепту: {e}")
 
 
+@router.post("/move_concept")
+async def move_concept_endpoint(request: MoveConceptRequest):
+    try:
+        _check_iri(request.concept_uri)
+        if request.new_parent_uri:
+            _check_iri(request.new_parent_uri)
+        result = await asyncio.to_thread(move_concept_in_graphdb, request.concept_uri, request.new_parent_uri,
+                                         GRAPHDB_STATEMENTS_ENDPOINT, dry_run=request.dry_run)
+        if request.dry_run:
+            return result
+        publish_change("concept_moved", concept=request.concept_uri, parent=request.new_parent_uri)
+        return {"message": f"Концепт '{request.concept_uri}' успішно переміщено", **result}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error moving concept: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при переміщенні концепту: {e}")
+
+
+@router.post("/copy_subtree")
+async def copy_subtree_endpoint(request: CopySubtreeRequest):
+    try:
+        _check_iri(request.concept_uri)
+        if request.target_parent_uri:
+            _check_iri(request.target_parent_uri)
+        result = await asyncio.to_thread(copy_subtree_in_graphdb, request.concept_uri, request.target_parent_uri,
+                                         GRAPHDB_STATEMENTS_ENDPOINT, suffix=request.suffix, dry_run=request.dry_run)
+        if request.dry_run:
+            return result
+        publish_change("subtree_copied", concept=request.concept_uri, copy=result["new_root_uri"],
+                       parent=request.target_parent_uri)
+        return {"message": f"Піддерево '{request.concept_uri}' успішно скопійовано", **result}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error copying subtree: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при копіюванні піддерева: {e}")
+
+
+@router.post("/merge_concepts")
+async def merge_concepts_endpoint(request: MergeConceptsRequest):
+    try:
+        _check_iri(request.source_uri)
+        _check_iri(request.target_uri)
+        result = await asyncio.to_thread(merge_concepts_in_graphdb, request.source_uri, request.target_uri,
+                                         GRAPHDB_STATEMENTS_ENDPOINT, dry_run=request.dry_run)
+        if request.dry_run:
+            return result
+        publish_change("concepts_merged", concept=request.source_uri, target=request.target_uri)
+        return {"message": f"Концепт '{request.source_uri}' успішно об'єднано з '{request.target_uri}'", **result}
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        logger.error(f"Error merging concepts: {e}\n{traceback.format_exc()}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Помилка при об'єднанні концептів: {e}")
+
+
 @router.post("/add_concept_label")
 async def add_concept_label_endpoint(request: ConceptLiteralRequest):
     try:
@@ -236,6 +620,7 @@ async def add_concept_label_endpoint(request: ConceptLiteralRequest):
             label_lang=request.literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("label_added", concept=request.concept_uri, literal=request.literal.model_dump())
         return {"message": f"Мітку '{request.literal.value}' успішно додано до концепту '{request.concept_uri}'"}
     except HTTPException as e:
         raise e
@@ -254,6 +639,7 @@ async def delete_concept_label_endpoint(request: ConceptLiteralRequest):
             label_lang=request.literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("label_deleted", concept=request.concept_uri, literal=request.literal.model_dump())
         return {"message": f"Мітку '{request.literal.value}' успішно видалено з концепту '{request.concept_uri}'"}
     except HTTPException as e:
         raise e
@@ -281,6 +667,8 @@ async def update_concept_label_endpoint(request: ConceptLiteralUpdateRequest):
             label_lang=request.new_literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("label_updated", concept=request.concept_uri, old=request.old_literal.model_dump(),
+                       new=request.new_literal.model_dump())
         return {"message": f"Мітку для концепту '{request.concept_uri}' успішно оновлено"}
     except HTTPException as e:
         raise e
@@ -300,6 +688,7 @@ async def add_concept_definition_endpoint(request: ConceptLiteralRequest):
             comment_lang=request.literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("definition_added", concept=request.concept_uri, literal=request.literal.model_dump())
         return {"message": f"Визначення успішно додано до концепту '{request.concept_uri}'"}
     except HTTPException as e:
         raise e
@@ -319,6 +708,7 @@ async def delete_concept_definition_endpoint(request: ConceptLiteralRequest):
             comment_lang=request.literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("definition_deleted", concept=request.concept_uri, literal=request.literal.model_dump())
         return {"message": f"Визначення успішно видалено з концепту '{request.concept_uri}'"}
     except HTTPException as e:
         raise e
@@ -346,6 +736,8 @@ async def update_concept_definition_endpoint(request: ConceptLiteralUpdateReques
             comment_lang=request.new_literal.lang,
             graphdb_endpoint=GRAPHDB_STATEMENTS_ENDPOINT
         )
+        publish_change("definition_updated", concept=request.concept_uri, old=request.old_literal.model_dump(),
+                       new=request.new_literal.model_dump())
         return {"message": f"Визначення для концепту '{request.concept_uri}' успішно оновлено"}
     except HTTPException as e:
         raise e
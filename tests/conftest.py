@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# Module-level configuration is read at import time, so point it at throwaway locations first
+_TEST_DIR = tempfile.mkdtemp(prefix="taxonomy-tests-")
+os.environ.setdefault("TREE_SNAPSHOT_DIR", os.path.join(_TEST_DIR, "snapshot"))
+os.environ.setdefault("PROFILING_DIR", os.path.join(_TEST_DIR, "profiles"))
+os.environ.setdefault("CHANGE_EVENTS_DIR", os.path.join(_TEST_DIR, "events"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
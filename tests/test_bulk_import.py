@@ -0,0 +1,167 @@
+import asyncio
+import io
+import tarfile
+import zipfile
+
+import pytest
+from fastapi import UploadFile
+
+from utils import bulk_import, graphdb_utils
+from utils.rdf_validation import validate_rdf
+
+VALID_TTL = b"""@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+<http://example.org/taxonomy/A> a rdfs:Class ; rdfs:label "A" ."""
+INVALID_TTL = b"<http://example.org/taxonomy/A> a"
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    buffer.seek(0)
+    return buffer
+
+
+def _tar_gz(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    buffer.seek(0)
+    return buffer
+
+
+def _upload(filename, content):
+    return UploadFile(file=content if isinstance(content, io.BytesIO) else io.BytesIO(content), filename=filename)
+
+
+class RecordingTransaction:
+    instances = []
+
+    def __init__(self, endpoint):
+        self.url = None
+        self.calls = []
+        RecordingTransaction.instances.append(self)
+
+    def begin(self):
+        self.url = "txn"
+        self.calls.append("begin")
+
+    def add(self, content, content_type, graph_uri=None):
+        self.calls.append(("add", content_type))
+
+    def commit(self):
+        self.calls.append("commit")
+
+    def rollback(self):
+        self.calls.append("rollback")
+
+
+@pytest.fixture
+def fake_graphdb(monkeypatch):
+    async def validate_inline(content, rdf_format, repair=False, source=""):
+        return validate_rdf(content, rdf_format, repair, source)
+
+    posted = []
+    RecordingTransaction.instances = []
+    monkeypatch.setattr(bulk_import, "validate_rdf_async", validate_inline)
+    monkeypatch.setattr(bulk_import, "GraphDBTransaction", RecordingTransaction)
+    monkeypatch.setattr(bulk_import, "import_taxonomy_to_graphdb",
+                        lambda **kwargs: posted.append(kwargs["content_type"]))
+    return posted
+
+
+def test_iter_upload_entries_reads_zip_and_tar_members():
+    members = {"a.ttl": VALID_TTL, "nested/b.ttl": VALID_TTL}
+    assert [name for name, _ in bulk_import.iter_upload_entries(_upload("x.zip", _zip(members)))] == \
+        ["x.zip/a.ttl", "x.zip/nested/b.ttl"]
+    entries = list(bulk_import.iter_upload_entries(_upload("x.tar.gz", _tar_gz(members))))
+    assert [name for name, _ in entries] == ["x.tar.gz/a.ttl", "x.tar.gz/nested/b.ttl"]
+    assert entries[0][1] == VALID_TTL
+
+
+def test_oversized_archive_member_is_rejected(monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_MAX_ENTRY_BYTES", 1000)
+    # Compresses to a few hundred bytes, expands past the limit
+    upload = _upload("bomb.zip", _zip({"big.ttl": b" " * 100_000}))
+    with pytest.raises(bulk_import.UploadTooLargeError):
+        list(bulk_import.iter_upload_entries(upload))
+
+
+def test_upload_budget_covers_all_members(monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_MAX_UPLOAD_BYTES", 2 * len(VALID_TTL) + 10)
+    upload = _upload("x.zip", _zip({f"{index}.ttl": VALID_TTL for index in range(3)}))
+    entries = bulk_import.iter_upload_entries(upload)
+    next(entries), next(entries)
+    with pytest.raises(bulk_import.UploadTooLargeError):
+        next(entries)
+
+
+def test_non_atomic_import_posts_every_valid_entry(fake_graphdb):
+    uploads = [_upload("a.ttl", VALID_TTL), _upload("b.ttl", INVALID_TTL), _upload("c.txt", b"x")]
+    result = asyncio.run(bulk_import.bulk_import_taxonomy(uploads, "http://graphdb/statements"))
+    assert result["committed"]
+    assert result["summary"] == {"imported": 1, "invalid": 1, "skipped": 1}
+    assert len(fake_graphdb) == 1
+    assert RecordingTransaction.instances == []
+
+
+def test_atomic_import_commits_one_transaction(fake_graphdb):
+    uploads = [_upload("x.zip", _zip({"a.ttl": VALID_TTL, "b.ttl": VALID_TTL}))]
+    result = asyncio.run(bulk_import.bulk_import_taxonomy(uploads, "http://graphdb/statements", atomic=True))
+    assert result["committed"]
+    [transaction] = RecordingTransaction.instances
+    assert transaction.calls == ["begin", ("add", "application/n-triples"), ("add", "application/n-triples"),
+                                 "commit"]
+    assert fake_graphdb == []
+
+
+def test_atomic_import_rolls_back_when_any_entry_fails(fake_graphdb):
+    uploads = [_upload("a.ttl", VALID_TTL), _upload("b.ttl", INVALID_TTL)]
+    result = asyncio.run(bulk_import.bulk_import_taxonomy(uploads, "http://graphdb/statements", atomic=True))
+    assert not result["committed"]
+    assert RecordingTransaction.instances[0].calls[-1] == "rollback"
+    assert "commit" not in RecordingTransaction.instances[0].calls
+
+
+def test_oversized_upload_is_reported_as_failed(fake_graphdb, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BULK_IMPORT_MAX_ENTRY_BYTES", 10)
+    result = asyncio.run(bulk_import.bulk_import_taxonomy([_upload("a.ttl", VALID_TTL)], "http://graphdb/statements"))
+    assert result["summary"] == {"failed": 1}
+    assert "розмір" in result["files"][0]["detail"]
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+    def raise_for_status(self):
+        pass
+
+
+def test_graphdb_transaction_commits_or_rolls_back(monkeypatch):
+    requests_sent = []
+
+    def fake_request(method, url, **kwargs):
+        requests_sent.append((method, url, (kwargs.get("params") or {}).get("action")))
+        return FakeResponse(201, {"Location": "/repositories/tax/transactions/42"})
+
+    monkeypatch.setattr(graphdb_utils.requests, "request", fake_request)
+    with graphdb_utils.GraphDBTransaction("http://graphdb:7200/repositories/tax/statements") as transaction:
+        transaction.add(b"<a> <b> <c> .", "application/n-triples")
+    assert requests_sent == [
+        ("POST", "http://graphdb:7200/repositories/tax/transactions", None),
+        ("PUT", "http://graphdb:7200/repositories/tax/transactions/42", "ADD"),
+        ("PUT", "http://graphdb:7200/repositories/tax/transactions/42", "COMMIT"),
+    ]
+
+    requests_sent.clear()
+    with pytest.raises(RuntimeError):
+        with graphdb_utils.GraphDBTransaction("http://graphdb:7200/repositories/tax/statements"):
+            raise RuntimeError("boom")
+    assert [method for method, _, _ in requests_sent] == ["POST", "DELETE"]
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from utils import change_events
+from utils.change_events import ChangeBroker, ChangeSubscription, stream_change_events, RESYNC_EVENT
+
+
+def _parse_sse(chunk: str) -> dict:
+    data_line = next(line for line in chunk.splitlines() if line.startswith("data: "))
+    return json.loads(data_line[len("data: "):])
+
+
+def test_revision_is_shared_between_workers(tmp_path):
+    worker_a, worker_b = ChangeBroker(str(tmp_path)), ChangeBroker(str(tmp_path))
+    assert worker_a.publish("concept_added", concept="x")["rev"] == 1
+    assert worker_b.publish("concept_deleted", concept="x")["rev"] == 2
+    assert worker_a.publish("concept_added", concept="y")["rev"] == 3
+    assert worker_a.revision == worker_b.revision == 3
+
+
+def test_listeners_see_events_from_other_workers_in_order(tmp_path):
+    worker_a, worker_b = ChangeBroker(str(tmp_path)), ChangeBroker(str(tmp_path))
+    seen, local_seen = [], []
+    worker_b.add_listener(lambda event: seen.append(event["rev"]))
+    worker_b.add_listener(lambda event: local_seen.append(event["rev"]), local_only=True)
+
+    worker_a.publish("concept_added", concept="x")
+    worker_b.publish("concept_added", concept="y")
+    worker_a.publish("concept_added", concept="z")
+    worker_b.poll()
+    assert seen == [1, 2, 3]
+    assert local_seen == [2]
+
+
+def test_restarted_worker_resumes_from_the_log(tmp_path):
+    worker_a = ChangeBroker(str(tmp_path))
+    for index in range(3):
+        worker_a.publish("concept_added", concept=str(index))
+
+    seen = []
+    restarted = ChangeBroker(str(tmp_path))
+    restarted.add_listener(seen.append)
+    assert restarted.revision == 3
+    # Old events are history for resuming clients, not news for listeners
+    assert seen == []
+    assert [event["rev"] for event in restarted.events_since(1)] == [2, 3]
+    assert restarted.events_since(3) == []
+    # A revision from the future (log was reset) forces a resync
+    assert restarted.events_since(10) is None
+
+
+def test_compaction_keeps_revisions_and_signals_gaps(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_events, "CHANGE_EVENTS_LOG_MAX_BYTES", 200)
+    writer = ChangeBroker(str(tmp_path), history_size=3)
+    reader = ChangeBroker(str(tmp_path), history_size=3)
+    seen = []
+    reader.add_listener(lambda event: seen.append((event["rev"], event["type"])))
+
+    for index in range(10):
+        writer.publish("concept_added", concept=f"concept-{index}")
+    assert writer.revision == 10
+    assert tmp_path.joinpath("events.log").stat().st_size < 600
+
+    reader.poll()
+    assert seen[0][1] == RESYNC_EVENT
+    assert seen[-1] == (10, "concept_added")
+    assert reader.events_since(1) is None
+    assert [event["rev"] for event in reader.events_since(9)] == [10]
+
+
+def test_slow_subscriber_gets_a_resync_marker():
+    subscription = ChangeSubscription(queue_size=2)
+    for rev in range(1, 5):
+        subscription.offer({"rev": rev, "type": "concept_added"})
+    assert subscription.overflowed
+    assert subscription.queue.qsize() == 1
+    assert subscription.queue.get_nowait() is None
+
+
+def test_sse_stream_replays_and_follows_other_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(change_events, "CHANGE_EVENTS_POLL_SECONDS", 0.01)
+    worker_a, worker_b = ChangeBroker(str(tmp_path)), ChangeBroker(str(tmp_path))
+    worker_a.publish("concept_added", concept="before")
+
+    async def scenario():
+        stream = stream_change_events(since=0, broker=worker_b)
+        replayed = _parse_sse(await stream.__anext__())
+        worker_a.publish("concept_deleted", concept="after")
+        live = _parse_sse(await asyncio.wait_for(stream.__anext__(), timeout=2))
+        await stream.aclose()
+        return replayed, live
+
+    replayed, live = asyncio.run(scenario())
+    assert (replayed["rev"], replayed["concept"]) == (1, "before")
+    assert (live["rev"], live["type"], live["concept"]) == (2, "concept_deleted", "after")
+    assert worker_b.subscriber_count == 0
@@ -0,0 +1,166 @@
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from rdflib import Graph, Literal, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from routers import taxonomy_router
+from utils import graphdb_utils
+from utils.sparql_queries import (
+    EXPLICIT_GRAPH_URI,
+    concept_exists_query,
+    copy_subtree_operation,
+    merge_concepts_operation,
+    move_concept_operation,
+)
+
+NS = "http://example.org/taxonomy/"
+
+
+def _local(query: str) -> str:
+    # The local graph holds only explicit statements, like GraphDB's explicit pseudo-graph
+    return query.replace(f"FROM <{EXPLICIT_GRAPH_URI}>", "").replace(f"USING <{EXPLICIT_GRAPH_URI}>", "")
+
+
+@pytest.fixture
+def store(monkeypatch):
+    """A taxonomy in a local rdflib graph standing in for GraphDB behind the operation helpers."""
+    graph = Graph()
+
+    def concept(name, *parents, label=None):
+        uri = URIRef(NS + name)
+        graph.add((uri, RDF.type, RDFS.Class))
+        graph.add((uri, RDFS.label, Literal(label or name, lang="en")))
+        for parent in parents:
+            graph.add((uri, RDFS.subClassOf, URIRef(NS + parent)))
+        return uri
+
+    monkeypatch.setattr(graphdb_utils, "run_ask_query", lambda query: bool(graph.query(_local(query)).askAnswer))
+    monkeypatch.setattr(graphdb_utils, "_select",
+                        lambda endpoint, query: {"results": {"bindings": [
+                            {"newNode": {"value": str(row.newNode)}} for row in graph.query(_local(query))]}})
+    monkeypatch.setattr(graphdb_utils, "_execute_sparql_update",
+                        lambda query, endpoint, description: graph.update(_local(query)))
+    graph.concept = concept
+    return graph
+
+
+def _parents(graph, name):
+    return sorted(str(parent)[len(NS):] for parent in graph.objects(URIRef(NS + name), RDFS.subClassOf))
+
+
+def _children(graph, name):
+    return sorted(str(child)[len(NS):] for child in graph.subjects(RDFS.subClassOf, URIRef(NS + name)))
+
+
+def test_move_replaces_all_parents(store):
+    store.concept("A")
+    store.concept("B")
+    store.concept("C", "A", "B")
+    graphdb_utils.move_concept_in_graphdb(NS + "C", NS + "B", "statements")
+    assert _parents(store, "C") == ["B"]
+
+
+def test_move_under_own_descendant_is_rejected(store):
+    store.concept("A")
+    store.concept("B", "A")
+    store.concept("C", "B")
+    with pytest.raises(HTTPException) as excinfo:
+        graphdb_utils.move_concept_in_graphdb(NS + "A", NS + "C", "statements")
+    assert excinfo.value.status_code == 400
+    assert _parents(store, "A") == []
+
+
+def test_copy_keeps_only_edges_inside_the_subtree(store):
+    store.concept("Root")
+    store.concept("Other")
+    store.concept("Target")
+    store.concept("A", "Root")
+    store.concept("B", "A", "Other")
+    result = graphdb_utils.copy_subtree_in_graphdb(NS + "A", NS + "Target", "statements", suffix="-c")
+
+    assert result["new_root_uri"] == NS + "A-c"
+    assert _parents(store, "A-c") == ["Target"]
+    assert _parents(store, "B-c") == ["A-c"]
+    assert _children(store, "Other") == ["B"]
+    assert _parents(store, "B") == ["A", "Other"]
+
+
+def test_copy_is_refused_when_a_descendant_uri_is_taken(store):
+    store.concept("A")
+    store.concept("B", "A")
+    store.concept("B-c")
+    before = len(store)
+    with pytest.raises(HTTPException) as excinfo:
+        graphdb_utils.copy_subtree_in_graphdb(NS + "A", None, "statements", suffix="-c")
+    assert excinfo.value.status_code == 409
+    assert NS + "B-c" in excinfo.value.detail
+    assert len(store) == before
+
+
+def test_merge_moves_children_labels_and_parents_to_the_target(store):
+    store.concept("P1")
+    store.concept("P2")
+    store.concept("Source", "P1", "P2", label="Cat")
+    store.concept("Target", "P2", label="Kitty")
+    store.concept("Child", "Source")
+    graphdb_utils.merge_concepts_in_graphdb(NS + "Source", NS + "Target", "statements")
+
+    assert not list(store.triples((URIRef(NS + "Source"), None, None)))
+    assert not list(store.triples((None, None, URIRef(NS + "Source"))))
+    assert _parents(store, "Target") == ["P1", "P2"]
+    assert _parents(store, "Child") == ["Target"]
+    assert {str(label) for label in store.objects(URIRef(NS + "Target"), RDFS.label)} == {"Cat", "Kitty"}
+
+
+def test_merge_into_a_parent_does_not_create_a_self_loop(store):
+    store.concept("Target")
+    store.concept("Source", "Target")
+    store.concept("Child", "Source")
+    graphdb_utils.merge_concepts_in_graphdb(NS + "Source", NS + "Target", "statements")
+    assert _parents(store, "Target") == []
+    assert _parents(store, "Child") == ["Target"]
+
+
+@pytest.mark.parametrize("layout", [
+    # Target below Source through another concept
+    [("Source",), ("Middle", "Source"), ("Target", "Middle")],
+    # A parent of Source below Target: Target would inherit its own descendant as parent
+    [("Target",), ("Middle", "Target"), ("Source", "Middle")],
+])
+def test_merge_that_would_create_a_cycle_is_rejected(store, layout):
+    for name, *parents in layout:
+        store.concept(name, *parents)
+    before = len(store)
+    with pytest.raises(HTTPException) as excinfo:
+        graphdb_utils.merge_concepts_in_graphdb(NS + "Source", NS + "Target", "statements")
+    assert excinfo.value.status_code == 400
+    assert len(store) == before
+
+
+BREAKOUT_URI = NS + "A> a rdfs:Class . } ; DROP ALL ; INSERT DATA { <x"
+
+
+@pytest.mark.parametrize("path, body", [
+    ("/move_concept", {"concept_uri": BREAKOUT_URI}),
+    ("/move_concept", {"concept_uri": NS + "A", "new_parent_uri": BREAKOUT_URI}),
+    ("/copy_subtree", {"concept_uri": NS + "A", "target_parent_uri": NS + "A> x"}),
+    ("/merge_concepts", {"source_uri": NS + "A", "target_uri": BREAKOUT_URI}),
+])
+def test_unsafe_uris_are_rejected_before_reaching_graphdb(monkeypatch, path, body):
+    monkeypatch.setattr(graphdb_utils, "run_ask_query", lambda query: pytest.fail(f"sent to GraphDB: {query}"))
+    app = FastAPI()
+    app.include_router(taxonomy_router.router)
+    response = TestClient(app).post(path, json=body)
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("build", [
+    lambda: concept_exists_query(BREAKOUT_URI),
+    lambda: move_concept_operation(NS + "A", BREAKOUT_URI),
+    lambda: copy_subtree_operation(BREAKOUT_URI, None, "-c"),
+    lambda: merge_concepts_operation(NS + "A", BREAKOUT_URI),
+])
+def test_query_builders_refuse_unsafe_uris(build):
+    with pytest.raises(ValueError):
+        build()
@@ -0,0 +1,102 @@
+import numpy as np
+
+from utils import duplicate_detection
+from utils.duplicate_detection import (
+    _ngram_matrix,
+    ancestor_path,
+    candidate_pairs,
+    collect_concepts,
+    estimate_similarity,
+    find_duplicate_concepts,
+    minhash_signatures,
+    normalize_label,
+)
+
+NS = "http://example.org/taxonomy/"
+
+
+def _row(cls, labels, sub=None, sub_labels=None):
+    row = {"class": {"value": NS + cls}, "classLabelsInfo": {"value": labels}}
+    if sub:
+        row["subClass"] = {"value": NS + sub}
+        row["subClassLabelsInfo"] = {"value": sub_labels}
+    return row
+
+
+def _exact_jaccard(a: str, b: str) -> float:
+    def grams(text):
+        text = f" {text} "
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    left, right = grams(a), grams(b)
+    return len(left & right) / len(left | right)
+
+
+def test_normalize_label_folds_case_and_whitespace():
+    assert normalize_label("  Машинне \t НАВЧАННЯ ") == "машинне навчання"
+
+
+def test_ngram_matrix_matches_python_ngrams():
+    texts = ["кіт", "ab", "machine"]
+    indptr, indices = _ngram_matrix(texts)
+    assert list(np.diff(indptr)) == [3, 2, 7]
+    # Equal n-grams get equal ids across texts
+    _, shared = _ngram_matrix(["abc", "abc"])
+    assert list(shared[:3]) == list(shared[3:])
+
+
+def test_minhash_estimate_tracks_jaccard_similarity():
+    texts = ["machine learning", "machine learnings", "deep neural networks"]
+    indptr, indices = _ngram_matrix(texts)
+    signatures = minhash_signatures(indptr, indices, 256)
+    scores = estimate_similarity(signatures, np.array([[0, 1], [0, 2]]))
+    assert abs(scores[0] - _exact_jaccard(texts[0], texts[1])) < 0.1
+    assert scores[1] < 0.2
+
+
+def test_signatures_do_not_depend_on_chunking(monkeypatch):
+    texts = [f"label number {i}" for i in range(50)]
+    indptr, indices = _ngram_matrix(texts)
+    whole = minhash_signatures(indptr, indices, 8)
+    monkeypatch.setattr(duplicate_detection, "SIGNATURE_CHUNK", 7)
+    assert np.array_equal(minhash_signatures(indptr, indices, 8), whole)
+
+
+def test_lsh_pairs_identical_signatures_only_once():
+    signatures = np.array([[1, 2, 3, 4], [1, 2, 3, 4], [9, 9, 9, 9], [1, 2, 7, 7]], dtype=np.uint64)
+    pairs = candidate_pairs(signatures, bands=2, rows_per_band=2)
+    assert pairs.tolist() == [[0, 1], [0, 3], [1, 3]]
+
+
+def test_oversized_buckets_are_skipped(monkeypatch):
+    monkeypatch.setattr(duplicate_detection, "MAX_BUCKET_SIZE", 2)
+    signatures = np.ones((3, 2), dtype=np.uint64)
+    assert candidate_pairs(signatures, bands=1, rows_per_band=2).shape == (0, 2)
+
+
+def test_duplicates_are_found_per_language_and_merged_into_the_richer_concept():
+    bindings = [
+        _row("Root", "Корінь|uk", "MachineLearning", "Машинне навчання|uk||Machine learning|en"),
+        _row("Root", "Корінь|uk", "MachineLearning2", "машинне навчання|uk"),
+        _row("Root", "Корінь|uk", "Biology", "Біологія|uk||Biology|en"),
+        _row("Other", "Machine learning|de"),
+    ]
+    suggestions = find_duplicate_concepts(bindings, threshold=0.8)
+
+    assert len(suggestions) == 1
+    suggestion = suggestions[0]
+    assert suggestion["source"] == NS + "MachineLearning2"
+    assert suggestion["target"] == NS + "MachineLearning"
+    assert suggestion["lang"] == "uk"
+    assert suggestion["score"] == 1.0
+    assert suggestion["paths"][NS + "MachineLearning"] == [NS + "Root", NS + "MachineLearning"]
+
+
+def test_language_filter_limits_compared_labels():
+    bindings = [_row("A", "Dog|en||Собака|uk"), _row("B", "Dog|en||Пес|uk")]
+    assert find_duplicate_concepts(bindings, langs=["uk"]) == []
+    assert [s["lang"] for s in find_duplicate_concepts(bindings, langs=["en"])] == ["en"]
+
+
+def test_ancestor_path_stops_on_cycles():
+    concepts = collect_concepts([_row("A", "A|en", "B", "B|en"), _row("B", "B|en", "A", "A|en")])
+    assert ancestor_path(NS + "A", concepts) == [NS + "B", NS + "A"]
@@ -0,0 +1,160 @@
+import urllib.error
+
+import pytest
+import requests
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError, QueryBadFormed
+
+from routers import admin_router, taxonomy_router
+from utils import request_profiling
+from utils.graphdb_routing import ReadRouter, is_endpoint_failure, reading_at_revision, required_read_revision
+
+PRIMARY = "http://primary/repositories/r"
+REPLICAS = ["http://replica1/repositories/r", "http://replica2/repositories/r"]
+
+
+def _router(read_your_writes=False, read_from_primary=False) -> ReadRouter:
+    router = ReadRouter(PRIMARY, PRIMARY + "/statements", REPLICAS,
+                        read_from_primary=read_from_primary, read_your_writes=read_your_writes)
+    # No health-check or marker threads in tests; revisions and health are set by hand
+    router._threads_started = True
+    return router
+
+
+def _http_error(status: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.exceptions.HTTPError(f"{status}", response=response)
+
+
+def test_reads_are_spread_over_healthy_replicas():
+    router = _router()
+    used = [router.call(lambda url: url) for _ in range(4)]
+    assert sorted(used) == sorted(REPLICAS * 2)
+
+    router.replicas[0].healthy = False
+    assert {router.call(lambda url: url) for _ in range(3)} == {REPLICAS[1]}
+
+
+def test_busiest_endpoint_is_avoided():
+    router = _router()
+    with router.acquire() as first:
+        with router.acquire() as second:
+            assert first != second
+
+
+def test_lagging_replicas_are_skipped_for_a_required_revision():
+    router = _router()
+    router.replicas[0].revision = 5
+    router.replicas[1].revision = 3
+    token = required_read_revision.set(4)
+    try:
+        assert {router.call(lambda url: url) for _ in range(3)} == {REPLICAS[0]}
+    finally:
+        required_read_revision.reset(token)
+    with reading_at_revision(6):
+        assert router.call(lambda url: url) == PRIMARY
+    assert required_read_revision.get() == 0
+
+
+def test_read_your_writes_follows_this_workers_writes_only():
+    router = _router(read_your_writes=True)
+    assert router.written_revision == 0
+    assert router.call(lambda url: url) in REPLICAS
+
+    router.on_change({"rev": 7, "type": "concept_added"})
+    assert router.written_revision == 7
+    assert router.call(lambda url: url) == PRIMARY
+    router.replicas[1].revision = 7
+    assert router.call(lambda url: url) == REPLICAS[1]
+
+
+def test_failed_replica_is_retried_elsewhere_and_counted_once():
+    router = _router()
+    calls = []
+
+    def read(url):
+        calls.append(url)
+        if url == REPLICAS[0]:
+            raise requests.exceptions.ConnectionError("refused")
+        return url
+
+    results = [router.call(read) for _ in range(2)]
+    assert results == [REPLICAS[1], REPLICAS[1]]
+    assert calls.count(REPLICAS[0]) == 1
+    assert router.replicas[0].failures == 1
+    assert router.replicas[0].healthy is False
+    assert router.replicas[1].failures == 0
+
+
+@pytest.mark.parametrize("error", [
+    _http_error(503),
+    EndPointInternalError("boom"),
+    urllib.error.HTTPError(PRIMARY, 502, "Bad Gateway", None, None),
+    requests.exceptions.Timeout("slow"),
+])
+def test_server_errors_fail_over(error):
+    router = _router()
+    router.replicas[1].healthy = False
+
+    def read(url):
+        if url != PRIMARY:
+            raise error
+        return url
+
+    assert router.call(read) == PRIMARY
+    assert router.replicas[0].failures == 1
+
+
+@pytest.mark.parametrize("error", [_http_error(400), QueryBadFormed("bad query"),
+                                   urllib.error.HTTPError(PRIMARY, 404, "Not Found", None, None)])
+def test_query_errors_do_not_fail_over(error):
+    router = _router()
+
+    def read(url):
+        raise error
+
+    with pytest.raises(type(error)):
+        router.call(read)
+    assert all(replica.healthy and replica.failures == 0 for replica in router.replicas)
+    assert not is_endpoint_failure(error)
+
+
+def test_primary_failure_is_raised_and_counted_once():
+    router = _router()
+    for replica in router.replicas:
+        replica.healthy = False
+
+    def read(url):
+        raise requests.exceptions.ConnectionError("down")
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        router.call(read)
+    assert router.primary.failures == 1
+    assert router.primary.outstanding == 0
+
+
+def test_without_replicas_everything_reads_the_primary():
+    router = ReadRouter(PRIMARY, PRIMARY + "/statements", [])
+    router.on_change({"rev": 3, "type": "concept_added"})
+    assert router.call(lambda url: url) == PRIMARY
+    assert router.written_revision == 0
+
+
+def test_admin_status_endpoints_need_the_admin_token(monkeypatch):
+    monkeypatch.setattr(request_profiling, "PROFILING_TOKEN", "secret-token")
+    app = FastAPI()
+    app.include_router(admin_router.router)
+    app.include_router(taxonomy_router.router)
+    client = TestClient(app)
+
+    assert client.get("/graphdb/read_endpoints").status_code == 404
+    assert client.get("/admin/graphdb/read_endpoints").status_code == 403
+    assert client.get("/admin/graphdb/read_endpoints", headers={"X-Profile": "wrong"}).status_code == 403
+    response = client.get("/admin/graphdb/read_endpoints", headers={"X-Profile": "secret-token"})
+    assert response.status_code == 200
+    assert "endpoints" in response.json()
+    assert client.get("/cache/stats").status_code == 404
+    assert client.get("/admin/cache/stats").status_code == 403
+    assert "entries" in client.get("/admin/cache/stats", headers={"X-Profile": "secret-token"}).json()
@@ -0,0 +1,128 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from routers import taxonomy_router
+from utils import graphdb_utils
+from utils.graphdb_utils import build_hierarchy_graph, build_hierarchy_tree, nest_hierarchy_graph
+from utils.response_cache import ResponseCache
+
+NS = "http://example.org/taxonomy/"
+
+
+def _rows(edges, lonely=()):
+    """get_taxonomy_hierarchy rows for (parent, child) edges, plus concepts without children."""
+    rows = [{"class": {"value": NS + parent}, "classLabelsInfo": {"value": f"{parent}|en"},
+             "subClass": {"value": NS + child}, "subClassLabelsInfo": {"value": f"{child}|en"}}
+            for parent, child in edges]
+    rows += [{"class": {"value": NS + name}, "classLabelsInfo": {"value": f"{name}|en"}} for name in lonely]
+    return rows
+
+
+def _short(nodes):
+    """(name, ref, parents, children) per node, with URIs shortened to local names."""
+    return [(node["key"][len(NS):], node.get("ref", False),
+             [parent[len(NS):] for parent in node.get("parents", [])], _short(node["children"]))
+            for node in nodes]
+
+
+DIAMOND = [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D"), ("D", "E")]
+
+
+def test_graph_keeps_every_concept_once_with_all_parents():
+    graph = build_hierarchy_graph(_rows(DIAMOND + [("A", "B")], lonely=["E", "F"]))
+    assert graph["roots"] == [NS + "A", NS + "F"]
+    assert len(graph["nodes"]) == 6
+    assert graph["nodes"][NS + "D"]["parents"] == [NS + "B", NS + "C"]
+    assert graph["nodes"][NS + "A"]["children"] == [NS + "B", NS + "C"]
+    assert graph["nodes"][NS + "E"]["labels"] == [{"value": "E", "lang": "en"}]
+
+
+def test_diamond_nests_one_full_node_and_a_reference():
+    tree = nest_hierarchy_graph(build_hierarchy_graph(_rows(DIAMOND)))
+    assert _short(tree) == [
+        ("A", False, [], [
+            ("B", False, [], [("D", False, ["B", "C"], [("E", False, [], [])])]),
+            ("C", False, [], [("D", True, [], [])]),
+        ]),
+    ]
+    reference = tree[0]["children"][1]["children"][0]
+    assert reference == {"key": NS + "D", "title": "D", "ref": True, "children": []}
+
+
+def test_concept_is_placed_under_the_parent_closest_to_a_root():
+    # D hangs under the deep C and directly under the root; the full copy goes under the root
+    tree = build_hierarchy_tree(_rows([("A", "B"), ("B", "C"), ("C", "D"), ("A", "D")]))
+    assert _short(tree) == [
+        ("A", False, [], [
+            ("B", False, [], [("C", False, [], [("D", True, [], [])])]),
+            ("D", False, ["C", "A"], []),
+        ]),
+    ]
+
+
+def test_concepts_only_on_a_cycle_become_extra_roots():
+    tree = build_hierarchy_tree(_rows([("R", "S"), ("X", "Y"), ("Y", "X")]))
+    assert _short(tree) == [
+        ("R", False, [], [("S", False, [], [])]),
+        ("X", False, ["Y"], [("Y", False, [], [("X", True, [], [])])]),
+    ]
+
+
+def test_a_cycle_below_a_root_ends_in_a_reference():
+    tree = build_hierarchy_tree(_rows([("A", "B"), ("B", "C"), ("C", "B")]))
+    assert _short(tree) == [
+        ("A", False, [], [("B", False, ["A", "C"], [("C", False, [], [("B", True, [], [])])])]),
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(taxonomy_router, "response_cache", ResponseCache(1 << 20))
+    app = FastAPI()
+    app.include_router(taxonomy_router.router)
+    return TestClient(app)
+
+
+def test_taxonomy_graph_endpoint_serves_the_node_table(client, monkeypatch):
+    requested = []
+
+    def hierarchy(langs=None, fields=None):
+        requested.append((langs, fields))
+        return _rows(DIAMOND)
+
+    monkeypatch.setattr(taxonomy_router, "get_taxonomy_hierarchy", hierarchy)
+    response = client.get("/taxonomy-graph", params={"lang": "uk,en", "fields": "title"})
+    assert response.status_code == 200
+    graph = response.json()
+    assert requested == [(["uk", "en"], ["title"])]
+    assert graph["roots"] == [NS + "A"]
+    assert graph["nodes"][NS + "D"] == {"key": NS + "D", "title": "D", "children": [NS + "E"],
+                                        "parents": [NS + "B", NS + "C"]}
+
+
+def test_concept_parents_endpoint_lists_every_parent(client, monkeypatch):
+    queries = []
+    monkeypatch.setattr(graphdb_utils, "run_ask_query", lambda query: True)
+
+    def select(endpoint, query):
+        queries.append(query)
+        return {"results": {"bindings": [
+            {"parent": {"value": NS + "B"}, "labelsInfo": {"value": "Бі|uk||Bee|en"}},
+            {"parent": {"value": NS + "C"}},
+        ]}}
+
+    monkeypatch.setattr(graphdb_utils, "_select", select)
+    response = client.get("/concept_parents", params={"concept_uri": NS + "D", "lang": "en"})
+    assert response.status_code == 200
+    assert response.json() == {"concept_uri": NS + "D", "parents": [
+        {"key": NS + "B", "title": "B", "labels": [{"value": "Bee", "lang": "en"}]},
+        {"key": NS + "C", "title": "C", "labels": []},
+    ]}
+    assert f"<{NS}D>" in queries[0]
+
+
+def test_concept_parents_endpoint_rejects_unsafe_uris(client, monkeypatch):
+    monkeypatch.setattr(graphdb_utils, "run_ask_query", lambda query: pytest.fail("queried GraphDB"))
+    response = client.get("/concept_parents", params={"concept_uri": NS + "D> } #"})
+    assert response.status_code == 400
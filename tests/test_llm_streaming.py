@@ -0,0 +1,109 @@
+import asyncio
+
+from utils import llm_streaming
+from utils.llm_streaming import TurtleStatementStream, _statements_to_ntriples, stream_taxonomy_into_graphdb
+from utils.llm_utils import LLMProvider
+
+TTL = """Ось таксономія:
+```turtle
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ex: <http://example.org/taxonomy/> .
+
+ex:Animals a rdfs:Class ;
+    rdfs:label "Тварини"@uk .
+
+ex:Cats a rdfs:Class ;
+    rdfs:subClassOf ex:Animals ;
+    rdfs:label "Коти; домашні"@uk .
+
+ex:Dogs a rdfs:Class ;
+    rdfs:subClassOf ex:Animals .
+```
+Done."""
+
+
+class _ChunkedProvider(LLMProvider):
+    name = "test"
+
+    def __init__(self, text: str, size: int):
+        self.text = text
+        self.size = size
+
+    async def generate(self, prompt: str) -> str:
+        return self.text
+
+    async def stream(self, prompt: str):
+        for start in range(0, len(self.text), self.size):
+            yield self.text[start:start + self.size]
+
+
+def _feed_in_chunks(text: str, size: int):
+    reader = TurtleStatementStream()
+    statements = []
+    for start in range(0, len(text), size):
+        statements.extend(reader.feed(text[start:start + size]))
+    rest, remainder = reader.finish()
+    return reader, statements + rest, remainder
+
+
+def test_statements_do_not_depend_on_chunk_boundaries():
+    expected = _feed_in_chunks(TTL, len(TTL))[1]
+    assert len(expected) == 3
+    for size in (1, 3, 7, 64):
+        reader, statements, remainder = _feed_in_chunks(TTL, size)
+        assert statements == expected
+        assert remainder == ""
+        assert len(reader.prefixes) == 2
+
+
+def test_text_around_the_turtle_is_ignored():
+    reader, statements, _ = _feed_in_chunks(TTL, 5)
+    assert statements[0].startswith("ex:Animals")
+    assert not any("Done" in statement for statement in statements)
+
+
+def test_truncated_statement_is_reported_as_remainder():
+    cut = TTL[:TTL.index("ex:Dogs") + 30]
+    _, statements, remainder = _feed_in_chunks(cut, 4)
+    assert len(statements) == 2
+    assert remainder.startswith("ex:Dogs")
+
+
+def test_unparsable_statement_is_skipped_alone():
+    reader, statements, _ = _feed_in_chunks(TTL, len(TTL))
+    broken = statements[:1] + ['ex:Broken a rdfs:Class ; rdfs:label "unterminated .'] + statements[1:]
+    ntriples, triples, concepts, skipped = _statements_to_ntriples(reader.prefixes, broken)
+    assert (triples, concepts) == (7, 3)
+    assert len(skipped) == 1 and skipped[0]["statement"].startswith("ex:Broken")
+    assert b"<http://example.org/taxonomy/Cats>" in ntriples
+
+
+def test_stream_inserts_batches_and_reports_progress(monkeypatch):
+    inserted = []
+    monkeypatch.setattr(llm_streaming, "import_taxonomy_to_graphdb",
+                        lambda **kwargs: inserted.append(kwargs["file_content_bytes"]))
+    monkeypatch.setattr(llm_streaming, "publish_change", lambda *args, **kwargs: None)
+    monkeypatch.setattr(llm_streaming, "LLM_STREAM_BATCH_STATEMENTS", 2)
+
+    async def collect():
+        return [event async for event in stream_taxonomy_into_graphdb("corpus", "statements",
+                                                                      provider=_ChunkedProvider(TTL, 9))]
+
+    events = asyncio.run(collect())
+    assert [event["event"] for event in events] == ["started", "batch", "batch", "done"]
+    assert events[-1]["statements"] == 3
+    assert events[-1]["concepts"] == 3
+    assert events[-1]["truncated"] is False
+    assert len(inserted) == 2
+
+
+def test_stream_without_turtle_ends_with_an_error(monkeypatch):
+    monkeypatch.setattr(llm_streaming, "import_taxonomy_to_graphdb", lambda **kwargs: None)
+
+    async def collect():
+        return [event async for event in stream_taxonomy_into_graphdb(
+            "corpus", "statements", provider=_ChunkedProvider("Вибачте, не можу.", 4))]
+
+    events = asyncio.run(collect())
+    assert events[-1]["event"] == "error"
+    assert "@prefix" in events[-1]["detail"]
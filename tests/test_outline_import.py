@@ -0,0 +1,176 @@
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from rdflib import Graph, URIRef
+from rdflib.namespace import RDFS
+
+from routers import taxonomy_router
+from utils import graphdb_utils, outline_import
+from utils.graphdb_utils import build_hierarchy_tree, mint_concept_uri
+from utils.outline_import import (
+    assign_uris,
+    chunk_triples,
+    compile_triples,
+    import_outline,
+    parse_csv,
+    parse_json_tree,
+    parse_outline,
+)
+
+NS = "http://example.org/taxonomy/"
+
+
+def _shape(nodes):
+    return [(node.name, _shape(node.children)) if node.children else node.name for node in nodes]
+
+
+def _ntriples(roots, parent_uri=None) -> Graph:
+    graph = Graph()
+    graph.parse(data="\n".join(line for lines in compile_triples(roots, parent_uri) for line in lines), format="nt")
+    return graph
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Машинне навчання", NS + "Машинне_навчання"),
+    ("  C++ / C#  ", NS + "C%2B%2B_%2F_C%23"),
+    ("a<b>{c}", NS + "a%3Cb%3E%7Bc%7D"),
+    (".", NS + "%2E"),
+    ("..", NS + "%2E%2E"),
+    ("..hidden.name", NS + "%2E%2Ehidden.name"),
+    ("", NS + "concept"),
+])
+def test_mint_concept_uri(name, expected):
+    assert mint_concept_uri(name) == expected
+
+
+def test_outline_nesting_bullets_and_definitions():
+    text = "# comment\nAnimals\n\t- Cats :: Small felines\n\t\t* Siamese\n    Dogs\nPlants\n"
+    roots = parse_outline(text, lang="en")
+    assert _shape(roots) == [("Animals", [("Cats", ["Siamese"]), "Dogs"]), "Plants"]
+    cats = roots[0].children[0]
+    assert cats.labels == [("Cats", "en")]
+    assert cats.definitions == [("Small felines", "en")]
+
+
+def test_csv_paths_create_missing_ancestors_and_language_columns():
+    text = "path,label@uk,definition\nAnimals/Cats,Коти,Small felines\nAnimals/Dogs,,\n"
+    roots = parse_csv(text, lang="en")
+    assert _shape(roots) == [("Animals", ["Cats", "Dogs"])]
+    animals, (cats, dogs) = roots[0], roots[0].children
+    assert animals.labels == [("Animals", "en")]
+    assert cats.labels == [("Коти", "uk")]
+    assert cats.definitions == [("Small felines", "en")]
+    assert dogs.labels == [("Dogs", "en")]
+
+
+def test_csv_without_path_column_is_rejected():
+    with pytest.raises(HTTPException) as excinfo:
+        parse_csv("name\nAnimals\n")
+    assert excinfo.value.status_code == 400
+
+
+def test_minted_uris_avoid_existing_ones_and_each_other():
+    roots = parse_outline("Cats\n  Cats\nCats\n")
+    count = assign_uris(roots, {NS + "Cats"})
+    assert count == 3
+    assert [roots[0].uri, roots[0].children[0].uri, roots[1].uri] == [NS + "Cats_2", NS + "Cats_3", NS + "Cats_4"]
+
+
+def test_taxonomy_tree_output_imports_back_with_keys_and_all_parents():
+    rows = [
+        {"class": {"value": NS + "Animals"}, "classLabelsInfo": {"value": "Тварини|uk"},
+         "subClass": {"value": NS + "Pets"}, "subClassLabelsInfo": {"value": "Pets|en"}},
+        {"class": {"value": NS + "Animals"}, "classLabelsInfo": {"value": "Тварини|uk"},
+         "subClass": {"value": NS + "Cats"}, "subClassLabelsInfo": {"value": "Cats|en"}},
+        {"class": {"value": NS + "Pets"}, "classLabelsInfo": {"value": "Pets|en"},
+         "subClass": {"value": NS + "Cats"}, "subClassLabelsInfo": {"value": "Cats|en"}},
+        {"class": {"value": NS + "Cats"}, "classLabelsInfo": {"value": "Cats|en"}},
+    ]
+    exported = json.loads(json.dumps(build_hierarchy_tree(rows)))
+
+    roots = parse_json_tree(exported)
+    assert assign_uris(roots, {NS + "Other"}) == 3
+    graph = _ntriples(roots)
+    assert {str(parent) for parent in graph.objects(URIRef(NS + "Cats"), RDFS.subClassOf)} == {
+        NS + "Animals", NS + "Pets"}
+    assert len(set(graph.subjects(RDFS.label, None))) == 3
+
+
+def test_references_outside_the_document_are_not_written():
+    roots = parse_json_tree({"key": NS + "A", "title": "A", "children": [{"key": NS + "Elsewhere", "ref": True}]})
+    assign_uris(roots, set())
+    assert not list(_ntriples(roots).triples((URIRef(NS + "Elsewhere"), None, None)))
+
+
+@pytest.mark.parametrize("document", [
+    {"key": NS + "A> . <x> <y> <z", "title": "A"},
+    [{"key": NS + "A", "title": "A"}, {"key": NS + "A", "title": "A again"}],
+])
+def test_bad_or_repeated_keys_are_rejected(document):
+    with pytest.raises(HTTPException) as excinfo:
+        assign_uris(parse_json_tree(document), set())
+    assert excinfo.value.status_code == 400
+
+
+def test_chunks_never_split_a_concept():
+    roots = parse_outline("\n".join(f"Concept {i} :: definition {i}" for i in range(20)))
+    assign_uris(roots, set())
+    concepts = list(compile_triples(roots))
+    chunks = chunk_triples(iter(concepts), max_bytes=600)
+    assert len(chunks) > 1
+    assert sum(chunks, []) == sum(concepts, [])
+    for chunk in chunks:
+        assert chunk[0].endswith("<http://www.w3.org/2000/01/rdf-schema#Class> .")
+
+
+@pytest.mark.parametrize("parent_uri", ["http://example.org/taxonomy/A> } ; DROP ALL ; INSERT DATA { <x",
+                                        "http://example.org/taxonomy/a b"])
+def test_unsafe_parent_uri_is_rejected_before_querying(monkeypatch, parent_uri):
+    monkeypatch.setattr(outline_import, "run_ask_query", lambda query: pytest.fail("queried GraphDB"))
+    with pytest.raises(HTTPException) as excinfo:
+        import_outline(b"Animals\n", "outline", "statements", parent_uri=parent_uri)
+    assert excinfo.value.status_code == 400
+
+
+def test_add_subconcept_rejects_an_unsafe_parent_uri(monkeypatch):
+    monkeypatch.setattr(taxonomy_router, "add_subconcept_to_graphdb", lambda *args: pytest.fail("wrote to GraphDB"))
+    app = FastAPI()
+    app.include_router(taxonomy_router.router)
+    response = TestClient(app).post("/add_subconcept", json={"concept_name": "Cats",
+                                                             "parent_concept_uri": NS + "A> } ; DROP ALL ; #"})
+    assert response.status_code == 400
+
+
+def test_dry_run_previews_uris_under_the_parent(monkeypatch):
+    monkeypatch.setattr(outline_import, "run_ask_query", lambda query: True)
+    monkeypatch.setattr(outline_import, "get_existing_concept_uris", lambda: {NS + "Cats"})
+    monkeypatch.setattr(outline_import, "insert_triples_in_graphdb", lambda *args: pytest.fail("wrote to GraphDB"))
+    result = import_outline(b"Cats\n  Kittens\n", "outline", "statements", lang="en",
+                            parent_uri=NS + "Animals", dry_run=True)
+    assert result["roots"] == [NS + "Cats_2"]
+    assert [(item["uri"], item["parent"]) for item in result["preview"]] == [
+        (NS + "Cats_2", NS + "Animals"), (NS + "Kittens", NS + "Cats_2")]
+
+
+def test_several_chunks_are_inserted_in_one_transaction(monkeypatch):
+    calls = []
+
+    class FakeTransaction:
+        def __init__(self, endpoint):
+            calls.append(("begin", endpoint))
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc, traceback):
+            calls.append(("commit",) if exc_type is None else ("rollback",))
+            return False
+
+        def update(self, query):
+            calls.append(("update", query.count("\n") - 1))
+
+    monkeypatch.setattr(graphdb_utils, "GraphDBTransaction", FakeTransaction)
+    graphdb_utils.insert_triples_in_graphdb([["<a> <b> <c> ."] * 2, ["<d> <e> <f> ."]], "statements")
+    assert calls == [("begin", "statements"), ("update", 2), ("update", 1), ("commit",)]
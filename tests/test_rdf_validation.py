@@ -0,0 +1,84 @@
+from utils.rdf_validation import (
+    split_turtle_statements,
+    repair_truncated_turtle,
+    rdf_format_for_filename,
+    validate_rdf,
+    _find_cycles,
+)
+
+PREFIXES = """@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix ex: <http://example.org/taxonomy/> .
+"""
+
+
+def test_format_by_extension():
+    assert rdf_format_for_filename("a.TTL") == "turtle"
+    assert rdf_format_for_filename("dir/a.rdf") == "xml"
+    assert rdf_format_for_filename("a.nt") == "nt"
+    assert rdf_format_for_filename("a.txt") is None
+
+
+def test_split_ignores_dots_in_iris_literals_and_comments():
+    text = ('<http://a.b/c> <http://a.b/p> "x. y" . # comment. here\n'
+            'ex:a rdfs:comment """multi.\nline.""" .\n'
+            'ex:b ex:p [ ex:q "v" . ] .')
+    statements, remainder = split_turtle_statements(text, final=True)
+    assert len(statements) == 3
+    assert statements[0].startswith("<http://a.b/c>")
+    assert remainder.strip() == ""
+
+
+def test_split_keeps_trailing_dot_until_final():
+    statements, remainder = split_turtle_statements("ex:a ex:p ex:b.c", final=False)
+    assert statements == []
+    assert remainder == "ex:a ex:p ex:b.c"
+    statements, remainder = split_turtle_statements("ex:a ex:p ex:b .", final=False)
+    assert statements == []
+    statements, _ = split_turtle_statements("ex:a ex:p ex:b .", final=True)
+    assert statements == ["ex:a ex:p ex:b ."]
+
+
+def test_repair_drops_unterminated_tail():
+    repaired, dropped = repair_truncated_turtle(PREFIXES + 'ex:a a rdfs:Class .\nex:b rdfs:label "unfinis')
+    assert "ex:a a rdfs:Class ." in repaired
+    assert "unfinis" not in repaired
+    assert dropped == len('ex:b rdfs:label "unfinis')
+
+
+def test_find_cycles_reports_only_multi_node_components():
+    edges = [("a", "b"), ("b", "c"), ("c", "a"), ("d", "a"), ("e", "e")]
+    assert _find_cycles(edges) == [["a", "b", "c"]]
+    assert _find_cycles([("a", "b"), ("b", "c")]) == []
+
+
+def test_validate_reports_cycles_as_errors():
+    content = (PREFIXES + """
+        ex:A a rdfs:Class ; rdfs:subClassOf ex:B ; rdfs:label "A" .
+        ex:B a rdfs:Class ; rdfs:subClassOf ex:A ; rdfs:label "B" .
+    """).encode()
+    report, ntriples = validate_rdf(content, "turtle")
+    assert not report["valid"]
+    assert ntriples == b""
+    assert report["cycles"] == [["http://example.org/taxonomy/A", "http://example.org/taxonomy/B"]]
+
+
+def test_validate_warns_about_dangling_parents_and_missing_labels():
+    content = (PREFIXES + "ex:A a rdfs:Class ; rdfs:subClassOf ex:Missing .").encode()
+    report, ntriples = validate_rdf(content, "turtle")
+    assert report["valid"]
+    assert report["dangling_parents"] == [{"concept": "http://example.org/taxonomy/A",
+                                           "parent": "http://example.org/taxonomy/Missing"}]
+    assert report["missing_labels"] == ["http://example.org/taxonomy/A"]
+    assert b"<http://example.org/taxonomy/A>" in ntriples
+
+
+def test_validate_repairs_truncated_turtle_only_when_asked():
+    content = (PREFIXES + 'ex:A a rdfs:Class ; rdfs:label "A" .\nex:B a rdfs:Cla').encode()
+    report, _ = validate_rdf(content, "turtle")
+    assert not report["valid"] and report["errors"]
+
+    report, ntriples = validate_rdf(content, "turtle", repair=True)
+    assert report["valid"] and report["repaired"]
+    assert report["class_count"] == 1
+    assert ntriples.count(b"\n") == report["triple_count"]
@@ -0,0 +1,110 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from utils import request_profiling
+from utils.request_profiling import (
+    RequestProfile,
+    _Span,
+    load_profile,
+    server_timing_header,
+    profiling_middleware,
+    span,
+)
+
+TOKEN = "secret-token"
+
+
+def parse_concat_results(value):
+    # Same name as a PROFILED_FUNCTIONS entry, so its time shows up in Server-Timing
+    return [part for part in value.split("||") for _ in range(200)]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(request_profiling, "PROFILING_TOKEN", TOKEN)
+    monkeypatch.setattr(request_profiling, "PROFILING_ENABLED", True)
+    app = FastAPI()
+    app.middleware("http")(profiling_middleware)
+
+    def offloaded():
+        with span("build"):
+            return parse_concat_results("a|en||b|uk" * 50)
+
+    @app.get("/work")
+    async def work():
+        with span("loop_stage"):
+            pass
+        values = await asyncio.to_thread(offloaded)
+        return {"count": len(values)}
+
+    return TestClient(app)
+
+
+def test_requests_without_the_token_are_not_profiled(client):
+    response = client.get("/work", headers={"X-Profile": "wrong"})
+    assert response.status_code == 200
+    assert "Server-Timing" not in response.headers
+    assert "X-Profile-Id" not in response.headers
+
+
+def test_cprofile_mode_reports_stages_and_offloaded_functions(client):
+    response = client.get("/work", headers={"X-Profile": TOKEN})
+    timing = response.headers["Server-Timing"]
+    for name in ("app;dur=", "loop_stage;dur=", "build;dur=", "parse_concat_results;dur="):
+        assert name in timing
+
+    saved = load_profile(response.headers["X-Profile-Id"])
+    assert saved["mode"] == "cprofile"
+    assert saved["path"] == "/work"
+    assert "parse_concat_results" in saved["top_functions"]
+    # Only the worker thread was profiled, never the event loop running the middleware
+    assert "profiling_middleware" not in saved["top_functions"]
+
+
+def test_timing_mode_skips_cprofile(client):
+    response = client.get("/work", headers={"X-Profile": TOKEN, "X-Profile-Mode": "timing"})
+    assert "build;dur=" in response.headers["Server-Timing"]
+    assert "parse_concat_results" not in response.headers["Server-Timing"]
+    assert load_profile(response.headers["X-Profile-Id"])["mode"] == "timing"
+
+
+def test_concurrent_cprofile_request_falls_back_to_timing(client):
+    request_profiling._cprofile_slot.acquire()
+    try:
+        response = client.get("/work", headers={"X-Profile": TOKEN})
+    finally:
+        request_profiling._cprofile_slot.release()
+    assert load_profile(response.headers["X-Profile-Id"])["mode"] == "timing"
+
+
+def test_spans_on_the_event_loop_are_timed_but_not_profiled():
+    profile = RequestProfile("cprofile")
+
+    async def on_loop():
+        with _Span(profile, "loop"):
+            sum(range(1000))
+        await asyncio.to_thread(in_worker)
+
+    def in_worker():
+        with _Span(profile, "worker"):
+            sum(range(1000))
+
+    asyncio.run(on_loop())
+    assert [name for name, _, _ in profile.spans] == ["loop", "worker"]
+    assert len(profile._profilers) == 1
+    assert threading.get_ident() not in profile._profilers
+
+
+def test_server_timing_header_format():
+    header = server_timing_header({"sparql": {"count": 2, "ms": 12.34}, "encode": {"count": 1, "ms": 1.0}},
+                                  {"parse_concat_results": 3.21})
+    assert header == 'sparql;dur=12.3;desc="2 calls", encode;dur=1.0, parse_concat_results;dur=3.2'
+
+
+def test_span_is_a_no_op_outside_profiled_requests(monkeypatch):
+    monkeypatch.setattr(request_profiling, "PROFILING_ENABLED", True)
+    assert span("x") is request_profiling._NULL_SPAN
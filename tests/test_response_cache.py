@@ -0,0 +1,182 @@
+import asyncio
+import gzip
+import mmap
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from routers import taxonomy_router
+from routers.taxonomy_router import _cached_response
+from utils import response_cache as response_cache_module
+from utils import tree_snapshot as tree_snapshot_module
+from utils.response_cache import CachedBody, ResponseCache, choose_encoding
+from utils.tree_snapshot import TreeSnapshot
+
+BODY = b'{"tree":"' + b"x" * 4096 + b'"}'
+
+
+def _builder(body=BODY, calls=None):
+    async def build():
+        if calls is not None:
+            calls.append(1)
+        await asyncio.sleep(0)
+        return body, "application/json"
+    return build
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0.5, br;q=0.9", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("identity", None),
+    ("*", "br"),
+    ("gzip;q=oops", None),
+])
+def test_choose_encoding(header, expected):
+    assert choose_encoding(header, available=("br", "gzip")) == expected
+
+
+def test_concurrent_misses_build_once():
+    cache = ResponseCache(1 << 20)
+    calls = []
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_build(("tree",), _builder(calls=calls), 1) for _ in range(5)))
+
+    entries = asyncio.run(run())
+    assert len(calls) == 1
+    assert all(entry is entries[0] for entry in entries)
+    assert (cache.misses, cache.hits) == (1, 4)
+
+
+def test_failed_build_is_not_cached():
+    cache = ResponseCache(1 << 20)
+
+    async def failing():
+        raise RuntimeError("GraphDB down")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(cache.get_or_build(("tree",), failing, 1))
+    calls = []
+    asyncio.run(cache.get_or_build(("tree",), _builder(calls=calls), 1))
+    assert calls == [1]
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = ResponseCache(3 * len(BODY))
+
+    async def run():
+        for name in ("a", "b", "c"):
+            await cache.get_or_build((name,), _builder(), 1)
+        await cache.get_or_build(("a",), _builder(), 1)
+        await cache.get_or_build(("d",), _builder(), 1)
+
+    asyncio.run(run())
+    assert list(cache._entries) == [("c",), ("a",), ("d",)]
+    assert cache.evictions == 1
+    assert cache.total_bytes == 3 * len(BODY)
+
+
+def test_compressed_variants_count_towards_the_budget():
+    cache = ResponseCache(1 << 20)
+
+    async def run():
+        entry = await cache.get_or_build(("tree",), _builder(), 1)
+        encoding, body = await cache.variant(("tree",), entry, "gzip")
+        again = await cache.variant(("tree",), entry, "gzip")
+        return entry, encoding, body, again
+
+    entry, encoding, body, again = asyncio.run(run())
+    assert encoding == "gzip" and gzip.decompress(body) == BODY
+    assert again[1] is body
+    assert cache.total_bytes == len(BODY) + len(body)
+
+
+def test_failed_compression_is_retried(monkeypatch):
+    cache = ResponseCache(1 << 20)
+    attempts = []
+    real_compress = response_cache_module._compress
+
+    def flaky(body, encoding):
+        attempts.append(encoding)
+        if len(attempts) == 1:
+            raise MemoryError("no room")
+        return real_compress(body, encoding)
+
+    monkeypatch.setattr(response_cache_module, "_compress", flaky)
+
+    async def run():
+        entry = await cache.get_or_build(("tree",), _builder(), 1)
+        with pytest.raises(MemoryError):
+            await cache.variant(("tree",), entry, "gzip")
+        return await cache.variant(("tree",), entry, "gzip")
+
+    encoding, body = asyncio.run(run())
+    assert gzip.decompress(body) == BODY
+    assert attempts == ["gzip", "gzip"]
+
+
+def test_small_bodies_are_sent_uncompressed():
+    cache = ResponseCache(1 << 20)
+
+    async def run():
+        entry = await cache.get_or_build(("small",), _builder(b"[]"), 1)
+        return await cache.variant(("small",), entry, "gzip")
+
+    assert asyncio.run(run()) == (None, b"[]")
+
+
+def test_mapped_body_is_served_without_a_copy():
+    with mmap.mmap(-1, len(BODY)) as mapping:
+        mapping[:] = BODY
+        view = memoryview(mapping)
+        entry = CachedBody(view, "application/json", 3)
+        assert entry.variants[None] is view
+        assert entry.etag == CachedBody(BODY, "application/json", 3).etag
+        assert entry.etag != CachedBody(BODY, "application/json", 4).etag
+        view.release()
+
+
+def test_cached_response_etag_and_encoding():
+    app = FastAPI()
+    calls = []
+
+    @app.get("/cached")
+    async def cached(request: Request):
+        return await _cached_response(request, "test-cached", {}, 5, _builder(calls=calls))
+
+    client = TestClient(app)
+    first = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["Content-Encoding"] == "gzip"
+    assert first.headers["X-Taxonomy-Revision"] == "5"
+    assert first.content == BODY
+
+    cached = client.get("/cached", headers={"If-None-Match": first.headers["ETag"]})
+    assert cached.status_code == 304
+    assert calls == [1]
+
+
+def test_full_tree_rebuilt_at_the_same_revision_is_not_served_from_cache(tmp_path, monkeypatch):
+    builds = []
+
+    def build_tree():
+        builds.append(1)
+        return [{"key": f"http://example.org/build{len(builds)}", "children": []}]
+
+    monkeypatch.setattr(taxonomy_router, "tree_snapshot", TreeSnapshot(str(tmp_path), build_tree, lambda: 4))
+    monkeypatch.setattr(taxonomy_router, "response_cache", ResponseCache(1 << 20))
+    app = FastAPI()
+    app.include_router(taxonomy_router.router)
+    client = TestClient(app)
+
+    first = client.get("/taxonomy-tree")
+    assert client.get("/taxonomy-tree").content == first.content
+    assert "build1" in first.text
+
+    # Past TREE_SNAPSHOT_MAX_AGE_SECONDS the snapshot is rebuilt without a new revision
+    monkeypatch.setattr(tree_snapshot_module, "TREE_SNAPSHOT_MAX_AGE_SECONDS", 1e-9)
+    second = client.get("/taxonomy-tree")
+    assert second.headers["X-Taxonomy-Revision"] == first.headers["X-Taxonomy-Revision"] == "4"
+    assert "build2" in second.text
@@ -0,0 +1,145 @@
+import asyncio
+
+from utils.taxonomy_stats import StatsState, TaxonomyStats
+
+NS = "http://example.org/taxonomy/"
+
+
+class _Repository:
+    """Structure and literal rows as GraphDB would return them, edited alongside the events."""
+
+    def __init__(self):
+        self.edges = {}
+        self.literals = set()
+
+    def add(self, concept, parent=None):
+        self.edges.setdefault(NS + concept, set())
+        if parent:
+            self.edges[NS + concept].add(NS + parent)
+
+    def structure_rows(self):
+        for concept, parents in self.edges.items():
+            yield {"class": concept, "parent": ""}
+            for parent in parents:
+                yield {"class": concept, "parent": parent}
+
+    def literal_rows(self):
+        for kind, concept, value, lang in self.literals:
+            yield {"kind": kind, "class": concept, "value": value, "lang": lang}
+
+    def state(self):
+        return StatsState.from_rows(self.structure_rows(), self.literal_rows())
+
+
+def _sample():
+    repository = _Repository()
+    repository.add("Animals")
+    repository.add("Cats", "Animals")
+    repository.add("Dogs", "Animals")
+    repository.add("Siamese", "Cats")
+    repository.add("Stray", "Missing")
+    repository.literals |= {("label", NS + "Animals", "Тварини", "uk"), ("label", NS + "Cats", "Cats", "en"),
+                            ("definition", NS + "Cats", "Felines", "en")}
+    return repository
+
+
+def _stats(repository):
+    loads = []
+
+    def load():
+        loads.append(1)
+        return repository.state()
+
+    revision = [0]
+    stats = TaxonomyStats(load, lambda: revision[0])
+    stats.loads = loads
+    stats.revision_source = revision
+    return stats
+
+
+def _event(stats, rev, event_type, **payload):
+    stats.revision_source[0] = rev
+    stats.on_change({"rev": rev, "type": event_type, **payload})
+
+
+def _without_meta(summary):
+    return {key: value for key, value in summary.items() if key not in ("revision", "computed_at")}
+
+
+def test_summary_of_a_small_taxonomy():
+    summary = _sample().state().summary()
+    assert summary["concepts"] == 5
+    assert (summary["roots"], summary["orphans"], summary["unreachable"]) == (1, 1, 0)
+    assert summary["depth"] == {"max": 2, "mean": 0.8, "histogram": {"0": 2, "1": 2, "2": 1}}
+    assert summary["fan_out"]["histogram"] == {"0": 3, "1": 1, "2": 1}
+    assert summary["without_labels"] == 3
+    assert summary["label_coverage"] == {"en": {"concepts": 1, "ratio": 0.2}, "uk": {"concepts": 1, "ratio": 0.2}}
+
+
+def test_cycle_only_concepts_are_unreachable():
+    repository = _Repository()
+    repository.add("Root")
+    repository.add("A", "B")
+    repository.add("B", "A")
+    summary = repository.state().summary()
+    assert summary["unreachable"] == 2
+    assert summary["depth"]["histogram"] == {"0": 1}
+
+
+def test_incremental_updates_match_a_full_recompute():
+    repository = _sample()
+    stats = _stats(repository)
+    asyncio.run(stats.get())
+
+    repository.add("Kittens", "Cats")
+    _event(stats, 1, "concept_added", concept=NS + "Kittens", parent=NS + "Cats")
+    repository.add("Plants")
+    _event(stats, 2, "concept_added", concept=NS + "Plants")
+    repository.literals.add(("label", NS + "Plants", "Рослини", "uk"))
+    _event(stats, 3, "label_added", concept=NS + "Plants", literal={"value": "Рослини", "lang": "uk"})
+    repository.literals.discard(("label", NS + "Cats", "Cats", "en"))
+    repository.literals.add(("label", NS + "Cats", "Коти", "uk"))
+    _event(stats, 4, "label_updated", concept=NS + "Cats",
+           old={"value": "Cats", "lang": "en"}, new={"value": "Коти", "lang": "uk"})
+    for name in ("Cats", "Siamese", "Kittens"):
+        del repository.edges[NS + name]
+    repository.literals = {item for item in repository.literals if item[1] != NS + "Cats"}
+    _event(stats, 5, "concept_deleted", concept=NS + "Cats")
+
+    summary = asyncio.run(stats.get())
+    assert len(stats.loads) == 1
+    assert summary["revision"] == 5
+    assert _without_meta(summary) == repository.state().summary()
+
+
+def test_structural_events_trigger_one_recompute():
+    repository = _sample()
+    stats = _stats(repository)
+    asyncio.run(stats.get())
+
+    repository.add("Dogs", "Cats")
+    _event(stats, 1, "concept_moved", concept=NS + "Dogs", parent=NS + "Cats")
+    _event(stats, 2, "label_added", concept=NS + "Dogs", literal={"value": "Dogs", "lang": "en"})
+    repository.literals.add(("label", NS + "Dogs", "Dogs", "en"))
+
+    summary = asyncio.run(stats.get())
+    assert len(stats.loads) == 2
+    assert _without_meta(summary) == repository.state().summary()
+    asyncio.run(stats.get())
+    assert len(stats.loads) == 2
+
+
+def test_adding_an_existing_concept_falls_back_to_a_recompute():
+    stats = _stats(_sample())
+    asyncio.run(stats.get())
+    _event(stats, 1, "concept_added", concept=NS + "Cats", parent=NS + "Dogs")
+    asyncio.run(stats.get())
+    assert len(stats.loads) == 2
+
+
+def test_newer_revision_from_another_worker_forces_a_recompute():
+    stats = _stats(_sample())
+    asyncio.run(stats.get())
+    stats.revision_source[0] = 9
+    assert asyncio.run(stats.get())["revision"] == 9
+    assert len(stats.loads) == 2
@@ -0,0 +1,104 @@
+import pytest
+from fastapi import HTTPException
+
+from routers.taxonomy_router import _check_iri, _parse_tree_projection
+from utils.graphdb_utils import build_hierarchy_tree, select_languages
+from utils.sparql_queries import get_concept_parents_query, get_taxonomy_hierarchy_query, iri_term
+
+ROOT = "http://example.org/taxonomy/Root"
+CHILD = "http://example.org/taxonomy/Child"
+
+
+def _row(cls, labels=None, sub=None, sub_labels=None):
+    row = {"class": {"value": cls}}
+    if labels is not None:
+        row["classLabelsInfo"] = {"value": labels}
+    if sub is not None:
+        row["subClass"] = {"value": sub}
+    if sub_labels is not None:
+        row["subClassLabelsInfo"] = {"value": sub_labels}
+    return row
+
+
+def test_language_chain_is_pushed_into_the_query():
+    query = get_taxonomy_hierarchy_query(langs=["uk", "en"])
+    assert 'FILTER (LANG(?classLabel) IN ("uk", "en", ""))' in query
+    assert 'FILTER (LANG(?subClassComment) IN ("uk", "en", ""))' in query
+
+
+def test_unrequested_fields_are_not_queried():
+    query = get_taxonomy_hierarchy_query(fields=["title"])
+    assert "rdfs:label" not in query
+    assert "rdfs:comment" not in query
+    assert "classLabelsInfo" not in query
+
+    query = get_taxonomy_hierarchy_query(fields=["labels"])
+    assert "rdfs:label" in query
+    assert "rdfs:comment" not in query
+
+
+def test_subtree_query_is_anchored_at_the_root():
+    assert f"?class rdfs:subClassOf* <{ROOT}> ." in get_taxonomy_hierarchy_query(root_uri=ROOT)
+
+
+@pytest.mark.parametrize("uri", [
+    "http://example.org/taxonomy/x> . } DROP ALL #",
+    "http://example.org/taxonomy/a b",
+    'http://example.org/taxonomy/"x"',
+    "http://example.org/taxonomy/{x}",
+    "http://example.org/taxonomy/x\n",
+    "http://example.org/taxonomy/x\\u003E",
+])
+def test_unsafe_iris_are_rejected(uri):
+    with pytest.raises(ValueError):
+        iri_term(uri)
+    with pytest.raises(ValueError):
+        get_taxonomy_hierarchy_query(root_uri=uri)
+    with pytest.raises(HTTPException) as excinfo:
+        _check_iri(uri)
+    assert excinfo.value.status_code == 400
+
+
+def test_empty_iri_is_rejected():
+    with pytest.raises(ValueError):
+        iri_term("")
+
+
+def test_iri_with_unicode_and_query_characters_is_accepted():
+    uri = "http://example.org/taxonomy/Тварини?x=1&y=%20#frag"
+    assert iri_term(uri) == f"<{uri}>"
+
+
+def test_fallback_chain_keeps_the_first_available_language():
+    literals = [{"value": "Animal", "lang": "en"}, {"value": "Tier", "lang": "de"}, {"value": "Raw", "lang": None}]
+    assert select_languages(literals, ["uk", "en"]) == [{"value": "Animal", "lang": "en"}]
+    assert select_languages(literals, ["uk"]) == [{"value": "Raw", "lang": None}]
+    assert select_languages(literals, None) == literals
+
+
+def test_projected_tree_only_carries_requested_fields():
+    bindings = [
+        _row(ROOT, labels="Тварини|uk||Animals|en", sub=CHILD, sub_labels="Коти|uk||Cats|en"),
+        _row(CHILD, labels="Коти|uk||Cats|en"),
+    ]
+    tree = build_hierarchy_tree(bindings, langs=["en"], fields=["labels"])
+    assert len(tree) == 1
+    root = tree[0]
+    assert root["labels"] == [{"value": "Animals", "lang": "en"}]
+    assert "definitions" not in root
+    assert root["children"][0]["labels"] == [{"value": "Cats", "lang": "en"}]
+
+
+def test_projection_parameters_are_validated():
+    assert _parse_tree_projection("uk, en-GB", "title,labels") == (["uk", "en-GB"], ["title", "labels"])
+    assert _parse_tree_projection(None, None) == (None, None)
+    for lang, fields in [('uk") || true || ("', None), (None, "labels,secret")]:
+        with pytest.raises(HTTPException) as excinfo:
+            _parse_tree_projection(lang, fields)
+        assert excinfo.value.status_code == 400
+
+
+def test_parents_query_rejects_unsafe_iris():
+    with pytest.raises(ValueError):
+        get_concept_parents_query("http://example.org/taxonomy/x> ?p ?o } #")
+    assert f"<{CHILD}> rdfs:subClassOf ?parent ." in get_concept_parents_query(CHILD)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import os
+
+from utils import tree_snapshot as tree_snapshot_module
+from utils.graphdb_routing import required_read_revision
+from utils.tree_snapshot import MappedSnapshot, TreeSnapshot
+
+
+class _Builds:
+    """Counts tree builds and returns a tree labelled with the build number."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self) -> list:
+        self.count += 1
+        return [{"uri": f"http://example.org/build{self.count}", "children": []}]
+
+
+def _tree_of(snapshot: MappedSnapshot) -> str:
+    return bytes(snapshot.payload).decode("utf-8")
+
+
+def test_published_snapshot_maps_header_and_payload(tmp_path):
+    snapshot = TreeSnapshot(str(tmp_path), _Builds(), lambda: 0)
+    snapshot.publish([{"uri": "http://example.org/a", "label": "Тест"}], 7)
+
+    mapped = MappedSnapshot(snapshot.snapshot_path)
+    assert mapped.revision == 7
+    assert _tree_of(mapped) == '[{"uri":"http://example.org/a","label":"Тест"}]'
+
+
+def test_snapshot_is_reused_until_the_revision_moves(tmp_path):
+    revision = [0]
+    builds = _Builds()
+    snapshot = TreeSnapshot(str(tmp_path), builds, lambda: revision[0])
+
+    first = asyncio.run(snapshot.get())
+    assert asyncio.run(snapshot.get()) is first
+    assert builds.count == 1
+
+    revision[0] = 1
+    rebuilt = asyncio.run(snapshot.get())
+    assert builds.count == 2
+    assert rebuilt.revision == 1
+    assert "build2" in _tree_of(rebuilt)
+
+
+def test_other_worker_maps_the_published_snapshot_without_building(tmp_path):
+    builds_a, builds_b = _Builds(), _Builds()
+    worker_a = TreeSnapshot(str(tmp_path), builds_a, lambda: 3)
+    worker_b = TreeSnapshot(str(tmp_path), builds_b, lambda: 3)
+
+    asyncio.run(worker_a.get())
+    mapped = asyncio.run(worker_b.get())
+    assert (builds_a.count, builds_b.count) == (1, 0)
+    assert "build1" in _tree_of(mapped)
+
+
+def test_old_snapshot_is_rebuilt_after_max_age(tmp_path, monkeypatch):
+    builds = _Builds()
+    snapshot = TreeSnapshot(str(tmp_path), builds, lambda: 0)
+    asyncio.run(snapshot.get())
+
+    monkeypatch.setattr(tree_snapshot_module, "TREE_SNAPSHOT_MAX_AGE_SECONDS", 1e-9)
+    asyncio.run(snapshot.get())
+    assert builds.count == 2
+
+
+def test_corrupt_snapshot_file_is_replaced(tmp_path):
+    builds = _Builds()
+    snapshot = TreeSnapshot(str(tmp_path), builds, lambda: 0)
+    with open(snapshot.snapshot_path, "wb") as f:
+        f.write(b"not a snapshot")
+
+    mapped = asyncio.run(snapshot.get())
+    assert builds.count == 1
+    assert "build1" in _tree_of(mapped)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".tmp-")]
+
+
+def test_rebuild_reads_at_the_revision_it_is_labelled_with(tmp_path):
+    seen = []
+
+    def build():
+        seen.append(required_read_revision.get())
+        return []
+
+    asyncio.run(TreeSnapshot(str(tmp_path), build, lambda: 12).get())
+    assert seen == [12]
+
+
+def test_workers_wait_for_the_one_rebuilding_instead_of_building_too(tmp_path):
+    revision = [0]
+    builds_b = _Builds()
+    worker_b = TreeSnapshot(str(tmp_path), builds_b, lambda: revision[0])
+    other_worker = []
+
+    def build_a():
+        # worker_b asks for the tree while worker_a is still querying GraphDB
+        thread = threading.Thread(target=lambda: other_worker.append(asyncio.run(worker_b.get())))
+        thread.start()
+        thread.join(0.3)
+        other_worker.append(thread)
+        return [{"uri": "http://example.org/from-a", "children": []}]
+
+    worker_a = TreeSnapshot(str(tmp_path), build_a, lambda: revision[0])
+    revision[0] = 1
+    asyncio.run(worker_a.get())
+    thread = other_worker.pop(0)
+    thread.join()
+
+    assert builds_b.count == 0
+    assert "from-a" in _tree_of(other_worker[0])
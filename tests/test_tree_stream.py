@@ -0,0 +1,111 @@
+import io
+import json
+
+import pytest
+import requests
+import urllib3
+
+from utils import tree_stream
+from utils.tree_stream import iter_sparql_rows, iter_tree_bfs, iter_tree_dfs, iter_tree_ndjson
+
+NS = "http://example.org/taxonomy/"
+
+
+@pytest.fixture
+def taxonomy(monkeypatch):
+    """Installs a hierarchy given as {parent: [children]} behind the root and children queries."""
+    queries = []
+
+    def install(children, roots):
+        def rows_for(query):
+            queries.append(query)
+            return [{"class": NS + root, "labelsInfo": f"{root}|en", "commentsInfo": ""} for root in roots]
+
+        def children_of(parent_uris, langs, fields):
+            queries.append(list(parent_uris))
+            for parent_uri in parent_uris:
+                for child in children.get(parent_uri[len(NS):], []):
+                    yield {"class": NS + child, "parent": parent_uri, "labelsInfo": f"{child}|en", "commentsInfo": ""}
+
+        monkeypatch.setattr(tree_stream, "iter_sparql_rows", rows_for)
+        monkeypatch.setattr(tree_stream, "_iter_children", children_of)
+        return queries
+    return install
+
+
+def _short(records):
+    return [(r["key"][len(NS):], r["parent"] and r["parent"][len(NS):], r["depth"], r.get("ref", False))
+            for r in records]
+
+
+def test_dfs_streams_in_pre_order(taxonomy):
+    taxonomy({"A": ["B", "C"], "B": ["D"]}, ["A", "E"])
+    assert _short(iter_tree_dfs()) == [
+        ("A", None, 0, False), ("B", "A", 1, False), ("D", "B", 2, False), ("C", "A", 1, False),
+        ("E", None, 0, False),
+    ]
+
+
+def test_bfs_streams_level_by_level(taxonomy):
+    taxonomy({"A": ["B", "C"], "B": ["D"]}, ["A", "E"])
+    assert _short(iter_tree_bfs()) == [
+        ("A", None, 0, False), ("E", None, 0, False), ("B", "A", 1, False), ("C", "A", 1, False),
+        ("D", "B", 2, False),
+    ]
+
+
+@pytest.mark.parametrize("iterate", [iter_tree_dfs, iter_tree_bfs])
+def test_diamonds_stream_each_concept_once(taxonomy, iterate):
+    # Ten stacked diamonds: one record per path would be 2**10 records for the bottom concept
+    children = {}
+    for level in range(10):
+        children[f"N{level}"] = [f"L{level}", f"R{level}"]
+        children[f"L{level}"] = children[f"R{level}"] = [f"N{level + 1}"]
+    taxonomy(children, ["N0"])
+
+    records = list(iterate())
+    full = [r["key"] for r in records if not r.get("ref")]
+    assert len(full) == len(set(full)) == 31
+    assert sum(1 for r in records if r.get("ref")) == 10
+
+
+@pytest.mark.parametrize("iterate", [iter_tree_dfs, iter_tree_bfs])
+def test_cycles_end_in_a_reference(taxonomy, iterate):
+    taxonomy({"A": ["B"], "B": ["C"], "C": ["A"]}, ["A"])
+    assert _short(iterate())[-1] == ("A", "C", 3, True)
+
+
+@pytest.mark.parametrize("iterate", [iter_tree_dfs, iter_tree_bfs])
+def test_deep_chains_are_streamed_to_the_bottom(taxonomy, iterate):
+    taxonomy({f"C{level}": [f"C{level + 1}"] for level in range(150)}, ["C0"])
+    records = list(iterate())
+    assert len(records) == 151
+    assert _short(records)[-1] == ("C150", "C149", 150, False)
+
+
+def test_dfs_prefetches_children_in_batches(taxonomy, monkeypatch):
+    monkeypatch.setattr(tree_stream, "TREE_STREAM_BATCH_SIZE", 3)
+    queries = taxonomy({}, ["A", "B", "C", "D", "E"])
+    assert len(list(iter_tree_dfs())) == 5
+    assert queries[1:] == [[NS + "A", NS + "B", NS + "C"], [NS + "D", NS + "E"]]
+
+
+def test_ndjson_lines_follow_the_projection(taxonomy):
+    taxonomy({"A": ["B"]}, ["A"])
+    lines = list(iter_tree_ndjson("dfs", langs=["en"], fields=["title"]))
+    assert all(line.endswith(b"\n") for line in lines)
+    assert json.loads(lines[1]) == {"key": NS + "B", "parent": NS + "A", "depth": 1, "title": "B"}
+
+
+def test_sparql_csv_rows_are_read_from_the_response_stream(monkeypatch):
+    body = "class,labelsInfo\r\nhttp://example.org/taxonomy/A,Тварини|uk\r\n".encode("utf-8")
+
+    def call(request):
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = urllib3.HTTPResponse(body=io.BytesIO(body), preload_content=False,
+                                            headers={"Content-Length": str(len(body))})
+        return response
+
+    monkeypatch.setattr(tree_stream.read_router, "call", call)
+    assert list(iter_sparql_rows("SELECT")) == [{"class": NS + "A", "labelsInfo": "Тварини|uk"}]
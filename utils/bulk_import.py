@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import tarfile
+import zipfile
+from typing import Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+
+from utils.graphdb_utils import import_taxonomy_to_graphdb, GraphDBTransaction
+from utils.rdf_validation import validate_rdf_async, rdf_format_for_filename, NTRIPLES_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+BULK_IMPORT_CONCURRENCY = int(os.getenv("BULK_IMPORT_CONCURRENCY", 4))
+# Limits on uncompressed sizes, so a small archive cannot expand into gigabytes in memory
+BULK_IMPORT_MAX_ENTRY_BYTES = int(os.getenv("BULK_IMPORT_MAX_ENTRY_BYTES", 100 * 1024 * 1024))
+BULK_IMPORT_MAX_UPLOAD_BYTES = int(os.getenv("BULK_IMPORT_MAX_UPLOAD_BYTES", 500 * 1024 * 1024))
+
+ZIP_EXTENSIONS = (".zip",)
+TAR_EXTENSIONS = (".tar.gz", ".tgz", ".tar")
+
+
+class UploadTooLargeError(ValueError):
+    pass
+
+
+def _read_limited(stream, name: str, budget: int) -> bytes:
+    """Reads at most BULK_IMPORT_MAX_ENTRY_BYTES (and what is left of the upload's budget)."""
+    limit = min(BULK_IMPORT_MAX_ENTRY_BYTES, budget)
+    content = stream.read(limit + 1)
+    if len(content) > limit:
+        raise UploadTooLargeError(f"'{name}' перевищує допустимий розмір після розпакування "
+                                  f"({BULK_IMPORT_MAX_ENTRY_BYTES} байт на файл, "
+                                  f"{BULK_IMPORT_MAX_UPLOAD_BYTES} байт на завантаження)")
+    return content
+
+
+def iter_upload_entries(upload: UploadFile) -> Iterator[Tuple[str, bytes]]:
+    """
+    Yields (name, content) for an uploaded RDF file or for every file inside an uploaded
+    zip/tar(.gz) archive. Archive members are read one at a time from the upload's spooled
+    file, nothing is extracted to disk. Reads are blocking; advance the iterator in a thread.
+    Raises UploadTooLargeError once an entry or the whole upload exceeds the size limits.
+    """
+    filename = upload.filename or ""
+    lowered = filename.lower()
+    upload.file.seek(0)
+    budget = BULK_IMPORT_MAX_UPLOAD_BYTES
+
+    if lowered.endswith(ZIP_EXTENSIONS):
+        with zipfile.ZipFile(upload.file) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                with archive.open(info) as member:
+                    content = _read_limited(member, f"{filename}/{info.filename}", budget)
+                budget -= len(content)
+                yield f"{filename}/{info.filename}", content
+    elif lowered.endswith(TAR_EXTENSIONS):
+        mode = "r|" if lowered.endswith(".tar") else "r|gz"
+        with tarfile.open(fileobj=upload.file, mode=mode) as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                extracted = archive.extractfile(member)
+                if extracted is None:
+                    continue
+                content = _read_limited(extracted, f"{filename}/{member.name}", budget)
+                budget -= len(content)
+                yield f"{filename}/{member.name}", content
+    else:
+        yield filename, _read_limited(upload.file, filename, budget)
+
+
+async def _import_entry(name: str, content: bytes, transaction: Optional[GraphDBTransaction],
+                        graphdb_endpoint_statements: str, post_slots: asyncio.Semaphore, repair: bool) -> dict:
+    rdf_format = rdf_format_for_filename(name)
+    if rdf_format is None:
+        return {"file": name, "status": "skipped", "detail": "Непідтримуваний формат файлу"}
+
+    try:
+        report, ntriples = await validate_rdf_async(content, rdf_format, repair=repair, source=name)
+    except Exception as e:
+        logger.error(f"Validation of '{name}' failed: {e}", exc_info=True)
+        return {"file": name, "status": "failed", "detail": f"Помилка валідації: {e}"}
+    if not report["valid"]:
+        return {"file": name, "status": "invalid", "report": report}
+
+    async with post_slots:
+        try:
+            if transaction is not None:
+                # Opened at the first valid entry, so it is not held open while large files validate
+                if transaction.url is None:
+                    await asyncio.to_thread(transaction.begin)
+                await asyncio.to_thread(transaction.add, ntriples, NTRIPLES_CONTENT_TYPE)
+            else:
+                await asyncio.to_thread(
+                    import_taxonomy_to_graphdb,
+                    file_path=None,
+                    graphdb_endpoint_statements=graphdb_endpoint_statements,
+                    file_content_bytes=ntriples,
+                    content_type=NTRIPLES_CONTENT_TYPE,
+                )
+        except HTTPException as e:
+            return {"file": name, "status": "failed", "detail": e.detail, "report": report}
+        except Exception as e:
+            logger.error(f"Import of '{name}' failed: {e}", exc_info=True)
+            return {"file": name, "status": "failed", "detail": str(e), "report": report}
+    return {"file": name, "status": "imported", "report": report}
+
+
+async def bulk_import_taxonomy(uploads: List[UploadFile], graphdb_endpoint_statements: str,
+                               atomic: bool = False, repair: bool = False) -> dict:
+    """
+    Validates and loads every uploaded file/archive entry with at most BULK_IMPORT_CONCURRENCY
+    parallel statement posts. In atomic mode entries are still validated in parallel but added
+    one by one to a single GraphDB transaction, committed only if every entry succeeded, so
+    readers never see a partial import.
+    """
+    transaction = GraphDBTransaction(graphdb_endpoint_statements) if atomic else None
+    post_slots = asyncio.Semaphore(1 if atomic else BULK_IMPORT_CONCURRENCY)
+    # Bounds how many entries are held in memory while waiting for validation or a post slot
+    pending_slots = asyncio.Semaphore(BULK_IMPORT_CONCURRENCY * 2)
+    tasks = []
+
+    async def run_entry(name, content):
+        try:
+            return await _import_entry(name, content, transaction, graphdb_endpoint_statements, post_slots, repair)
+        finally:
+            pending_slots.release()
+
+    try:
+        for upload in uploads:
+            entries = iter_upload_entries(upload)
+            try:
+                while True:
+                    await pending_slots.acquire()
+                    entry = await asyncio.to_thread(next, entries, None)
+                    if entry is None:
+                        pending_slots.release()
+                        break
+                    tasks.append(asyncio.create_task(run_entry(*entry)))
+            except UploadTooLargeError as e:
+                pending_slots.release()
+                logger.error(f"Upload '{upload.filename}' is too large: {e}")
+                tasks.append(asyncio.create_task(_upload_error(upload.filename, str(e))))
+            except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+                pending_slots.release()
+                logger.error(f"Cannot read archive '{upload.filename}': {e}")
+                tasks.append(asyncio.create_task(_upload_error(upload.filename, f"Не вдалося прочитати архів: {e}")))
+        outcomes = list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        if transaction is not None:
+            await asyncio.to_thread(transaction.rollback)
+        raise
+
+    summary = {}
+    for outcome in outcomes:
+        summary[outcome["status"]] = summary.get(outcome["status"], 0) + 1
+    failed = any(outcome["status"] in ("invalid", "failed") for outcome in outcomes)
+    imported = summary.get("imported", 0)
+
+    committed = imported > 0 and not (atomic and failed)
+    if transaction is not None:
+        if committed:
+            await asyncio.to_thread(transaction.commit)
+        else:
+            await asyncio.to_thread(transaction.rollback)
+
+    logger.info(f"Bulk import finished: {summary}, atomic={atomic}, committed={committed}")
+    return {"atomic": atomic, "committed": committed, "summary": summary, "files": outcomes}
+
+
+async def _upload_error(name: str, detail: str) -> dict:
+    return {"file": name, "status": "failed", "detail": detail}
@@ -0,0 +1,314 @@
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import deque
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: the log is still written, but only one worker may publish safely
+    fcntl = None
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+CHANGE_EVENTS_HISTORY_SIZE = int(os.getenv("CHANGE_EVENTS_HISTORY_SIZE", 1000))
+CHANGE_EVENTS_QUEUE_SIZE = int(os.getenv("CHANGE_EVENTS_QUEUE_SIZE", 100))
+CHANGE_EVENTS_HEARTBEAT_SECONDS = float(os.getenv("CHANGE_EVENTS_HEARTBEAT_SECONDS", 15))
+# Shared by all workers of a deployment; a directory on shared storage also spans hosts
+CHANGE_EVENTS_DIR = os.getenv("CHANGE_EVENTS_DIR",
+                              os.path.join(tempfile.gettempdir(), "taxonomy-events",
+                                           os.getenv("GRAPHDB_REPOSITORY", "animals")))
+# How often workers with connected SSE clients look for events published by other workers
+CHANGE_EVENTS_POLL_SECONDS = float(os.getenv("CHANGE_EVENTS_POLL_SECONDS", 0.25))
+# The log is compacted to the last CHANGE_EVENTS_HISTORY_SIZE events once it grows past this
+CHANGE_EVENTS_LOG_MAX_BYTES = int(os.getenv("CHANGE_EVENTS_LOG_MAX_BYTES", 4 * 1024 * 1024))
+
+# Delivered to listeners when events were compacted away before this worker read them
+RESYNC_EVENT = "resync"
+
+
+class ChangeSubscription:
+    """A single client connection. Holds a bounded queue; on overflow it is marked for resync instead of
+    blocking the publisher."""
+
+    def __init__(self, queue_size: int):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client is too slow: drop what is queued and leave a marker telling it to resync
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class ChangeBroker:
+    """
+    Fan-out of taxonomy change events across all workers. Events are appended to a shared log
+    file under an exclusive lock, which also hands out the revision: one counter for the whole
+    deployment, increasing by one per event. Every worker reads the log from where it stopped
+    (on each revision check, and periodically while SSE clients are connected), passes new
+    events to its listeners and subscribers, and keeps a bounded history so reconnecting
+    clients can resume from the last revision they saw.
+    """
+
+    def __init__(self, directory: str = CHANGE_EVENTS_DIR, history_size: int = CHANGE_EVENTS_HISTORY_SIZE,
+                 queue_size: int = CHANGE_EVENTS_QUEUE_SIZE):
+        self.log_path = os.path.join(directory, "events.log")
+        self.lock_path = os.path.join(directory, "events.lock")
+        self._revision = 0
+        # Events up to this revision are not in the history (compacted away or evicted)
+        self._history_floor = 0
+        self._history = deque(maxlen=history_size)
+        self._history_size = history_size
+        self._queue_size = queue_size
+        self._subscribers = set()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._local_listeners: List[Callable[[dict], None]] = []
+        self._published_here = set()
+        self._log = None
+        self._log_identity = None
+        self._partial = b""
+        self._read_lock = threading.RLock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._follower: Optional[asyncio.Task] = None
+        os.makedirs(directory, exist_ok=True)
+        with self._read_lock:
+            self._read_new_events(initial=True)
+
+    @property
+    def revision(self) -> int:
+        """Latest revision of the whole deployment (reads events published by other workers first)."""
+        self.poll()
+        return self._revision
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def add_listener(self, listener: Callable[[dict], None], local_only: bool = False):
+        """
+        Registers a synchronous callback invoked for every event (caches, counters, ...), in
+        revision order. With local_only it only sees events published by this worker.
+        """
+        (self._local_listeners if local_only else self._listeners).append(listener)
+
+    def publish(self, event_type: str, **data) -> dict:
+        with self._read_lock, _exclusive(self.lock_path):
+            # Everything before our event must be read first, so the log tells us the next revision
+            self._read_new_events()
+            event = {"rev": self._revision + 1, "type": event_type}
+            event.update({key: value for key, value in data.items() if value is not None})
+            with open(self.log_path, "ab") as log:
+                log.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+                log_size = log.tell()
+            if log_size > CHANGE_EVENTS_LOG_MAX_BYTES:
+                self._compact()
+            self._published_here.add(event["rev"])
+            self._read_new_events()
+        return event
+
+    def poll(self):
+        """Reads and dispatches events other workers appended since the last call."""
+        with self._read_lock:
+            self._read_new_events()
+
+    def _compact(self):
+        keep = list(self._history)[-(self._history_size - 1):] if self._history_size > 1 else []
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.log_path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            for event in keep:
+                f.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+        # Keeps the event that was just appended (not read into the history yet)
+        with open(self.log_path, "rb") as current, open(tmp_path, "ab") as f:
+            current.seek(self._log.tell() if self._log is not None else 0)
+            f.write(current.read())
+        os.replace(tmp_path, self.log_path)
+
+    def _open_log(self) -> bool:
+        try:
+            stat = os.stat(self.log_path)
+        except OSError:
+            return False
+        identity = (stat.st_dev, stat.st_ino)
+        if self._log is not None and identity == self._log_identity:
+            return True
+        if self._log is not None:
+            self._log.close()
+        self._log = open(self.log_path, "rb")
+        self._log_identity = identity
+        self._partial = b""
+        return True
+
+    def _read_new_events(self, initial: bool = False):
+        if not self._open_log():
+            return
+        data = self._partial + self._log.read()
+        lines = data.split(b"\n")
+        # A line is only complete with its newline; keep the rest for the next read
+        self._partial = lines.pop()
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                logger.error(f"Skipping unreadable line in {self.log_path}: {line[:200]!r}")
+                continue
+            if event["rev"] <= self._revision:
+                continue
+            if initial:
+                # Events from before this worker started: history for SSE resumes, not news for listeners
+                if not self._history:
+                    self._history_floor = event["rev"] - 1
+                self._append_history(event)
+                self._revision = event["rev"]
+                continue
+            if event["rev"] > self._revision + 1:
+                logger.warning(f"Change events {self._revision + 1}..{event['rev'] - 1} were compacted away "
+                               f"before this worker read them; resyncing.")
+                self._history.clear()
+                self._history_floor = event["rev"] - 1
+                self._dispatch({"rev": event["rev"] - 1, "type": RESYNC_EVENT}, local=False)
+            local = event["rev"] in self._published_here
+            self._published_here.discard(event["rev"])
+            self._dispatch(event, local)
+
+    def _append_history(self, event: dict):
+        if len(self._history) == self._history.maxlen:
+            self._history_floor = self._history[0]["rev"]
+        self._history.append(event)
+
+    def _dispatch(self, event: dict, local: bool):
+        self._revision = event["rev"]
+        if event["type"] != RESYNC_EVENT:
+            self._append_history(event)
+        listeners = self._listeners + self._local_listeners if local else self._listeners
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"Change listener {listener} failed for event {event['type']}: {e}", exc_info=True)
+
+        # Subscriber queues belong to the event loop; a revision check from a worker thread hands over
+        offer_event = None if event["type"] == RESYNC_EVENT else event
+        for subscription in list(self._subscribers):
+            if self._loop is not None and not _in_loop(self._loop):
+                self._loop.call_soon_threadsafe(subscription.offer, offer_event)
+            else:
+                subscription.offer(offer_event)
+
+    def subscribe(self) -> ChangeSubscription:
+        self.poll()
+        subscription = ChangeSubscription(self._queue_size)
+        self._subscribers.add(subscription)
+        self._loop = asyncio.get_running_loop()
+        if self._follower is None or self._follower.done():
+            self._follower = self._loop.create_task(self._follow())
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription):
+        self._subscribers.discard(subscription)
+
+    async def _follow(self):
+        while self._subscribers:
+            await asyncio.sleep(CHANGE_EVENTS_POLL_SECONDS)
+            try:
+                self.poll()
+            except OSError as e:
+                logger.error(f"Cannot read change events from {self.log_path}: {e}")
+
+    def events_since(self, revision: int) -> Optional[List[dict]]:
+        """Returns events newer than revision, or None if the history no longer reaches back that far."""
+        current = self.revision
+        if revision == current:
+            return []
+        # A revision from the future means the log was reset (e.g. a wiped temp directory)
+        if revision < self._history_floor or revision > current:
+            return None
+        return [event for event in self._history if event["rev"] > revision]
+
+
+class _exclusive:
+    """Cross-process lock on a file (flock), so publishers in different workers take turns."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._file.close()
+        return False
+
+
+def _in_loop(loop: asyncio.AbstractEventLoop) -> bool:
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+
+change_broker = ChangeBroker()
+
+
+def publish_change(event_type: str, **data) -> dict:
+    return change_broker.publish(event_type, **data)
+
+
+def format_sse(event: dict) -> str:
+    return f"id: {event['rev']}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def stream_change_events(since: Optional[int] = None, broker: ChangeBroker = change_broker):
+    """Async generator of Server-Sent Events: replays missed events, then streams live ones with heartbeats."""
+    subscription = broker.subscribe()
+    try:
+        last_sent = broker.revision
+        if since is None:
+            yield format_sse({"rev": last_sent, "type": "hello"})
+        else:
+            missed = broker.events_since(since)
+            if missed is None:
+                yield format_sse({"rev": last_sent, "type": RESYNC_EVENT})
+            else:
+                for event in missed:
+                    yield format_sse(event)
+                    last_sent = max(last_sent, event["rev"])
+
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=CHANGE_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            if event is None:
+                subscription.overflowed = False
+                last_sent = broker.revision
+                yield format_sse({"rev": last_sent, "type": RESYNC_EVENT})
+                continue
+            if event["rev"] <= last_sent:
+                continue
+            last_sent = event["rev"]
+            yield format_sse(event)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import re
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.graphdb_utils import parse_concat_results, get_uri_display_name, get_taxonomy_hierarchy
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+MINHASH_BANDS = 16
+MINHASH_ROWS = 3
+# Buckets bigger than this are labels sharing very common n-grams; pairing them all would be quadratic
+MAX_BUCKET_SIZE = 500
+SIGNATURE_CHUNK = 200_000
+SIMILARITY_BATCH = 1_000_000
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_label(value: str) -> str:
+    return _WHITESPACE.sub(" ", value.lower()).strip()
+
+
+def collect_concepts(bindings) -> Dict[str, dict]:
+    """Concept table from get_taxonomy_hierarchy rows: labels and parent URIs per concept."""
+    concepts = {}
+
+    def concept(uri):
+        if uri not in concepts:
+            concepts[uri] = {"labels": [], "parents": set()}
+        return concepts[uri]
+
+    for binding in bindings:
+        class_uri = binding["class"]["value"]
+        class_entry = concept(class_uri)
+        if not class_entry["labels"]:
+            class_entry["labels"] = parse_concat_results(binding.get("classLabelsInfo", {}).get("value"))
+        subclass_uri = binding.get("subClass", {}).get("value")
+        if subclass_uri:
+            subclass_entry = concept(subclass_uri)
+            subclass_entry["parents"].add(class_uri)
+            if not subclass_entry["labels"]:
+                subclass_entry["labels"] = parse_concat_results(binding.get("subClassLabelsInfo", {}).get("value"))
+    return concepts
+
+
+def ancestor_path(uri: str, concepts: Dict[str, dict]) -> List[str]:
+    """Root-to-concept path following the first parent at each level; stops on cycles."""
+    path = [uri]
+    seen = {uri}
+    current = uri
+    while True:
+        parents = sorted(concepts.get(current, {}).get("parents", ()))
+        parents = [parent for parent in parents if parent not in seen]
+        if not parents:
+            break
+        current = parents[0]
+        seen.add(current)
+        path.append(current)
+    path.reverse()
+    return path
+
+
+def _ngram_matrix(texts: List[str]):
+    """
+    CSR-style (indptr, indices) arrays of character n-gram ids per text. All texts are decoded
+    into one code point array and the n-grams are packed into integers without a Python loop.
+    """
+    padded = [f" {text} " for text in texts]
+    lengths = np.fromiter((len(text) for text in padded), dtype=np.int64, count=len(padded))
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    counts = np.maximum(lengths - NGRAM_SIZE + 1, 1)
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    positions = np.arange(indptr[-1]) + np.repeat(starts - indptr[:-1], counts)
+    grams = codes[positions]
+    for offset in range(1, NGRAM_SIZE):
+        # Unicode code points fit in 21 bits, so three of them fit in one uint64
+        grams = (grams << np.uint64(21)) | codes[np.minimum(positions + offset, len(codes) - 1)]
+    _, ids = np.unique(grams, return_inverse=True)
+    return indptr, ids.astype(np.uint64)
+
+
+def minhash_signatures(indptr: np.ndarray, indices: np.ndarray, num_hashes: int, seed: int = 0) -> np.ndarray:
+    """MinHash signatures (rows x num_hashes), computed over the n-gram entries in chunks of rows."""
+    # Multiply-shift hashing: wrapping uint64 arithmetic, no modulo needed
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, np.iinfo(np.uint64).max, size=num_hashes, dtype=np.uint64, endpoint=True) | np.uint64(1)
+    b = rng.integers(0, np.iinfo(np.uint64).max, size=num_hashes, dtype=np.uint64, endpoint=True)
+    rows = len(indptr) - 1
+    signatures = np.empty((rows, num_hashes), dtype=np.uint64)
+
+    start_row = 0
+    while start_row < rows:
+        end_row = int(np.searchsorted(indptr, indptr[start_row] + SIGNATURE_CHUNK, side="right")) - 1
+        end_row = min(max(end_row, start_row + 1), rows)
+        lo, hi = indptr[start_row], indptr[end_row]
+        hashed = (indices[lo:hi, None] * a[None, :] + b[None, :]) >> np.uint64(32)
+        signatures[start_row:end_row] = np.minimum.reduceat(hashed, indptr[start_row:end_row] - lo, axis=0)
+        start_row = end_row
+    return signatures
+
+
+def candidate_pairs(signatures: np.ndarray, bands: int, rows_per_band: int) -> np.ndarray:
+    """Row index pairs (i < j) that share at least one LSH band bucket."""
+    n = signatures.shape[0]
+    pair_keys = []
+    triu_cache = {}
+    for band in range(bands):
+        # Fold the band's rows into one bucket key; a rare collision only adds a candidate that is scored anyway
+        keys = np.zeros(n, dtype=np.uint64)
+        for column in range(band * rows_per_band, (band + 1) * rows_per_band):
+            keys = keys * np.uint64(0x9E3779B97F4A7C15) + signatures[:, column]
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        boundaries = np.flatnonzero(np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1], [True])))
+        sizes = np.diff(boundaries)
+        for bucket in np.flatnonzero((sizes >= 2) & (sizes <= MAX_BUCKET_SIZE)):
+            members = np.sort(order[boundaries[bucket]:boundaries[bucket + 1]])
+            size = len(members)
+            if size not in triu_cache:
+                triu_cache[size] = np.triu_indices(size, k=1)
+            left, right = triu_cache[size]
+            pair_keys.append(members[left].astype(np.int64) * n + members[right])
+    if not pair_keys:
+        return np.empty((0, 2), dtype=np.int64)
+    unique_keys = np.unique(np.concatenate(pair_keys))
+    return np.stack((unique_keys // n, unique_keys % n), axis=1)
+
+
+def estimate_similarity(signatures: np.ndarray, pairs: np.ndarray) -> np.ndarray:
+    """Estimated Jaccard similarity of n-gram sets, computed in batches of pairs."""
+    scores = np.empty(len(pairs), dtype=np.float32)
+    for start in range(0, len(pairs), SIMILARITY_BATCH):
+        batch = pairs[start:start + SIMILARITY_BATCH]
+        scores[start:start + SIMILARITY_BATCH] = (signatures[batch[:, 0]] == signatures[batch[:, 1]]).mean(axis=1)
+    return scores
+
+
+def find_duplicate_concepts(bindings, threshold: float = 0.8, limit: int = 100,
+                            langs: Optional[List[str]] = None) -> List[dict]:
+    """
+    Ranked merge suggestions for concepts whose labels in the same language are near-duplicates.
+    Labels are encoded as character n-gram sets, MinHash/LSH blocking picks candidate pairs and
+    the candidates are scored in vectorized batches, so the cost grows roughly linearly.
+    """
+    concepts = collect_concepts(bindings)
+
+    by_lang: Dict[str, List[tuple]] = {}
+    for uri, entry in concepts.items():
+        labels = entry["labels"] or [{"value": get_uri_display_name(uri), "lang": None}]
+        for label in labels:
+            lang = label["lang"] or ""
+            if langs and lang not in langs:
+                continue
+            text = normalize_label(label["value"])
+            if text:
+                by_lang.setdefault(lang, []).append((uri, label["value"], text))
+
+    best: Dict[tuple, dict] = {}
+    num_hashes = MINHASH_BANDS * MINHASH_ROWS
+    for lang, rows in by_lang.items():
+        if len(rows) < 2:
+            continue
+        indptr, indices = _ngram_matrix([text for _, _, text in rows])
+        signatures = minhash_signatures(indptr, indices, num_hashes)
+        pairs = candidate_pairs(signatures, MINHASH_BANDS, MINHASH_ROWS)
+        if not len(pairs):
+            continue
+        scores = estimate_similarity(signatures, pairs)
+        keep = scores >= threshold
+        logger.info(f"Duplicate detection [{lang or '-'}]: {len(rows)} labels, {len(pairs)} candidates, "
+                    f"{int(keep.sum())} above {threshold}")
+
+        for (i, j), score in zip(pairs[keep], scores[keep]):
+            uri_a, label_a, _ = rows[i]
+            uri_b, label_b, _ = rows[j]
+            if uri_a == uri_b:
+                continue
+            if uri_a > uri_b:
+                uri_a, label_a, uri_b, label_b = uri_b, label_b, uri_a, label_a
+            key = (uri_a, uri_b)
+            if key not in best or score > best[key]["score"]:
+                best[key] = {"score": round(float(score), 3), "lang": lang or None,
+                             "labels": {uri_a: label_a, uri_b: label_b}}
+
+    ranked = sorted(best.items(), key=lambda item: (-item[1]["score"], item[0]))[:limit]
+    suggestions = []
+    for (uri_a, uri_b), match in ranked:
+        # Keep the concept with more labels; merge the poorer one into it
+        if len(concepts[uri_b]["labels"]) > len(concepts[uri_a]["labels"]):
+            source, target = uri_a, uri_b
+        else:
+            source, target = uri_b, uri_a
+        suggestions.append({
+            "source": source,
+            "target": target,
+            "score": match["score"],
+            "lang": match["lang"],
+            "labels": match["labels"],
+            "paths": {
+                source: ancestor_path(source, concepts),
+                target: ancestor_path(target, concepts),
+            },
+        })
+    return suggestions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find near-duplicate taxonomy concepts by their labels.")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--lang", action="append", help="Only compare labels in this language (repeatable)")
+    parser.add_argument("--bindings", help="SPARQL JSON results of the hierarchy query instead of querying GraphDB")
+    args = parser.parse_args(argv)
+
+    if args.bindings:
+        with open(args.bindings, encoding="utf-8") as f:
+            data = json.load(f)
+        bindings = data["results"]["bindings"] if isinstance(data, dict) else data
+    else:
+        bindings = get_taxonomy_hierarchy(fields=["labels"])
+
+    suggestions = find_duplicate_concepts(bindings, threshold=args.threshold, limit=args.limit, langs=args.lang)
+    json.dump(suggestions, sys.stdout, ensure_ascii=False, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
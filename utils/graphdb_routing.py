@@ -0,0 +1,249 @@
+import contextvars
+import itertools
+import logging
+import os
+import threading
+import time
+import urllib.error
+from contextlib import contextmanager
+from typing import Callable, List
+
+import requests
+from SPARQLWrapper.SPARQLExceptions import EndPointInternalError
+
+from utils.change_events import change_broker
+from utils.sparql_queries import set_revision_marker_query, revision_marker_query
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated query endpoints of GraphDB read replicas; empty means every read goes to the primary
+GRAPHDB_READ_REPLICAS = [endpoint.strip() for endpoint in os.getenv("GRAPHDB_READ_REPLICAS", "").split(",")
+                         if endpoint.strip()]
+# Also balance reads onto the primary, not only use it as the fallback
+GRAPHDB_READ_FROM_PRIMARY = os.getenv("GRAPHDB_READ_FROM_PRIMARY", "false").lower() in ("1", "true", "yes")
+# Only read from replicas that have applied the last revision written by this worker or seen by the client
+GRAPHDB_READ_YOUR_WRITES = os.getenv("GRAPHDB_READ_YOUR_WRITES", "false").lower() in ("1", "true", "yes")
+GRAPHDB_REPLICA_HEALTH_INTERVAL_SECONDS = float(os.getenv("GRAPHDB_REPLICA_HEALTH_INTERVAL_SECONDS", 5))
+GRAPHDB_REPLICA_TIMEOUT_SECONDS = float(os.getenv("GRAPHDB_REPLICA_TIMEOUT_SECONDS", 2))
+
+# Failures that say something about the endpoint rather than the query; HTTP errors only count with a 5xx status
+ENDPOINT_FAILURES = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, urllib.error.URLError,
+                     ConnectionError, TimeoutError, EndPointInternalError, requests.exceptions.HTTPError)
+
+# Revision a read must see: the client's X-Min-Revision header, or the revision a rebuild is labelled with
+required_read_revision: contextvars.ContextVar[int] = contextvars.ContextVar("required_read_revision", default=0)
+
+
+def is_endpoint_failure(error: BaseException) -> bool:
+    if not isinstance(error, ENDPOINT_FAILURES):
+        return False
+    if isinstance(error, requests.exceptions.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code >= 500
+    return True
+
+
+@contextmanager
+def reading_at_revision(revision: int):
+    """Reads inside the block only go to replicas that have reached revision (asyncio.to_thread inherits it)."""
+    token = required_read_revision.set(max(required_read_revision.get(), revision))
+    try:
+        yield
+    finally:
+        required_read_revision.reset(token)
+
+
+class ReadEndpoint:
+    def __init__(self, url: str, is_primary: bool = False):
+        self.url = url
+        self.is_primary = is_primary
+        self.outstanding = 0
+        self.healthy = True
+        self.revision = 0
+        self.failures = 0
+        self.requests = 0
+
+    def describe(self) -> dict:
+        return {"url": self.url, "primary": self.is_primary, "healthy": self.healthy,
+                "outstanding": self.outstanding, "revision": self.revision,
+                "requests": self.requests, "failures": self.failures}
+
+
+class ReadRouter:
+    """
+    Routes SELECT/CONSTRUCT reads across GraphDB read replicas; writes keep going to the primary
+    statements endpoint. A read goes to the healthy replica with the fewest requests in flight.
+    Replicas that fail are skipped until the background health check sees them answer again.
+
+    Every change this worker publishes is recorded in the primary as a marker triple holding its
+    revision, and the health check reads that marker back from each replica. A read that needs
+    revision N only goes to replicas that have reached N; otherwise it goes to the primary.
+    With read-your-writes, reads also need the last revision this worker wrote itself.
+    """
+
+    def __init__(self, primary_url: str, statements_url: str, replica_urls: List[str],
+                 read_from_primary: bool = False, read_your_writes: bool = False):
+        self.primary = ReadEndpoint(primary_url, is_primary=True)
+        self.replicas = [ReadEndpoint(url) for url in replica_urls]
+        self.statements_url = statements_url
+        self.read_from_primary = read_from_primary
+        self.read_your_writes = read_your_writes
+        # Last revision this worker wrote; 0 until its first write
+        self.written_revision = 0
+        self._lock = threading.Lock()
+        self._tiebreak = itertools.count()
+        self._wakeup = threading.Condition()
+        self._pending_marker = 0
+        self._threads_started = False
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def _required_revision(self) -> int:
+        required = required_read_revision.get()
+        if self.read_your_writes:
+            required = max(required, self.written_revision)
+        return required
+
+    def _choose(self, exclude) -> ReadEndpoint:
+        required = self._required_revision()
+        candidates = [replica for replica in self.replicas
+                      if replica.healthy and replica not in exclude and replica.revision >= required]
+        if self.read_from_primary or not candidates:
+            if self.primary not in exclude:
+                candidates.append(self.primary)
+        if not candidates:
+            # Everything failed in this request already; the primary stays the last resort
+            return self.primary
+        # Rotate the start so ties are spread round-robin instead of always hitting the first replica
+        start = next(self._tiebreak) % len(candidates)
+        return min(candidates[start:] + candidates[:start], key=lambda endpoint: endpoint.outstanding)
+
+    @contextmanager
+    def acquire(self, exclude=()):
+        """Yields the query endpoint URL to use for one read and tracks it as in flight."""
+        if not self.enabled:
+            yield self.primary.url
+            return
+        self._start_threads()
+        with self._lock:
+            endpoint = self._choose(exclude)
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        try:
+            yield endpoint.url
+        except Exception as e:
+            if is_endpoint_failure(e):
+                self._mark_failed(endpoint)
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+    def call(self, read: Callable[[str], object]):
+        """Runs read(endpoint_url), failing over to another endpoint when one is unreachable."""
+        if not self.enabled:
+            return read(self.primary.url)
+        tried = []
+        while True:
+            url = self.primary.url
+            try:
+                # acquire() records the failure on the endpoint
+                with self.acquire(exclude=tried) as url:
+                    return read(url)
+            except Exception as e:
+                endpoint = self._endpoint(url)
+                if not is_endpoint_failure(e) or endpoint.is_primary or len(tried) >= len(self.replicas):
+                    raise
+                logger.warning(f"Read from GraphDB replica {url} failed ({e}); retrying on another endpoint.")
+                tried.append(endpoint)
+
+    def _endpoint(self, url: str) -> ReadEndpoint:
+        return next((replica for replica in self.replicas if replica.url == url), self.primary)
+
+    def _mark_failed(self, endpoint: ReadEndpoint):
+        endpoint.failures += 1
+        if not endpoint.is_primary and endpoint.healthy:
+            endpoint.healthy = False
+            logger.warning(f"GraphDB replica {endpoint.url} marked unhealthy.")
+
+    def on_change(self, event: dict):
+        """Listener for this worker's own changes: records the revision and queues its marker."""
+        if not self.enabled:
+            return
+        self._start_threads()
+        with self._lock:
+            self.written_revision = max(self.written_revision, event["rev"])
+        with self._wakeup:
+            self._pending_marker = max(self._pending_marker, event["rev"])
+            self._wakeup.notify()
+
+    def status(self) -> dict:
+        return {"read_your_writes": self.read_your_writes, "written_revision": self.written_revision,
+                "required_revision": self._required_revision(),
+                "endpoints": [self.primary.describe()] + [replica.describe() for replica in self.replicas]}
+
+    def _start_threads(self):
+        if self._threads_started:
+            return
+        with self._lock:
+            if self._threads_started:
+                return
+            self._threads_started = True
+        threading.Thread(target=self._health_loop, name="graphdb-replica-health", daemon=True).start()
+        threading.Thread(target=self._marker_loop, name="graphdb-revision-marker", daemon=True).start()
+
+    def probe(self, endpoint: ReadEndpoint):
+        try:
+            response = requests.post(endpoint.url, data={"query": revision_marker_query()},
+                                     headers={"Accept": "application/sparql-results+json"},
+                                     timeout=GRAPHDB_REPLICA_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            bindings = response.json()["results"]["bindings"]
+            endpoint.revision = max((int(binding["revision"]["value"]) for binding in bindings), default=0)
+            if not endpoint.healthy:
+                logger.info(f"GraphDB replica {endpoint.url} is healthy again (revision {endpoint.revision}).")
+            endpoint.healthy = True
+        except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+            if endpoint.healthy:
+                logger.warning(f"GraphDB replica {endpoint.url} failed its health check: {e}")
+            endpoint.healthy = False
+
+    def _health_loop(self):
+        while True:
+            for replica in self.replicas:
+                self.probe(replica)
+            time.sleep(GRAPHDB_REPLICA_HEALTH_INTERVAL_SECONDS)
+
+    def _marker_loop(self):
+        written = 0
+        while True:
+            with self._wakeup:
+                while self._pending_marker <= written:
+                    self._wakeup.wait()
+                revision = self._pending_marker
+            try:
+                response = requests.post(self.statements_url, data=set_revision_marker_query(revision),
+                                         headers={"Content-Type": "application/sparql-update"},
+                                         timeout=GRAPHDB_REPLICA_TIMEOUT_SECONDS * 5)
+                response.raise_for_status()
+                written = revision
+            except requests.exceptions.RequestException as e:
+                # Until it is written, reads that need this revision stay on the primary; retry shortly
+                logger.error(f"Could not record write revision {revision} in GraphDB: {e}")
+                time.sleep(GRAPHDB_REPLICA_HEALTH_INTERVAL_SECONDS)
+
+
+async def read_your_writes_middleware(request, call_next):
+    """Takes the client's last seen revision from X-Min-Revision and reports the current one on writes."""
+    header = request.headers.get("x-min-revision", "")
+    token = required_read_revision.set(int(header) if header.isdigit() else 0)
+    try:
+        response = await call_next(request)
+    finally:
+        required_read_revision.reset(token)
+    if request.method != "GET":
+        response.headers["X-Taxonomy-Revision"] = str(change_broker.revision)
+    return response
@@ -4,10 +4,17 @@ from fastapi import HTTPException
 from SPARQLWrapper import SPARQLWrapper, JSON, TURTLE
 import requests
 import os
+import uuid
+from collections import deque
 from dotenv import load_dotenv
 import logging
-from urllib.parse import urlparse
+from urllib.parse import urlparse, quote, urljoin
 
+from utils.change_events import change_broker
+from utils.graphdb_routing import (
+    ReadRouter, GRAPHDB_READ_REPLICAS, GRAPHDB_READ_FROM_PRIMARY, GRAPHDB_READ_YOUR_WRITES,
+)
+from utils.request_profiling import span
 from utils.sparql_queries import (
     clear_repository_query,
     get_taxonomy_hierarchy_query,
@@ -16,6 +23,19 @@ from utils.sparql_queries import (
     add_top_concept_query,
     delete_concept_query, add_rdfs_label_query, delete_rdfs_label_query, add_rdfs_comment_query,
     delete_rdfs_comment_query,
+    move_concept_operation,
+    copy_subtree_operation,
+    copy_collisions_query,
+    merge_concepts_operation,
+    update_from_operation,
+    construct_from_operation,
+    concept_exists_query,
+    is_same_or_descendant_query,
+    merge_creates_cycle_query,
+    get_concept_parents_query,
+    concept_uris_in_namespace_query,
+    insert_data_query,
+    TAXONOMY_NAMESPACE,
     # update_concept_name_query,
 )
 
@@ -30,6 +50,11 @@ GRAPHDB_STATEMENTS_ENDPOINT = (
     os.getenv("GRAPHDB_ENDPOINT_STATEMENTS", f"{GRAPHDB_BASE_URL}/repositories/{GRAPHDB_REPOSITORY}/statements"))
 DEFAULT_GRAPH_URI = os.getenv("GRAPHDB_DEFAULT_GRAPH", "http://example.org/graph/taxonomy")
 
+read_router = ReadRouter(GRAPHDB_QUERY_ENDPOINT, GRAPHDB_STATEMENTS_ENDPOINT, GRAPHDB_READ_REPLICAS,
+                         read_from_primary=GRAPHDB_READ_FROM_PRIMARY, read_your_writes=GRAPHDB_READ_YOUR_WRITES)
+# Each worker records markers for its own writes; other workers' writes get theirs from those workers
+change_broker.add_listener(read_router.on_change, local_only=True)
+
 
 def parse_concat_results(concat_string):
     """Parses GROUP_CONCAT results like 'value1|lang1||value2|lang2'."""
@@ -77,119 +102,169 @@ def get_uri_display_name(uri_string: str) -> str:
     return uri_string  # Absolute fallback
 
 
-def get_taxonomy_hierarchy():
-    sparql = SPARQLWrapper(GRAPHDB_QUERY_ENDPOINT)
-    sparql.setQuery(get_taxonomy_hierarchy_query())
-    sparql.setReturnFormat(JSON)
+def get_taxonomy_hierarchy(langs=None, fields=None, root_uri=None):
+    query = get_taxonomy_hierarchy_query(langs=langs, fields=fields, root_uri=root_uri)
 
     try:
-        results = sparql.query().convert()
+        results = read_router.call(lambda endpoint: _select(endpoint, query))
         print("Debug: get_taxonomy_hierarchy - Непосредственный результат из SPARQL query:")
         # print(results)
 
         return results["results"]["bindings"]
     except Exception as e:
         print(f"Error querying GraphDB: {e}")
-        print(f"Query used:\n{get_taxonomy_hierarchy_query()}")
+        print(f"Query used:\n{query}")
         raise HTTPException(status_code=500, detail=f"Ошибка при запросе к GraphDB: {e}")
 
 
-def build_hierarchy_tree(bindings):
+def _select(endpoint: str, query: str) -> dict:
+    sparql = SPARQLWrapper(endpoint)
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    with span("sparql"):
+        result = sparql.query()
+    with span("json_parse"):
+        return result.convert()
+
+
+def select_languages(literals, langs):
+    """Keeps the literals of the first language in the fallback chain that has any; untagged ones come last."""
+    if not langs or not literals:
+        return literals
+    for lang in list(langs) + [None]:
+        selected = [literal for literal in literals if literal["lang"] == lang]
+        if selected:
+            return selected
+    return []
+
+
+def _make_node(uri, labels_info, comments_info, langs, fields):
+    node = {"key": uri}
+    if fields is None or "title" in fields:
+        node["title"] = get_uri_display_name(uri)
+    node["children"] = []
+    if fields is None or "definitions" in fields:
+        node["definitions"] = select_languages(parse_concat_results(comments_info), langs)
+    if fields is None or "labels" in fields:
+        node["labels"] = select_languages(parse_concat_results(labels_info), langs)
+    return node
+
+
+def build_hierarchy_graph(bindings, langs=None, fields=None):
+    """
+    Node table of the hierarchy: every concept is stored once with the keys of all its parents
+    and children, so a concept with several rdfs:subClassOf parents keeps all of them.
+    Size is linear in the number of concepts plus edges.
+    """
     nodes = {}
-    parent_child_links = {}
-    all_uris = set()
-
-    print("Debug: build_hierarchy_tree - Processing bindings...")
+    edges = set()
+
+    def add_node(uri, labels_info, comments_info):
+        node = _make_node(uri, labels_info, comments_info, langs, fields)
+        node["children"] = []
+        node["parents"] = []
+        if uri not in nodes:
+            nodes[uri] = node
+        else:
+            del node["children"], node["parents"]
+            nodes[uri].update(node)
 
     for binding in bindings:
         class_uri = binding["class"]["value"]
-        all_uris.add(class_uri)
-
-        class_labels_info = binding.get("classLabelsInfo", {}).get("value")
-        class_comments_info = binding.get("classCommentsInfo", {}).get("value")
-
-        # preferred_class_label = get_preferred_label(class_labels_info, "uk") or class_uri.split('/')[-1]
-        class_definitions = parse_concat_results(class_comments_info)
-        all_class_labels = parse_concat_results(class_labels_info)
-        class_title = get_uri_display_name(class_uri)
-
-        if class_uri not in nodes:
-            nodes[class_uri] = {
-                "key": class_uri,
-                "title": class_title,
-                "children": [],
-                "definitions": class_definitions,
-                "labels": all_class_labels
-            }
-        else:
-            nodes[class_uri]["title"] = class_title
-            nodes[class_uri]["definitions"] = class_definitions
-            nodes[class_uri]["labels"] = all_class_labels
+        add_node(class_uri, binding.get("classLabelsInfo", {}).get("value"),
+                 binding.get("classCommentsInfo", {}).get("value"))
 
         if "subClass" in binding and binding["subClass"]["value"]:
             subclass_uri = binding["subClass"]["value"]
-            all_uris.add(subclass_uri)
-            parent_child_links[subclass_uri] = class_uri
-
-            subclass_labels_info = binding.get("subClassLabelsInfo", {}).get("value")
-            subclass_comments_info = binding.get("subClassCommentsInfo", {}).get("value")
-
-            # preferred_subclass_label = get_preferred_label(subclass_labels_info, "uk") or subclass_uri.split('/')[-1]
-            subclass_definitions = parse_concat_results(subclass_comments_info)
-            all_subclass_labels = parse_concat_results(subclass_labels_info)
-            subclass_title = get_uri_display_name(subclass_uri)
-
-            if subclass_uri not in nodes:
-                nodes[subclass_uri] = {
-                    "key": subclass_uri,
-                    "title": subclass_title,
-                    "children": [],
-                    "definitions": subclass_definitions,
-                    "labels": all_subclass_labels
-                }
-            else:
-                nodes[subclass_uri]["title"] = subclass_title
-                nodes[subclass_uri]["definitions"] = subclass_definitions
-                nodes[subclass_uri]["labels"] = all_subclass_labels
-
-    # --- Build the tree structure ---
-    root_nodes = []
-    processed_children = set()
-
-    # Populate children arrays based on recorded links
-    for child_uri, parent_uri in parent_child_links.items():
-        if parent_uri in nodes and child_uri in nodes:
-            if nodes[child_uri] not in nodes[parent_uri]["children"]:
-                nodes[parent_uri]["children"].append(nodes[child_uri])
-                processed_children.add(child_uri)
-            else:
-                print(f"Debug: Child {child_uri} already in parent {parent_uri}, skipping duplicate add.")
-        else:
-            print(f"Warning: Parent {parent_uri} or Child {child_uri} not found in nodes dict during linking.")
-
-    for uri in all_uris:
-        if uri not in parent_child_links:
-            if uri in nodes:
-                root_nodes.append(nodes[uri])
-            else:
-                print(f"Warning: Potential root node {uri} not found in nodes dictionary.")
-
-    all_node_uris = set(nodes.keys())
-    linked_uris = set(parent_child_links.keys()) | set(parent_child_links.values())
-    identified_root_uris = {node['key'] for node in root_nodes}
-    orphans = all_node_uris - linked_uris - identified_root_uris
-    if orphans:
-        print(f"Warning: Found potential orphan nodes (not linked, not root): {orphans}")
-        # for orphan_uri in orphans:
-        #      if orphan_uri in nodes:
-        #          root_nodes.append(nodes[orphan_uri])
-
-    print(f"Debug: build_hierarchy_tree - Identified {len(root_nodes)} root nodes.")
-    # print("Debug: build_hierarchy_tree - Final tree structure (roots):")
-    # print(root_nodes)
+            add_node(subclass_uri, binding.get("subClassLabelsInfo", {}).get("value"),
+                     binding.get("subClassCommentsInfo", {}).get("value"))
+            if (class_uri, subclass_uri) not in edges:
+                edges.add((class_uri, subclass_uri))
+                nodes[class_uri]["children"].append(subclass_uri)
+                nodes[subclass_uri]["parents"].append(class_uri)
+
+    roots = [uri for uri, node in nodes.items() if not node["parents"]]
+    return {"roots": roots, "nodes": nodes}
+
+
+def _reference_node(node):
+    """Stand-in for a concept already placed elsewhere in the tree; clients resolve it by key."""
+    reference = {"key": node["key"]}
+    if "title" in node:
+        reference["title"] = node["title"]
+    reference["ref"] = True
+    reference["children"] = []
+    return reference
+
+
+def nest_hierarchy_graph(graph):
+    """
+    Nested tree from a node table. Each concept appears in full once, under the parent closest
+    to a root; every further parent gets a {"key", "ref": true} reference instead of a copy of the
+    subtree. Concepts with several parents also list all of them in "parents". Cycles end in a
+    reference, and concepts only reachable through a cycle are added as extra roots.
+    """
+    nodes = graph["nodes"]
+    tree_nodes = {}
+
+    def place(uri, as_root=False):
+        node = dict(nodes[uri])
+        node["children"] = []
+        parents = node.pop("parents")
+        if len(parents) > 1 or (as_root and parents):
+            node["parents"] = parents
+        tree_nodes[uri] = node
+        return node
+
+    def walk(start_uris):
+        placed = [place(uri, as_root=True) for uri in start_uris]
+        queue = deque(start_uris)
+        while queue:
+            uri = queue.popleft()
+            children = tree_nodes[uri]["children"]
+            for child_uri in nodes[uri]["children"]:
+                if child_uri in tree_nodes:
+                    children.append(_reference_node(tree_nodes[child_uri]))
+                else:
+                    children.append(place(child_uri))
+                    queue.append(child_uri)
+        return placed
+
+    root_nodes = walk(graph["roots"])
+    for uri in nodes:
+        if uri not in tree_nodes:
+            logger.warning(f"Concept {uri} is only reachable through a subclass cycle; adding it as a root.")
+            root_nodes.extend(walk([uri]))
+
+    logger.debug(f"nest_hierarchy_graph - Identified {len(root_nodes)} root nodes.")
     return root_nodes
 
 
+def build_hierarchy_tree(bindings, langs=None, fields=None):
+    """
+    Builds the nested tree from get_taxonomy_hierarchy rows. langs is a fallback chain
+    (e.g. ["uk", "en"]): each node keeps the labels/definitions of the first language it has.
+    fields limits which of title/labels/definitions are put on the nodes.
+    """
+    logger.debug("build_hierarchy_tree - Processing bindings...")
+    with span("build_tree"):
+        return nest_hierarchy_graph(build_hierarchy_graph(bindings, langs=langs, fields=fields))
+
+
+def get_concept_parents(concept_uri, langs=None):
+    _require_concept(concept_uri)
+    query = get_concept_parents_query(concept_uri, langs=langs)
+    try:
+        bindings = read_router.call(lambda endpoint: _select(endpoint, query))["results"]["bindings"]
+    except Exception as e:
+        logger.error(f"Parents query failed: {e}\nQuery used:\n{query}")
+        raise HTTPException(status_code=500, detail=f"Помилка при запиті до GraphDB: {e}")
+    return [{"key": binding["parent"]["value"],
+             "title": get_uri_display_name(binding["parent"]["value"]),
+             "labels": select_languages(parse_concat_results(binding.get("labelsInfo", {}).get("value")), langs)}
+            for binding in bindings]
+
+
 def clear_graphdb_repository(graphdb_endpoint):
     clear_query = clear_repository_query()
     print("SPARQL Query being sent (in POST body):", clear_query)
@@ -246,21 +321,60 @@ def import_taxonomy_to_graphdb(file_path, graphdb_endpoint_statements, file_cont
 
 
 def export_taxonomy(format_str):
-    sparql = SPARQLWrapper(GRAPHDB_QUERY_ENDPOINT)
-    sparql.setQuery(export_taxonomy_query())
+    if format_str != "ttl":
+        raise ValueError("Непідтримуваний формат експорту")
 
-    if format_str == "ttl":
+    def construct(endpoint):
+        sparql = SPARQLWrapper(endpoint)
+        sparql.setQuery(export_taxonomy_query())
         sparql.setReturnFormat(TURTLE)
-    else:
-        raise ValueError("Непідтримуваний формат експорту")
+        with span("sparql"):
+            return sparql.queryAndConvert()
 
     try:
-        results = sparql.queryAndConvert()
+        results = read_router.call(construct)
         return results.decode()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Помилка при експорті з GraphDB: {e}")
 
 
+def mint_concept_uri(concept_name: str) -> str:
+    """
+    Concept URI in the taxonomy namespace for a user-supplied name. Whitespace becomes "_",
+    letters, digits and "-._~" are kept (so Cyrillic names stay readable), everything else
+    is percent-encoded, so the result is always a valid IRI.
+    """
+    slug = "_".join((concept_name or "").split())
+    slug = "".join(char if char.isalnum() or char in "-._~" else quote(char, safe="") for char in slug)
+    # A leading "." would make "." or ".." a dot segment that URI resolution removes
+    stripped = slug.lstrip(".")
+    slug = "%2E" * (len(slug) - len(stripped)) + stripped
+    return f"{TAXONOMY_NAMESPACE}{slug or 'concept'}"
+
+
+def get_existing_concept_uris() -> set:
+    # Read from the primary: URIs minted against a lagging replica could collide with fresh writes
+    try:
+        results = _select(GRAPHDB_QUERY_ENDPOINT, concept_uris_in_namespace_query())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Помилка при запиті до GraphDB: {e}")
+    return {binding["concept"]["value"] for binding in results["results"]["bindings"]}
+
+
+def insert_triples_in_graphdb(triple_chunks: list, graphdb_endpoint: str):
+    """
+    Sends each chunk of triples as one INSERT DATA update. Several chunks share one GraphDB
+    transaction, so nothing is visible before the last one and a failure leaves nothing behind.
+    """
+    if len(triple_chunks) == 1:
+        _execute_sparql_update(insert_data_query(triple_chunks[0]), graphdb_endpoint,
+                               f"inserting {len(triple_chunks[0])} triples")
+        return
+    with GraphDBTransaction(graphdb_endpoint) as transaction:
+        for chunk in triple_chunks:
+            transaction.update(insert_data_query(chunk))
+
+
 def add_top_concept_to_graphdb(concept_uri, graphdb_endpoint):
     sparql_query = add_top_concept_query(concept_uri)
     print("SPARQL Query being sent for add top concept:", sparql_query)
@@ -345,4 +459,160 @@ def add_rdfs_comment_to_graphdb(concept_uri: str, comment_value: str, comment_la
 
 def delete_rdfs_comment_from_graphdb(concept_uri: str, comment_value: str, comment_lang: Optional[str], graphdb_endpoint: str):
     sparql_query = delete_rdfs_comment_query(concept_uri, comment_value, comment_lang)
-    _execute_sparql_update(sparql_query, graphdb_endpoint, f"deleting rdfs:comment from <{concept_uri}>")
\ No newline at end of file
+    _execute_sparql_update(sparql_query, graphdb_endpoint, f"deleting rdfs:comment from <{concept_uri}>")
+
+
+class GraphDBTransaction:
+    """
+    RDF4J REST transaction on the repository behind a statements endpoint. Nothing sent through it
+    is visible to readers before commit(); rollback() discards it. As a context manager it commits
+    on success and rolls back on an exception. A transaction is one connection: no parallel calls.
+    """
+
+    def __init__(self, graphdb_endpoint_statements: str):
+        self.repository_url = graphdb_endpoint_statements.rsplit("/statements", 1)[0]
+        self.url = None
+
+    def _request(self, method: str, url: str, operation_description: str, **kwargs):
+        try:
+            response = requests.request(method, url, **kwargs)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.HTTPError as http_err:
+            error_detail = (f"HTTP error during {operation_description}: {http_err}. "
+                            f"Response: {http_err.response.text}")
+            logger.error(error_detail)
+            raise HTTPException(status_code=500, detail=error_detail)
+        except requests.exceptions.RequestException as e:
+            error_detail = f"Connection error during {operation_description} with GraphDB: {e}"
+            logger.error(error_detail)
+            raise HTTPException(status_code=500, detail=error_detail)
+
+    def begin(self):
+        response = self._request("POST", f"{self.repository_url}/transactions", "starting a transaction")
+        self.url = urljoin(f"{self.repository_url}/", response.headers["Location"])
+
+    def add(self, content: bytes, content_type: str, graph_uri: Optional[str] = None):
+        self._request("PUT", self.url, "adding statements in a transaction",
+                      params={"action": "ADD", "context": f"<{graph_uri or DEFAULT_GRAPH_URI}>"},
+                      data=content, headers={"Content-Type": content_type})
+
+    def update(self, query: str):
+        self._request("PUT", self.url, "running an update in a transaction", params={"action": "UPDATE"},
+                      data=query.encode("utf-8"), headers={"Content-Type": "application/sparql-update"})
+
+    def commit(self):
+        self._request("PUT", self.url, "committing a transaction", params={"action": "COMMIT"})
+        self.url = None
+
+    def rollback(self):
+        if self.url is None:
+            return
+        try:
+            self._request("DELETE", self.url, "rolling back a transaction")
+        except HTTPException:
+            # GraphDB also drops abandoned transactions after a timeout
+            pass
+        self.url = None
+
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+def run_ask_query(query: str) -> bool:
+    # Pre-checks of writes always read the primary, a lagging replica could approve a stale state
+    sparql = SPARQLWrapper(GRAPHDB_QUERY_ENDPOINT)
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    try:
+        return bool(sparql.query().convert().get("boolean"))
+    except Exception as e:
+        logger.error(f"ASK query failed: {e}\nQuery used:\n{query}")
+        raise HTTPException(status_code=500, detail=f"Помилка при запиті до GraphDB: {e}")
+
+
+def construct_ntriples(query: str) -> list:
+    """Runs a CONSTRUCT query and returns the resulting triples as N-Triples lines."""
+    try:
+        response = requests.post(GRAPHDB_QUERY_ENDPOINT, data={"query": query},
+                                 headers={"Accept": "application/n-triples"})
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        logger.error(f"CONSTRUCT query failed: {e}\nQuery used:\n{query}")
+        raise HTTPException(status_code=500, detail=f"Помилка при запиті до GraphDB: {e}")
+    return sorted(line for line in response.content.decode("utf-8").splitlines() if line.strip())
+
+
+def _apply_operation(operation, graphdb_endpoint: str, dry_run: bool, operation_description: str) -> dict:
+    if dry_run:
+        return {
+            "dry_run": True,
+            "delete": construct_ntriples(construct_from_operation(operation, "delete")) if operation[0] else [],
+            "insert": construct_ntriples(construct_from_operation(operation, "insert")) if operation[1] else [],
+        }
+    _execute_sparql_update(update_from_operation(operation), graphdb_endpoint, operation_description)
+    return {"dry_run": False}
+
+
+def _require_concept(concept_uri: str):
+    if not run_ask_query(concept_exists_query(concept_uri)):
+        raise HTTPException(status_code=404, detail=f"Концепт '{concept_uri}' не знайдено")
+
+
+def _copy_collisions(root_uri: str, suffix: str) -> list:
+    query = copy_collisions_query(root_uri, suffix)
+    try:
+        # Read from the primary like the other pre-checks of writes
+        result = _select(GRAPHDB_QUERY_ENDPOINT, query)
+    except Exception as e:
+        logger.error(f"Copy collision check failed: {e}\nQuery used:\n{query}")
+        raise HTTPException(status_code=500, detail=f"Помилка при запиті до GraphDB: {e}")
+    return [binding["newNode"]["value"] for binding in result["results"]["bindings"]]
+
+
+def move_concept_in_graphdb(concept_uri: str, new_parent_uri: Optional[str], graphdb_endpoint: str,
+                            dry_run: bool = False) -> dict:
+    _require_concept(concept_uri)
+    if new_parent_uri:
+        _require_concept(new_parent_uri)
+        if run_ask_query(is_same_or_descendant_query(concept_uri, new_parent_uri)):
+            raise HTTPException(status_code=400,
+                                detail=f"Неможливо перемістити концепт під самого себе або свого нащадка: <{new_parent_uri}>")
+    return _apply_operation(move_concept_operation(concept_uri, new_parent_uri), graphdb_endpoint, dry_run,
+                            f"moving <{concept_uri}> under <{new_parent_uri}>")
+
+
+def copy_subtree_in_graphdb(concept_uri: str, target_parent_uri: Optional[str], graphdb_endpoint: str,
+                            suffix: Optional[str] = None, dry_run: bool = False) -> dict:
+    _require_concept(concept_uri)
+    if target_parent_uri:
+        _require_concept(target_parent_uri)
+    suffix = suffix or f"-copy-{uuid.uuid4().hex[:8]}"
+    new_root_uri = f"{concept_uri}{suffix}"
+    collisions = _copy_collisions(concept_uri, suffix)
+    if collisions:
+        raise HTTPException(status_code=409, detail=f"Концепти вже існують: {', '.join(collisions)}")
+    result = _apply_operation(copy_subtree_operation(concept_uri, target_parent_uri, suffix), graphdb_endpoint,
+                              dry_run, f"copying subtree <{concept_uri}> under <{target_parent_uri}>")
+    result.update({"new_root_uri": new_root_uri, "suffix": suffix})
+    return result
+
+
+def merge_concepts_in_graphdb(source_uri: str, target_uri: str, graphdb_endpoint: str, dry_run: bool = False) -> dict:
+    if source_uri == target_uri:
+        raise HTTPException(status_code=400, detail="Неможливо об'єднати концепт із самим собою")
+    _require_concept(source_uri)
+    _require_concept(target_uri)
+    if run_ask_query(merge_creates_cycle_query(source_uri, target_uri)):
+        raise HTTPException(status_code=400,
+                            detail=f"Об'єднання створить цикл між <{source_uri}> і <{target_uri}>")
+    return _apply_operation(merge_concepts_operation(source_uri, target_uri), graphdb_endpoint, dry_run,
+                            f"merging <{source_uri}> into <{target_uri}>")
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import os
+import time
+from typing import AsyncIterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from utils.change_events import publish_change
+from utils.graphdb_utils import import_taxonomy_to_graphdb
+from utils.llm_utils import LLMProvider, build_taxonomy_prompt, get_llm_provider
+from utils.rdf_validation import split_turtle_statements, NTRIPLES_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+LLM_STREAM_BATCH_STATEMENTS = int(os.getenv("LLM_STREAM_BATCH_STATEMENTS", 10))
+# Flush a smaller batch if this many seconds passed since the last insert, so the first concepts show up early
+LLM_STREAM_FLUSH_SECONDS = float(os.getenv("LLM_STREAM_FLUSH_SECONDS", 2.0))
+
+_DIRECTIVES = ("@prefix", "@base", "prefix ", "base ")
+
+
+class TurtleStatementStream:
+    """
+    Incremental Turtle reader for LLM output: skips any text before the first @prefix, stops at a
+    closing Markdown fence, keeps prefix directives aside and returns complete statements as the
+    chunks arrive.
+    """
+
+    def __init__(self):
+        self.prefixes: List[str] = []
+        self._buffer = ""
+        self._started = False
+        self._ended = False
+
+    def feed(self, chunk: str) -> List[str]:
+        if self._ended:
+            return []
+        self._buffer += chunk
+        if not self._started:
+            start = self._buffer.find("@prefix")
+            if start == -1:
+                # Keep a tail in case "@prefix" is split across chunks
+                self._buffer = self._buffer[-len("@prefix"):]
+                return []
+            self._buffer = self._buffer[start:]
+            self._started = True
+        fence = self._buffer.find("\n```")
+        if fence != -1:
+            self._buffer = self._buffer[:fence]
+            self._ended = True
+        statements, self._buffer = split_turtle_statements(self._buffer, final=self._ended)
+        return self._take_statements(statements)
+
+    def finish(self) -> Tuple[List[str], str]:
+        """Returns the statements completed by the end of input and the unterminated remainder."""
+        statements, remainder = split_turtle_statements(self._buffer, final=True)
+        self._buffer = ""
+        return self._take_statements(statements), remainder.strip()
+
+    def _take_statements(self, statements: List[str]) -> List[str]:
+        data_statements = []
+        for statement in statements:
+            if statement.lower().startswith(_DIRECTIVES):
+                self.prefixes.append(statement)
+            else:
+                data_statements.append(statement)
+        return data_statements
+
+
+def _statements_to_ntriples(prefixes: List[str], statements: List[str]) -> Tuple[bytes, int, int, List[dict]]:
+    """Parses a batch; statements that do not parse on their own are skipped and reported."""
+    from rdflib import Graph, RDF, RDFS, OWL
+
+    header = "\n".join(prefixes) + "\n"
+    graph = Graph()
+    skipped = []
+    try:
+        graph.parse(data=header + "\n".join(statements), format="turtle")
+    except Exception:
+        graph = Graph()
+        for statement in statements:
+            # Parsed on its own first, the parser keeps the triples it read before hitting an error
+            statement_graph = Graph()
+            try:
+                statement_graph.parse(data=header + statement, format="turtle")
+            except Exception as e:
+                skipped.append({"statement": statement[:200], "error": str(e)[:300]})
+                continue
+            graph += statement_graph
+    classes = set(graph.subjects(RDF.type, RDFS.Class)) | set(graph.subjects(RDF.type, OWL.Class))
+    if not len(graph):
+        return b"", 0, 0, skipped
+    return graph.serialize(format="nt", encoding="utf-8"), len(graph), len(classes), skipped
+
+
+async def stream_taxonomy_into_graphdb(corpus_text: str, graphdb_endpoint_statements: str,
+                                       provider: Optional[LLMProvider] = None) -> AsyncIterator[dict]:
+    """
+    Streams the LLM response, inserts complete Turtle statements into GraphDB in small batches
+    and yields progress events. Batches already inserted stay in GraphDB if the stream breaks off.
+    """
+    provider = provider or get_llm_provider()
+    reader = TurtleStatementStream()
+    progress = {"statements": 0, "triples": 0, "concepts": 0, "batches": 0, "skipped": 0}
+    pending: List[str] = []
+    last_flush = time.monotonic()
+    started = time.monotonic()
+
+    async def flush():
+        nonlocal pending, last_flush
+        batch, pending = pending, []
+        last_flush = time.monotonic()
+        ntriples, triples, concepts, skipped = await asyncio.to_thread(_statements_to_ntriples, reader.prefixes,
+                                                                       batch)
+        events = [{"event": "skipped", **item} for item in skipped]
+        progress["skipped"] += len(skipped)
+        if triples:
+            await asyncio.to_thread(import_taxonomy_to_graphdb, file_path=None,
+                                    graphdb_endpoint_statements=graphdb_endpoint_statements,
+                                    file_content_bytes=ntriples, content_type=NTRIPLES_CONTENT_TYPE)
+            progress["statements"] += len(batch) - len(skipped)
+            progress["triples"] += triples
+            progress["concepts"] += concepts
+            progress["batches"] += 1
+            publish_change("taxonomy_imported", source="llm-stream", triples=triples)
+            events.append({"event": "batch", "elapsed": round(time.monotonic() - started, 2), **progress})
+        return events
+
+    yield {"event": "started", "provider": provider.name}
+    try:
+        async for chunk in provider.stream(build_taxonomy_prompt(corpus_text)):
+            pending.extend(reader.feed(chunk))
+            if len(pending) >= LLM_STREAM_BATCH_STATEMENTS or (
+                    pending and time.monotonic() - last_flush >= LLM_STREAM_FLUSH_SECONDS):
+                for event in await flush():
+                    yield event
+
+        statements, remainder = reader.finish()
+        pending.extend(statements)
+        if pending:
+            for event in await flush():
+                yield event
+        if not reader.prefixes and not progress["statements"]:
+            raise ValueError("ЛЛМ повернула відповідь у неочікуваному форматі (відсутній @prefix).")
+        yield {"event": "done", "truncated": bool(remainder), "dropped_chars": len(remainder), **progress}
+    except Exception as e:
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        logger.error(f"Streaming LLM taxonomy generation failed after {progress['statements']} statements: {detail}",
+                     exc_info=True)
+        yield {"event": "error", "detail": detail, **progress}
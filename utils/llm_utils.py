@@ -1,5 +1,11 @@
-import google.generativeai as genai
+import asyncio
 import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import AsyncIterator, Callable, Dict, Optional
+
 from dotenv import load_dotenv
 import logging
 
@@ -8,21 +14,15 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-if not GEMINI_API_KEY:
-    logger.error("GEMINI_API_KEY not found in environment variables.")
-    raise ValueError("GEMINI_API_KEY not found. Please set it in a .env file or environment.")
-
-genai.configure(api_key=GEMINI_API_KEY)
-
 MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash-preview-04-17")
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
 
+CORPUS_START_MARKER = "--- START OF CORPUS ---"
+CORPUS_END_MARKER = "--- END OF CORPUS ---"
 
-async def generate_taxonomy_with_llm(corpus_text: str) -> str:
-    model = genai.GenerativeModel(MODEL_NAME)
-    logger.info(f"Using Gemini model: {MODEL_NAME}")
 
-    prompt = f"""
+def build_taxonomy_prompt(corpus_text: str) -> str:
+    return f"""
 Ти – експерт з онтологій та обробки природної мови. Твоє завдання – проаналізувати наданий корпус текстів українською мовою та створити з нього ієрархічну таксономію.
 Таксономія має бути представлена у форматі Turtle (TTL).
 
@@ -63,10 +63,73 @@ ex:SomeConceptName
 Твоя відповідь (тільки TTL):
     """
 
-    logger.info(f"Sending prompt to Gemini. Corpus length: {len(corpus_text)} chars.")
 
-    try:
-        MAX_OUTPUT_TOKENS = os.getenv("MAX_OUTPUT_TOKENS", 65500)
+def extract_ttl(response_text: str) -> str:
+    """Strips explanations and Markdown fences the model sometimes puts around the TTL."""
+    ttl_data = response_text.strip()
+
+    if not ttl_data.startswith("@prefix"):
+        logger.warning("LLM response did not start with @prefix. Attempting to clean.")
+
+        ttl_start_index = ttl_data.find("@prefix")
+        if ttl_start_index == -1:
+            logger.error(
+                f"LLM response did not contain @prefix. Cannot extract TTL. Response starts with: {ttl_data[:500]}")
+            raise ValueError("ЛЛМ повернула відповідь у неочікуваному форматі (відсутній @prefix).")
+
+        ttl_data = ttl_data[ttl_start_index:]
+
+        ttl_end_index_markdown = ttl_data.find("\n```")
+        if ttl_end_index_markdown != -1:
+            logger.warning(
+                f"Found potential markdown end at index {ttl_end_index_markdown}. Truncating response.")
+            ttl_data = ttl_data[:ttl_end_index_markdown]
+
+        if not ttl_data.strip():
+            logger.error("Extracted TTL data is empty after cleaning.")
+            raise ValueError("Не вдалося витягти валідні TTL дані з відповіді ЛЛМ.")
+
+    return ttl_data
+
+
+class LLMProvider(ABC):
+    """Interface of an LLM backend that turns a prompt into text."""
+
+    name = "base"
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        ...
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yields the response in chunks as they arrive. Providers without streaming yield it at once."""
+        yield await self.generate(prompt)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini. The google.generativeai/grpc stack is imported on the first request, not at startup."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, model_name: str = MODEL_NAME):
+        self.api_key = api_key or GEMINI_API_KEY
+        self.model_name = model_name
+        self._genai = None
+
+    def _get_genai(self):
+        if self._genai is None:
+            if not self.api_key:
+                logger.error("GEMINI_API_KEY not found in environment variables.")
+                raise ValueError("GEMINI_API_KEY not found. Please set it in a .env file or environment.")
+            import google.generativeai as genai
+            genai.configure(api_key=self.api_key)
+            self._genai = genai
+        return self._genai
+
+    def _generate_content(self, prompt: str, stream: bool = False):
+        genai = self._get_genai()
+        model = genai.GenerativeModel(self.model_name)
+        logger.info(f"Using Gemini model: {self.model_name}")
 
         generation_config = genai.types.GenerationConfig(
             # temperature=0.7,
@@ -79,43 +142,25 @@ ex:SomeConceptName
             {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
         ]
 
-        response = model.generate_content(
+        return model.generate_content(
             prompt,
             generation_config=generation_config,
-            safety_settings=safety_settings
+            safety_settings=safety_settings,
+            stream=stream
         )
 
+    def _generate_sync(self, prompt: str) -> str:
+        MAX_OUTPUT_TOKENS = os.getenv("MAX_OUTPUT_TOKENS", 65500)
+
+        response = self._generate_content(prompt)
+
         if response.parts:
             full_response_text = response.text.strip()
             logger.debug(f"Raw LLM response (full): \n{full_response_text}")
-            ttl_data = full_response_text
 
             if len(response.text) >= int(MAX_OUTPUT_TOKENS):
                 logger.warning(f"LLM response might have been truncated by max_output_tokens ({MAX_OUTPUT_TOKENS}).")
-
-            if not ttl_data.startswith("@prefix"):
-                logger.warning("LLM response did not start with @prefix. Attempting to clean.")
-
-                ttl_start_index = ttl_data.find("@prefix")
-                if ttl_start_index == -1:
-                    logger.error(
-                        f"LLM response did not contain @prefix. Cannot extract TTL. Response starts with: {ttl_data[:500]}")
-                    raise ValueError("ЛЛМ повернула відповідь у неочікуваному форматі (відсутній @prefix).")
-
-                ttl_data = ttl_data[ttl_start_index:]
-
-                ttl_end_index_markdown = ttl_data.find("\n```")
-                if ttl_end_index_markdown != -1:
-                    logger.warning(
-                        f"Found potential markdown end at index {ttl_end_index_markdown}. Truncating response.")
-                    ttl_data = ttl_data[:ttl_end_index_markdown]
-
-                if not ttl_data.strip():
-                    logger.error("Extracted TTL data is empty after cleaning.")
-                    raise ValueError("Не вдалося витягти валідні TTL дані з відповіді ЛЛМ.")
-
-            logger.info(f"LLM generated taxonomy: {ttl_data}")
-            return ttl_data
+            return full_response_text
         else:
             logger.error(f"LLM response was empty or blocked. Feedback: {response.prompt_feedback}")
             block_reason = response.prompt_feedback.block_reason if response.prompt_feedback else "Unknown"
@@ -124,6 +169,138 @@ ex:SomeConceptName
                 block_message += f" Safety Ratings: {response.prompt_feedback.safety_ratings}"
             raise ValueError(block_message)
 
+    async def generate(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._generate_sync, prompt)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        stopped = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for chunk in self._generate_content(prompt, stream=True):
+                    if stopped.is_set():
+                        break
+                    if chunk.parts:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk.text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(None, produce)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Lets the SDK iterator stop early when the client goes away
+            stopped.set()
+
+
+class LocalProvider(LLMProvider):
+    """
+    Deterministic offline provider for tests and benchmarks. Builds a two-level taxonomy from the
+    most frequent words of the corpus embedded in the prompt; the same corpus always gives the same TTL.
+    """
+
+    name = "local"
+
+    def __init__(self, top_concepts: int = 5, subconcepts_per_concept: int = 4):
+        self.top_concepts = top_concepts
+        self.subconcepts_per_concept = subconcepts_per_concept
+
+    @staticmethod
+    def _corpus_from_prompt(prompt: str) -> str:
+        start = prompt.find(CORPUS_START_MARKER)
+        end = prompt.rfind(CORPUS_END_MARKER)
+        if start == -1 or end == -1 or end < start:
+            return prompt
+        return prompt[start + len(CORPUS_START_MARKER):end]
+
+    def generate_ttl(self, corpus_text: str) -> str:
+        words = re.findall(r"[^\W\d_]{4,}", corpus_text.lower())
+        ranked = [word for word, _ in sorted(Counter(words).items(), key=lambda item: (-item[1], item[0]))]
+        wanted = self.top_concepts * (self.subconcepts_per_concept + 1)
+        ranked = ranked[:wanted]
+
+        lines = [
+            "@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .",
+            "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+            "@prefix owl: <http://www.w3.org/2002/07/owl#> .",
+            "@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .",
+            "@prefix ex: <http://example.org/taxonomy/document-corpus/> .",
+            "",
+        ]
+        top_words = ranked[:self.top_concepts]
+        rest = ranked[self.top_concepts:]
+        for index, word in enumerate(top_words):
+            lines.append(self._concept(word, None))
+            for child in rest[index::len(top_words)][:self.subconcepts_per_concept]:
+                lines.append(self._concept(child, word))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _local_name(word: str) -> str:
+        return "Concept_" + "".join(ch if ch.isascii() and ch.isalnum() else f"_{ord(ch):x}" for ch in word)
+
+    def _concept(self, word: str, parent: Optional[str]) -> str:
+        statement = [f"ex:{self._local_name(word)}", "    a rdfs:Class ;"]
+        if parent:
+            statement.append(f"    rdfs:subClassOf ex:{self._local_name(parent)} ;")
+        statement.append(f'    rdfs:label "{word}"@uk ;')
+        statement.append(f'    rdfs:label "{word}"@en ;')
+        statement.append(f'    rdfs:comment "Концепт \\"{word}\\" з корпусу."@uk ;')
+        statement.append(f'    rdfs:comment "Concept \\"{word}\\" from the corpus."@en .')
+        return "\n".join(statement) + "\n"
+
+    async def generate(self, prompt: str) -> str:
+        return self.generate_ttl(self._corpus_from_prompt(prompt))
+
+    async def stream(self, prompt: str, chunk_size: int = 64) -> AsyncIterator[str]:
+        text = await self.generate(prompt)
+        for start in range(0, len(text), chunk_size):
+            yield text[start:start + chunk_size]
+            await asyncio.sleep(0)
+
+
+LLM_PROVIDERS: Dict[str, Callable[[], LLMProvider]] = {
+    "gemini": GeminiProvider,
+    "local": LocalProvider,
+}
+
+_providers: Dict[str, LLMProvider] = {}
+
+
+def register_llm_provider(name: str, factory: Callable[[], LLMProvider]):
+    LLM_PROVIDERS[name] = factory
+    _providers.pop(name, None)
+
+
+def get_llm_provider(name: Optional[str] = None) -> LLMProvider:
+    name = name or LLM_PROVIDER
+    if name not in _providers:
+        if name not in LLM_PROVIDERS:
+            raise ValueError(f"Невідомий LLM провайдер: {name}. Доступні: {', '.join(LLM_PROVIDERS)}")
+        _providers[name] = LLM_PROVIDERS[name]()
+    return _providers[name]
+
+
+async def generate_taxonomy_with_llm(corpus_text: str, provider: Optional[LLMProvider] = None) -> str:
+    provider = provider or get_llm_provider()
+    prompt = build_taxonomy_prompt(corpus_text)
+
+    logger.info(f"Sending prompt to LLM provider '{provider.name}'. Corpus length: {len(corpus_text)} chars.")
+
+    try:
+        ttl_data = extract_ttl(await provider.generate(prompt))
+        logger.info(f"LLM generated taxonomy: {ttl_data}")
+        return ttl_data
     except Exception as e:
-        logger.exception(f"Error calling Gemini API: {e}")
+        logger.exception(f"Error calling LLM provider '{provider.name}': {e}")
         raise
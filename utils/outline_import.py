@@ -0,0 +1,352 @@
+import csv
+import io
+import json
+import logging
+import os
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from utils.graphdb_utils import (
+    mint_concept_uri,
+    get_existing_concept_uris,
+    insert_triples_in_graphdb,
+    run_ask_query,
+)
+from utils.sparql_queries import LANG_TAG_PATTERN, concept_exists_query, iri_term, literal_term
+
+logger = logging.getLogger(__name__)
+
+# Upper bound for the text of a single INSERT DATA update; bigger imports are split into several
+OUTLINE_IMPORT_MAX_UPDATE_BYTES = int(os.getenv("OUTLINE_IMPORT_MAX_UPDATE_BYTES", 4 * 1024 * 1024))
+OUTLINE_IMPORT_MAX_CONCEPTS = int(os.getenv("OUTLINE_IMPORT_MAX_CONCEPTS", 100000))
+
+OUTLINE_FORMATS = ("outline", "csv", "json")
+OUTLINE_TAB_WIDTH = 4
+OUTLINE_BULLETS = ("- ", "* ", "+ ")
+OUTLINE_DEFINITION_SEPARATOR = "::"
+CSV_PATH_SEPARATOR = "/"
+
+RDF_TYPE = "<http://www.w3.org/1999/02/22-rdf-syntax-ns#type>"
+RDFS_CLASS = "<http://www.w3.org/2000/01/rdf-schema#Class>"
+RDFS_SUBCLASS_OF = "<http://www.w3.org/2000/01/rdf-schema#subClassOf>"
+RDFS_LABEL = "<http://www.w3.org/2000/01/rdf-schema#label>"
+RDFS_COMMENT = "<http://www.w3.org/2000/01/rdf-schema#comment>"
+
+
+class OutlineNode:
+    __slots__ = ("name", "labels", "definitions", "children", "uri", "key", "references")
+
+    def __init__(self, name: str, key: Optional[str] = None):
+        self.name = name
+        self.labels: List[Tuple[str, Optional[str]]] = []
+        self.definitions: List[Tuple[str, Optional[str]]] = []
+        self.children: List["OutlineNode"] = []
+        self.uri: Optional[str] = None
+        # URI given in the document (JSON "key"); used as is instead of minting one
+        self.key = key
+        # Keys of further children listed only as references (concepts with several parents)
+        self.references: List[str] = []
+
+
+def outline_format_for_filename(filename: str) -> str:
+    lowered = (filename or "").lower()
+    if lowered.endswith(".csv"):
+        return "csv"
+    if lowered.endswith(".json"):
+        return "json"
+    return "outline"
+
+
+def _bad_input(message: str):
+    raise HTTPException(status_code=400, detail=message)
+
+
+def parse_outline(text: str, lang: Optional[str] = None) -> List[OutlineNode]:
+    """
+    One concept per line, nesting by indentation (tabs count as OUTLINE_TAB_WIDTH spaces).
+    Markdown bullets are allowed; "Name :: definition" adds a definition. Empty lines and
+    lines starting with "#" are skipped.
+    """
+    roots = []
+    # (indent, node) of the current line's ancestors
+    stack: List[Tuple[int, OutlineNode]] = []
+    for line in text.splitlines():
+        expanded = line.expandtabs(OUTLINE_TAB_WIDTH)
+        content = expanded.strip()
+        if not content or content.startswith("#"):
+            continue
+        indent = len(expanded) - len(expanded.lstrip())
+        if content.startswith(OUTLINE_BULLETS):
+            content = content[2:].strip()
+        name, _, definition = content.partition(OUTLINE_DEFINITION_SEPARATOR)
+        name, definition = name.strip(), definition.strip()
+        if not name:
+            continue
+
+        node = OutlineNode(name)
+        node.labels.append((name, lang))
+        if definition:
+            node.definitions.append((definition, lang))
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        (stack[-1][1].children if stack else roots).append(node)
+        stack.append((indent, node))
+    return roots
+
+
+def _literal_columns(fieldnames: List[str], prefix: str) -> List[Tuple[str, Optional[str]]]:
+    """(column, lang) for columns named like "label" or "label@en"."""
+    columns = []
+    for field in fieldnames:
+        name, _, column_lang = (field or "").strip().partition("@")
+        if name.lower() == prefix:
+            columns.append((field, column_lang or None))
+    return columns
+
+
+def parse_csv(text: str, lang: Optional[str] = None) -> List[OutlineNode]:
+    """
+    Columns: "path" ("Animals/Mammals/Cats"), any number of "label@<lang>" and
+    "definition@<lang>" columns (untagged ones use lang). Missing ancestors of a path are
+    created with the path segment as their label.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    fieldnames = reader.fieldnames or []
+    if "path" not in [field.strip().lower() for field in fieldnames]:
+        _bad_input("CSV має містити колонку 'path'")
+    path_column = next(field for field in fieldnames if field.strip().lower() == "path")
+    label_columns = _literal_columns(fieldnames, "label")
+    definition_columns = _literal_columns(fieldnames, "definition")
+
+    roots = []
+    nodes: Dict[Tuple[str, ...], OutlineNode] = {}
+    for row in reader:
+        segments = tuple(segment.strip() for segment in (row.get(path_column) or "").split(CSV_PATH_SEPARATOR)
+                         if segment.strip())
+        if not segments:
+            continue
+        for depth in range(1, len(segments) + 1):
+            path = segments[:depth]
+            if path in nodes:
+                continue
+            node = nodes[path] = OutlineNode(path[-1])
+            (nodes[path[:-1]].children if depth > 1 else roots).append(node)
+        node = nodes[segments]
+        for column, column_lang in label_columns:
+            value = (row.get(column) or "").strip()
+            if value:
+                node.labels.append((value, column_lang or lang))
+        for column, column_lang in definition_columns:
+            value = (row.get(column) or "").strip()
+            if value:
+                node.definitions.append((value, column_lang or lang))
+
+    for node in nodes.values():
+        if not node.labels:
+            node.labels.append((node.name, lang))
+    return roots
+
+
+def _json_literals(value, lang: Optional[str]) -> List[Tuple[str, Optional[str]]]:
+    """Accepts "text", {"en": "text"}, [{"value": "text", "lang": "en"}] or lists of those."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [(value, lang)] if value.strip() else []
+    if isinstance(value, dict) and "value" in value:
+        return [(str(value["value"]), value.get("lang") or lang)] if str(value["value"]).strip() else []
+    if isinstance(value, dict):
+        return [literal for value_lang, text in value.items() for literal in _json_literals(text, value_lang)]
+    if isinstance(value, list):
+        return [literal for item in value for literal in _json_literals(item, lang)]
+    _bad_input(f"Некоректне значення мітки або визначення: {value!r}")
+
+
+def _json_key(item: dict) -> Optional[str]:
+    key = item.get("key")
+    if key is None:
+        return None
+    try:
+        iri_term(key if isinstance(key, str) else "")
+    except ValueError:
+        _bad_input(f"Некоректний ключ концепту: {key!r}")
+    return key
+
+
+def parse_json_tree(data, lang: Optional[str] = None) -> List[OutlineNode]:
+    """
+    A node or a list of nodes: {"name": ..., "labels": ..., "definitions": ..., "children": [...]}.
+    "title"/"label" work as the name and "definition" as definitions. A "key" is used as the
+    concept URI, and {"key": ..., "ref": true} children add a further parent to that concept,
+    so the output of /taxonomy-tree can be imported back with its URIs and all its parents.
+    """
+    if isinstance(data, dict) and isinstance(data.get("concepts"), list):
+        data = data["concepts"]
+    items = data if isinstance(data, list) else [data]
+    roots = []
+    # Iterative, so deep trees do not hit the recursion limit
+    pending = [(item, roots, None) for item in reversed(items)]
+    while pending:
+        item, siblings, parent = pending.pop()
+        if not isinstance(item, dict):
+            _bad_input(f"Очікувався об'єкт концепту, отримано: {item!r}")
+        if item.get("ref"):
+            # Repeated occurrence of a concept with several parents in the /taxonomy-tree output
+            key = _json_key(item)
+            if key and parent is not None:
+                parent.references.append(key)
+            continue
+        labels = _json_literals(item.get("labels"), lang) + _json_literals(item.get("label"), lang)
+        name = item.get("name") or item.get("title") or (labels[0][0] if labels else None)
+        if not isinstance(name, str) or not name.strip():
+            _bad_input(f"Концепт без назви: {json.dumps(item, ensure_ascii=False)[:200]}")
+        node = OutlineNode(name.strip(), _json_key(item))
+        node.labels = labels or [(node.name, lang)]
+        node.definitions = (_json_literals(item.get("definitions"), lang) +
+                            _json_literals(item.get("definition"), lang))
+        siblings.append(node)
+        children = item.get("children") or []
+        if not isinstance(children, list):
+            _bad_input(f"Поле 'children' концепту '{node.name}' має бути списком")
+        pending.extend((child, node.children, node) for child in reversed(children))
+    return roots
+
+
+def parse_outline_document(content: bytes, outline_format: str, lang: Optional[str] = None) -> List[OutlineNode]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        _bad_input("Файл має бути в кодуванні UTF-8")
+    if outline_format == "csv":
+        return parse_csv(text, lang)
+    if outline_format == "json":
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            _bad_input(f"Некоректний JSON: {e}")
+        return parse_json_tree(data, lang)
+    return parse_outline(text, lang)
+
+
+def _walk(roots: List[OutlineNode], parent_uri: Optional[str]):
+    """Yields (node, parent_uri_or_None) parents first; parent URIs are read after they are assigned."""
+    pending = [(node, None) for node in reversed(roots)]
+    while pending:
+        node, parent = pending.pop()
+        yield node, parent.uri if parent else parent_uri
+        pending.extend((child, node) for child in reversed(node.children))
+
+
+def assign_uris(roots: List[OutlineNode], taken: set, parent_uri: Optional[str] = None) -> int:
+    """
+    Gives every node its key, or mints a URI adding _2, _3, ... where it clashes with taken ones
+    or with a key. Returns the count.
+    """
+    keys = set()
+    for node, _ in _walk(roots, parent_uri):
+        if node.key:
+            if node.key in keys:
+                _bad_input(f"Ключ '{node.key}' повторюється; повторні входження позначте \"ref\": true")
+            keys.add(node.key)
+            node.uri = node.key
+    taken = taken | keys
+    count = len(keys)
+    for node, _ in _walk(roots, parent_uri):
+        if node.key:
+            continue
+        base = mint_concept_uri(node.name)
+        uri, suffix = base, 2
+        while uri in taken:
+            uri, suffix = f"{base}_{suffix}", suffix + 1
+        taken.add(uri)
+        node.uri = uri
+        count += 1
+    return count
+
+
+def compile_triples(roots: List[OutlineNode], parent_uri: Optional[str] = None):
+    """Yields the N-Triples lines of one concept at a time."""
+    imported = {node.uri for node, _ in _walk(roots, parent_uri)}
+    for node, parent in _walk(roots, parent_uri):
+        subject = f"<{node.uri}>"
+        lines = [f"{subject} {RDF_TYPE} {RDFS_CLASS} ."]
+        if parent:
+            lines.append(f"{subject} {RDFS_SUBCLASS_OF} <{parent}> .")
+        # References to concepts outside the document are left out rather than creating dangling classes
+        lines.extend(f"<{key}> {RDFS_SUBCLASS_OF} {subject} ." for key in dict.fromkeys(node.references)
+                     if key in imported and key != node.uri)
+        lines.extend(f"{subject} {RDFS_LABEL} {literal_term(value, value_lang)} ."
+                     for value, value_lang in dict.fromkeys(node.labels))
+        lines.extend(f"{subject} {RDFS_COMMENT} {literal_term(value, value_lang)} ."
+                     for value, value_lang in dict.fromkeys(node.definitions))
+        yield lines
+
+
+def chunk_triples(concept_triples, max_bytes: int = OUTLINE_IMPORT_MAX_UPDATE_BYTES) -> List[List[str]]:
+    """Packs whole concepts into chunks of at most max_bytes of triple text (one concept never splits)."""
+    chunks, current, current_bytes = [], [], 0
+    for lines in concept_triples:
+        size = sum(len(line.encode("utf-8")) + 1 for line in lines)
+        if current and current_bytes + size > max_bytes:
+            chunks.append(current)
+            current, current_bytes = [], 0
+        current.extend(lines)
+        current_bytes += size
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _languages(node: OutlineNode) -> set:
+    return {literal_lang for _, literal_lang in node.labels + node.definitions if literal_lang}
+
+
+def _check_languages(roots: List[OutlineNode]):
+    invalid = set()
+    for node, _ in _walk(roots, None):
+        invalid.update(tag for tag in _languages(node) if not LANG_TAG_PATTERN.match(tag))
+    if invalid:
+        _bad_input(f"Некоректний код мови: {', '.join(sorted(invalid))}")
+
+
+def import_outline(content: bytes, outline_format: str, graphdb_endpoint: str, lang: Optional[str] = None,
+                   parent_uri: Optional[str] = None, dry_run: bool = False) -> dict:
+    """
+    Parses an outline/CSV/JSON tree, mints unique URIs and writes everything with as few
+    INSERT DATA updates as OUTLINE_IMPORT_MAX_UPDATE_BYTES allows (usually one).
+    """
+    roots = parse_outline_document(content, outline_format, lang)
+    if not roots:
+        _bad_input("Файл не містить жодного концепту")
+    _check_languages(roots)
+    if parent_uri:
+        try:
+            iri_term(parent_uri)
+        except ValueError as e:
+            _bad_input(str(e))
+    if parent_uri and not run_ask_query(concept_exists_query(parent_uri)):
+        raise HTTPException(status_code=404, detail=f"Концепт '{parent_uri}' не знайдено")
+
+    concept_count = assign_uris(roots, get_existing_concept_uris(), parent_uri)
+    if concept_count > OUTLINE_IMPORT_MAX_CONCEPTS:
+        _bad_input(f"Забагато концептів: {concept_count} (максимум {OUTLINE_IMPORT_MAX_CONCEPTS})")
+    chunks = chunk_triples(compile_triples(roots, parent_uri))
+    triple_count = sum(len(chunk) for chunk in chunks)
+
+    result = {
+        "dry_run": dry_run,
+        "concepts": concept_count,
+        "triples": triple_count,
+        "updates": len(chunks),
+        "roots": [node.uri for node in roots],
+    }
+    if dry_run:
+        result["preview"] = [{"uri": node.uri, "parent": parent, "name": node.name,
+                              "languages": sorted(_languages(node))}
+                             for node, parent in _walk(roots, parent_uri)]
+        return result
+
+    logger.info(f"Importing outline: {concept_count} concepts, {triple_count} triples in {len(chunks)} update(s)")
+    insert_triples_in_graphdb(chunks, graphdb_endpoint)
+    return result
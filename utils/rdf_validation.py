@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+RDF_VALIDATION_WORKERS = int(os.getenv("RDF_VALIDATION_WORKERS", min(4, os.cpu_count() or 1)))
+
+RDF_FORMATS_BY_EXTENSION = {
+    ".ttl": "turtle",
+    ".rdf": "xml",
+    ".owl": "xml",
+    ".nt": "nt",
+}
+
+NTRIPLES_CONTENT_TYPE = "application/n-triples"
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def rdf_format_for_filename(filename: str) -> Optional[str]:
+    """Returns the rdflib parser name for a file name, or None if the extension is not supported."""
+    lowered = (filename or "").lower()
+    for extension, rdf_format in RDF_FORMATS_BY_EXTENSION.items():
+        if lowered.endswith(extension):
+            return rdf_format
+    return None
+
+
+def split_turtle_statements(text: str, final: bool = False) -> Tuple[List[str], str]:
+    """
+    Splits Turtle text into complete statements (each ending with its terminating '.').
+    Returns the statements and the unterminated remainder. Dots inside IRIs, string
+    literals, comments and blank-node/collection brackets are ignored. With final=False
+    a dot at the very end of the text is not treated as a terminator, because more
+    input may follow (e.g. 'ex:a.b' split across chunks).
+    """
+    statements = []
+    start = 0
+    i = 0
+    n = len(text)
+    depth = 0
+    while i < n:
+        ch = text[i]
+        if ch == '#':
+            newline = text.find('\n', i)
+            if newline == -1:
+                break
+            i = newline + 1
+            continue
+        if ch == '<':
+            close = text.find('>', i + 1)
+            if close == -1:
+                break
+            i = close + 1
+            continue
+        if ch == '"' or ch == "'":
+            long_quote = ch * 3
+            if text.startswith(long_quote, i):
+                close = text.find(long_quote, i + 3)
+                while close != -1 and _is_escaped(text, close):
+                    close = text.find(long_quote, close + 1)
+                if close == -1:
+                    break
+                i = close + 3
+                continue
+            j = i + 1
+            while j < n and not (text[j] == ch and not _is_escaped(text, j)):
+                if text[j] == '\n':
+                    break
+                j += 1
+            if j >= n:
+                break
+            i = j + 1
+            continue
+        if ch in '[(':
+            depth += 1
+        elif ch in '])':
+            depth = max(0, depth - 1)
+        elif ch == '.' and depth == 0:
+            if i + 1 < n:
+                if text[i + 1].isspace() or text[i + 1] == '#':
+                    statements.append(text[start:i + 1].strip())
+                    start = i + 1
+            elif final:
+                statements.append(text[start:i + 1].strip())
+                start = i + 1
+        i += 1
+    return [s for s in statements if s], text[start:]
+
+
+def _is_escaped(text: str, index: int) -> bool:
+    backslashes = 0
+    index -= 1
+    while index >= 0 and text[index] == '\\':
+        backslashes += 1
+        index -= 1
+    return backslashes % 2 == 1
+
+
+def repair_truncated_turtle(text: str) -> Tuple[str, int]:
+    """Drops an unterminated trailing statement. Returns the repaired text and the number of dropped characters."""
+    statements, remainder = split_turtle_statements(text, final=True)
+    return "\n".join(statements) + "\n", len(remainder.strip())
+
+
+def _find_cycles(edges):
+    """Returns strongly connected components with more than one class (iterative Tarjan)."""
+    graph = {}
+    for child, parent in edges:
+        graph.setdefault(child, []).append(parent)
+        graph.setdefault(parent, [])
+
+    index_counter = 0
+    indexes = {}
+    lowlinks = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+
+    for root in graph:
+        if root in indexes:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, child_pos = work.pop()
+            if child_pos == 0:
+                indexes[node] = lowlinks[node] = index_counter
+                index_counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            neighbours = graph[node]
+            recurse = False
+            for pos in range(child_pos, len(neighbours)):
+                neighbour = neighbours[pos]
+                if neighbour not in indexes:
+                    work.append((node, pos + 1))
+                    work.append((neighbour, 0))
+                    recurse = True
+                    break
+                if neighbour in on_stack:
+                    lowlinks[node] = min(lowlinks[node], indexes[neighbour])
+            if recurse:
+                continue
+            if lowlinks[node] == indexes[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1:
+                    cycles.append(sorted(component))
+            if work:
+                parent = work[-1][0]
+                lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+    return cycles
+
+
+def validate_rdf(content: bytes, rdf_format: str, repair: bool = False, source: str = "") -> Tuple[dict, bytes]:
+    """
+    Parses RDF content and checks the taxonomy structure. Returns a report and the
+    content re-serialized as N-Triples (empty if the content is invalid).
+    Runs in a worker process; keep it free of module-level state.
+    """
+    from rdflib import Graph, RDF, RDFS, OWL, URIRef
+
+    report = {
+        "source": source,
+        "format": rdf_format,
+        "valid": False,
+        "errors": [],
+        "warnings": [],
+        "repaired": False,
+        "dropped_chars": 0,
+        "triple_count": 0,
+        "class_count": 0,
+        "edge_count": 0,
+        "cycles": [],
+        "dangling_parents": [],
+        "missing_labels": [],
+    }
+
+    graph = Graph()
+    try:
+        graph.parse(data=content, format=rdf_format)
+    except Exception as parse_error:
+        if not (repair and rdf_format == "turtle"):
+            report["errors"].append(f"Помилка розбору RDF: {parse_error}")
+            return report, b""
+        repaired_text, dropped = repair_truncated_turtle(content.decode("utf-8", errors="replace"))
+        graph = Graph()
+        try:
+            graph.parse(data=repaired_text, format=rdf_format)
+        except Exception as repair_error:
+            report["errors"].append(f"Помилка розбору RDF: {parse_error}; відновлення не вдалося: {repair_error}")
+            return report, b""
+        report["repaired"] = True
+        report["dropped_chars"] = dropped
+        report["warnings"].append(f"Відкинуто незавершений фрагмент у кінці ({dropped} символів)")
+
+    classes = {s for s in graph.subjects(RDF.type, RDFS.Class) if isinstance(s, URIRef)}
+    classes |= {s for s in graph.subjects(RDF.type, OWL.Class) if isinstance(s, URIRef)}
+    edges = [(str(child), str(parent)) for child, parent in graph.subject_objects(RDFS.subClassOf)
+             if isinstance(child, URIRef) and isinstance(parent, URIRef) and child != parent]
+    class_names = {str(c) for c in classes}
+
+    report["triple_count"] = len(graph)
+    report["class_count"] = len(classes)
+    report["edge_count"] = len(edges)
+    report["cycles"] = _find_cycles(edges)
+    report["dangling_parents"] = [{"concept": child, "parent": parent} for child, parent in sorted(set(edges))
+                                  if parent not in class_names]
+    report["missing_labels"] = sorted(str(c) for c in classes if graph.value(c, RDFS.label) is None)
+
+    if report["cycles"]:
+        report["errors"].append(f"Виявлено цикли в ієрархії rdfs:subClassOf: {len(report['cycles'])}")
+    if report["dangling_parents"]:
+        report["warnings"].append(f"Батьківські концепти не оголошені як класи: {len(report['dangling_parents'])}")
+    if report["missing_labels"]:
+        report["warnings"].append(f"Концепти без rdfs:label: {len(report['missing_labels'])}")
+
+    if report["errors"]:
+        return report, b""
+
+    report["valid"] = True
+    return report, graph.serialize(format="nt", encoding="utf-8")
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=RDF_VALIDATION_WORKERS)
+    return _process_pool
+
+
+async def validate_rdf_async(content: bytes, rdf_format: str, repair: bool = False,
+                             source: str = "") -> Tuple[dict, bytes]:
+    """Runs validate_rdf in the process pool so parsing does not block the event loop."""
+    loop = asyncio.get_running_loop()
+    report, ntriples = await loop.run_in_executor(_get_process_pool(), validate_rdf, content, rdf_format, repair,
+                                                  source)
+    logger.info(f"RDF validation for '{source}': valid={report['valid']}, triples={report['triple_count']}, "
+                f"classes={report['class_count']}, edges={report['edge_count']}, repaired={report['repaired']}")
+    return report, ntriples
+
+
+def shutdown_validation_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
@@ -0,0 +1,265 @@
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import io
+import json
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiling is only wired in when a token is configured; requests opt in with "X-Profile: <token>"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILING_ENABLED = bool(PROFILING_TOKEN)
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(tempfile.gettempdir(), "taxonomy-profiles"))
+PROFILING_MAX_SAVED = int(os.getenv("PROFILING_MAX_SAVED", 50))
+PROFILING_MODES = ("cprofile", "timing")
+
+# Functions that are too hot for spans; in cprofile mode their cumulative time goes into Server-Timing
+PROFILED_FUNCTIONS = ("parse_concat_results", "get_uri_display_name", "select_languages", "_make_node")
+
+_current_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "current_profile", default=None)
+# One cProfile request at a time: on Python 3.12+ a profiler sees every thread, and only one can be active
+_cprofile_slot = threading.Lock()
+_NULL_SPAN = nullcontext()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class RequestProfile:
+    def __init__(self, mode: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.mode = mode
+        self.created = time.time()
+        self.spans: List[tuple] = []
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._depth: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _enter_thread(self):
+        # The event loop thread runs other requests between awaits; spans there are timed, not profiled
+        if self.mode != "cprofile" or _on_event_loop():
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            depth = self._depth.get(thread_id, 0)
+            self._depth[thread_id] = depth + 1
+            if depth == 0:
+                profiler = self._profilers.setdefault(thread_id, cProfile.Profile())
+        if depth == 0:
+            try:
+                profiler.enable()
+            except ValueError as e:
+                # Another profiler is already active (sys.monitoring allows one per interpreter)
+                logger.debug(f"Request profile {self.id}: cProfile not enabled: {e}")
+
+    def _exit_thread(self):
+        if self.mode != "cprofile" or _on_event_loop():
+            return
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._depth[thread_id] -= 1
+            depth = self._depth[thread_id]
+        if depth == 0:
+            self._profilers[thread_id].disable()
+
+    def stats(self) -> Optional[pstats.Stats]:
+        stats = None
+        for profiler in self._profilers.values():
+            if stats is None:
+                stats = pstats.Stats(profiler, stream=io.StringIO())
+            else:
+                stats.add(profiler)
+        return stats
+
+    def stage_totals(self) -> Dict[str, dict]:
+        totals = {}
+        for name, _, duration in self.spans:
+            entry = totals.setdefault(name, {"count": 0, "ms": 0.0})
+            entry["count"] += 1
+            entry["ms"] += duration * 1000
+        return totals
+
+
+class _Span:
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.profile._enter_thread()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        duration = time.perf_counter() - self.started
+        self.profile._exit_thread()
+        self.profile.spans.append((self.name, self.started, duration))
+        return False
+
+
+def span(name: str):
+    """Times a stage of the current request when it is being profiled; a shared no-op otherwise."""
+    if not PROFILING_ENABLED:
+        return _NULL_SPAN
+    profile = _current_profile.get()
+    if profile is None:
+        return _NULL_SPAN
+    return _Span(profile, name)
+
+
+def _function_totals(stats: Optional[pstats.Stats]) -> Dict[str, float]:
+    """Cumulative milliseconds per function name for PROFILED_FUNCTIONS."""
+    totals = {}
+    if stats is None:
+        return totals
+    for (_, _, function_name), (_, _, _, cumulative, _) in stats.stats.items():
+        if function_name in PROFILED_FUNCTIONS:
+            totals[function_name] = totals.get(function_name, 0.0) + cumulative * 1000
+    return totals
+
+
+def server_timing_header(stages: Dict[str, dict], functions: Dict[str, float]) -> str:
+    parts = []
+    for name, entry in stages.items():
+        part = f"{name};dur={entry['ms']:.1f}"
+        if entry["count"] > 1:
+            part += f';desc="{entry["count"]} calls"'
+        parts.append(part)
+    parts.extend(f"{name};dur={ms:.1f}" for name, ms in functions.items())
+    return ", ".join(parts)
+
+
+def _save_profile(profile: RequestProfile, summary: dict, stats: Optional[pstats.Stats]):
+    os.makedirs(PROFILING_DIR, exist_ok=True)
+    if stats is not None:
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(40)
+        summary["top_functions"] = text.getvalue()
+        stats.dump_stats(os.path.join(PROFILING_DIR, f"{profile.id}.prof"))
+    tmp_path = os.path.join(PROFILING_DIR, f".{profile.id}.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, os.path.join(PROFILING_DIR, f"{profile.id}.json"))
+
+    saved = sorted((entry for entry in os.scandir(PROFILING_DIR) if entry.name.endswith(".json")),
+                   key=lambda entry: entry.stat().st_mtime)
+    for entry in saved[:max(0, len(saved) - PROFILING_MAX_SAVED)]:
+        profile_id = entry.name[:-len(".json")]
+        for suffix in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(PROFILING_DIR, profile_id + suffix))
+            except OSError:
+                pass
+
+
+def _profile_path(profile_id: str, suffix: str) -> Optional[str]:
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILING_DIR, profile_id + suffix)
+    return path if os.path.exists(path) else None
+
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILING_DIR):
+        if entry.name.endswith(".json"):
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    summary = json.load(f)
+            except (OSError, ValueError):
+                continue
+            summary.pop("top_functions", None)
+            profiles.append(summary)
+    return sorted(profiles, key=lambda summary: summary["created"], reverse=True)
+
+
+def load_profile(profile_id: str) -> Optional[dict]:
+    path = _profile_path(profile_id, ".json")
+    if path is None:
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def raw_profile_path(profile_id: str) -> Optional[str]:
+    return _profile_path(profile_id, ".prof")
+
+
+def token_matches(value: Optional[str]) -> bool:
+    if not PROFILING_TOKEN or not value:
+        return False
+    return hmac.compare_digest(value.encode("utf-8"), PROFILING_TOKEN.encode("utf-8"))
+
+
+async def profiling_middleware(request, call_next):
+    """
+    Profiles a single request sent with "X-Profile: <token>". "X-Profile-Mode: timing" records
+    stage spans only; the default also runs cProfile over the request's spans in worker threads
+    (asyncio.to_thread), never on the shared event loop thread. The stages go out in
+    Server-Timing and the profile is saved for the /admin/profiles endpoints (X-Profile-Id names it).
+    Streamed response bodies are produced after the headers, so their work is not included.
+    """
+    if not token_matches(request.headers.get("x-profile")):
+        return await call_next(request)
+
+    mode = request.headers.get("x-profile-mode", "cprofile").lower()
+    if mode not in PROFILING_MODES:
+        mode = "cprofile"
+    holds_slot = mode == "cprofile" and _cprofile_slot.acquire(blocking=False)
+    if mode == "cprofile" and not holds_slot:
+        mode = "timing"
+
+    profile = RequestProfile(mode)
+    token = _current_profile.set(profile)
+    try:
+        with _Span(profile, "app"):
+            response = await call_next(request)
+    finally:
+        _current_profile.reset(token)
+        if holds_slot:
+            _cprofile_slot.release()
+
+    stats = profile.stats()
+    stages = profile.stage_totals()
+    functions = _function_totals(stats)
+    summary = {
+        "id": profile.id,
+        "created": profile.created,
+        "method": request.method,
+        "path": request.url.path,
+        "query": request.url.query,
+        "status": response.status_code,
+        "mode": profile.mode,
+        "stages": {name: {"count": entry["count"], "ms": round(entry["ms"], 2)} for name, entry in stages.items()},
+        "functions": {name: round(ms, 2) for name, ms in functions.items()},
+    }
+    try:
+        await asyncio.to_thread(_save_profile, profile, summary, stats)
+    except OSError as e:
+        logger.error(f"Could not save request profile {profile.id}: {e}")
+    response.headers["Server-Timing"] = server_timing_header(stages, functions)
+    response.headers["X-Profile-Id"] = profile.id
+    # Lets browser devtools show the stages for cross-origin requests from the frontend
+    response.headers["Timing-Allow-Origin"] = "*"
+    return response
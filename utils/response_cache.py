@@ -0,0 +1,185 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; without it only gzip variants are produced
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Entries are also dropped after this many seconds, to pick up changes made directly in GraphDB
+RESPONSE_CACHE_MAX_AGE_SECONDS = float(os.getenv("RESPONSE_CACHE_MAX_AGE_SECONDS", 300))
+RESPONSE_CACHE_GZIP_LEVEL = int(os.getenv("RESPONSE_CACHE_GZIP_LEVEL", 6))
+RESPONSE_CACHE_BROTLI_QUALITY = int(os.getenv("RESPONSE_CACHE_BROTLI_QUALITY", 5))
+# Bodies smaller than this are sent as they are; compression would not pay for itself
+RESPONSE_CACHE_MIN_COMPRESS_BYTES = int(os.getenv("RESPONSE_CACHE_MIN_COMPRESS_BYTES", 1024))
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def _compress(body, encoding: str) -> bytes:
+    if encoding == "gzip":
+        # mtime=0 keeps the output identical across workers and rebuilds
+        return gzip.compress(body, compresslevel=RESPONSE_CACHE_GZIP_LEVEL, mtime=0)
+    return brotli.compress(bytes(body), quality=RESPONSE_CACHE_BROTLI_QUALITY)
+
+
+def choose_encoding(accept_encoding: Optional[str], available=ENCODINGS) -> Optional[str]:
+    """Best encoding the client accepts (q > 0), preferring the server order; None means identity."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    wildcard = accepted.get("*", 0.0)
+    candidates = [encoding for encoding in available if accepted.get(encoding, wildcard) > 0]
+    if not candidates:
+        return None
+    return max(candidates, key=lambda encoding: accepted.get(encoding, wildcard))
+
+
+class CachedBody:
+    """A response body (bytes, or a memoryview into a shared mapping) and its compressed variants."""
+
+    def __init__(self, body, media_type: str, revision: int, headers: Optional[Dict[str, str]] = None):
+        self.variants = {None: body}
+        self.media_type = media_type
+        self.revision = revision
+        self.headers = headers or {}
+        self.created = time.time()
+        self.etag = f'"{revision:x}-{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self.compressible = len(body) >= RESPONSE_CACHE_MIN_COMPRESS_BYTES
+        self._compressing: Dict[str, asyncio.Future] = {}
+
+    @property
+    def size(self) -> int:
+        return sum(len(variant) for variant in self.variants.values())
+
+
+class ResponseCache:
+    """
+    Encoded response bodies keyed by (endpoint, parameters, repository revision), with gzip and
+    brotli variants compressed once per revision on first demand. Bounded by the total size of
+    all stored variants; the least recently used entries are evicted first. A new revision
+    changes the key, so stale entries simply age out of the LRU order.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, CachedBody]" = OrderedDict()
+        self._building: Dict[tuple, asyncio.Future] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, key: tuple) -> Optional[CachedBody]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if RESPONSE_CACHE_MAX_AGE_SECONDS > 0 and time.time() - entry.created >= RESPONSE_CACHE_MAX_AGE_SECONDS:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.total_bytes -= entry.size
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+
+    def _store(self, key: tuple, entry: CachedBody):
+        self._remove(key)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self.total_bytes += entry.size
+        self._evict()
+
+    async def get_or_build(self, key: tuple, build: Callable[[], Awaitable[Tuple[bytes, str]]],
+                           revision: int, headers: Optional[Dict[str, str]] = None) -> CachedBody:
+        """Returns the cached entry, building it once even if many requests miss at the same time."""
+        entry = self._lookup(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        if key in self._building:
+            self.hits += 1
+            return await asyncio.shield(self._building[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._building[key] = future
+        try:
+            body, media_type = await build()
+            entry = CachedBody(body, media_type, revision, headers)
+            self._store(key, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the error; nobody else retrieves it, so mark it as retrieved
+            future.exception()
+            raise
+        finally:
+            del self._building[key]
+
+    async def variant(self, key: tuple, entry: CachedBody, encoding: Optional[str]):
+        """The body in the given encoding, compressing it in a worker thread the first time."""
+        if encoding is None or not entry.compressible:
+            return None, entry.variants[None]
+        if encoding in entry.variants:
+            return encoding, entry.variants[encoding]
+        if encoding not in entry._compressing:
+            entry._compressing[encoding] = asyncio.ensure_future(
+                asyncio.to_thread(_compress, entry.variants[None], encoding))
+        compressing = entry._compressing[encoding]
+        try:
+            compressed = await asyncio.shield(compressing)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Forget the failed attempt so the next request compresses again instead of re-raising it
+            if entry._compressing.get(encoding) is compressing:
+                del entry._compressing[encoding]
+            raise
+        if encoding not in entry.variants:
+            entry.variants[encoding] = compressed
+            entry._compressing.pop(encoding, None)
+            if self._entries.get(key) is entry:
+                self.total_bytes += len(compressed)
+                self._evict()
+        return encoding, compressed
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "bytes": self.total_bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "encodings": list(ENCODINGS)}
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
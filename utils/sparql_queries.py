@@ -1,50 +1,96 @@
-def get_taxonomy_hierarchy_query():
-    return """
+import re
+
+TREE_FIELDS = ("title", "labels", "definitions")
+
+LANG_TAG_PATTERN = re.compile(r"^[A-Za-z]{1,8}(-[A-Za-z0-9]{1,8})*$")
+
+# Characters RFC 3987 does not allow in an IRI; any of them could end the <...> term and inject SPARQL
+IRI_FORBIDDEN_PATTERN = re.compile(r'[<>"{}|^`\\\x00-\x20\s]')
+
+
+def iri_term(uri):
+    """<uri> for a URI supplied by a client. Raises ValueError if it could break out of the term."""
+    if not uri or IRI_FORBIDDEN_PATTERN.search(uri):
+        raise ValueError(f"Некоректний URI: {uri!r}")
+    return f"<{uri}>"
+
+
+def _lang_filter(variable, langs):
+    if not langs:
+        return ""
+    # Untagged literals are always kept as the last fallback
+    allowed = ", ".join(f'"{lang}"' for lang in list(langs) + [""])
+    return f"FILTER (LANG(?{variable}) IN ({allowed}))"
+
+
+def _literal_block(subject, predicate, variable, langs):
+    lang_filter = _lang_filter(variable, langs)
+    lang_filter_line = f"\n                  {lang_filter}" if lang_filter else ""
+    return f"""OPTIONAL {{
+                  ?{subject} {predicate} ?{variable} .{lang_filter_line}
+                  BIND(CONCAT(STR(?{variable}), "|", LANG(?{variable})) AS ?{variable}Concat)
+                }}"""
+
+
+def get_taxonomy_hierarchy_query(langs=None, fields=None, root_uri=None):
+    """
+    Class/subclass rows with labels and comments concatenated per row. langs restricts the literal
+    languages fetched from GraphDB, fields drops the labels and/or comments entirely, root_uri limits
+    the result to the subtree under that concept.
+    """
+    fields = TREE_FIELDS if fields is None else fields
+    with_labels = "labels" in fields
+    with_definitions = "definitions" in fields
+
+    projection = ["?class"]
+    class_blocks = []
+    subclass_blocks = []
+    if with_labels:
+        projection.append('(GROUP_CONCAT(DISTINCT ?classLabelConcat; SEPARATOR="||") AS ?classLabelsInfo)')
+        class_blocks.append(_literal_block("class", "rdfs:label", "classLabel", langs))
+        subclass_blocks.append(_literal_block("subClass", "rdfs:label", "subClassLabel", langs))
+    if with_definitions:
+        projection.append('(GROUP_CONCAT(DISTINCT ?classCommentConcat; SEPARATOR="||") AS ?classCommentsInfo)')
+        class_blocks.append(_literal_block("class", "rdfs:comment", "classComment", langs))
+        subclass_blocks.append(_literal_block("subClass", "rdfs:comment", "subClassComment", langs))
+    projection.append("?subClass")
+    if with_labels:
+        projection.append('(GROUP_CONCAT(DISTINCT ?subClassLabelConcat; SEPARATOR="||") AS ?subClassLabelsInfo)')
+    if with_definitions:
+        projection.append(
+            '(GROUP_CONCAT(DISTINCT ?subClassCommentConcat; SEPARATOR="||") AS ?subClassCommentsInfo)')
+
+    root_pattern = f"\n              ?class rdfs:subClassOf* {iri_term(root_uri)} ." if root_uri else ""
+    newline = "\n              "
+    nested_newline = "\n                "
+
+    return f"""
             SELECT
-              ?class
-              (GROUP_CONCAT(DISTINCT ?classLabelConcat; SEPARATOR="||") AS ?classLabelsInfo)
-              (GROUP_CONCAT(DISTINCT ?classCommentConcat; SEPARATOR="||") AS ?classCommentsInfo)
-              ?subClass
-              (GROUP_CONCAT(DISTINCT ?subClassLabelConcat; SEPARATOR="||") AS ?subClassLabelsInfo)
-              (GROUP_CONCAT(DISTINCT ?subClassCommentConcat; SEPARATOR="||") AS ?subClassCommentsInfo)
-            WHERE {
+              {newline.join(projection)}
+            WHERE {{
               ?class a rdfs:Class .
-              FILTER STRSTARTS(STR(?class), "http://example.org/taxonomy/") # Adjust namespace if needed
+              FILTER STRSTARTS(STR(?class), "http://example.org/taxonomy/") # Adjust namespace if needed{root_pattern}
 
               # --- Class Labels and Comments ---
-              OPTIONAL {
-                ?class rdfs:label ?classLabel .
-                BIND(CONCAT(STR(?classLabel), "|", LANG(?classLabel)) AS ?classLabelConcat)
-              }
-              OPTIONAL {
-                ?class rdfs:comment ?classComment .
-                BIND(CONCAT(STR(?classComment), "|", LANG(?classComment)) AS ?classCommentConcat)
-              }
+              {newline.join(class_blocks)}
 
               # --- SubClass Info (Optional) ---
-              OPTIONAL {
+              OPTIONAL {{
                 ?subClass rdfs:subClassOf ?class .
                 FILTER (?class != ?subClass)
                 FILTER STRSTARTS(STR(?subClass), "http://example.org/taxonomy/") # Adjust namespace
 
-                OPTIONAL {
-                  ?subClass rdfs:label ?subClassLabel .
-                  BIND(CONCAT(STR(?subClassLabel), "|", LANG(?subClassLabel)) AS ?subClassLabelConcat)
-                }
-                OPTIONAL {
-                  ?subClass rdfs:comment ?subClassComment .
-                  BIND(CONCAT(STR(?subClassComment), "|", LANG(?subClassComment)) AS ?subClassCommentConcat)
-                }
-              }
-
-              FILTER NOT EXISTS {
+                {nested_newline.join(subclass_blocks)}
+              }}
+
+              FILTER NOT EXISTS {{
                 ?intermediateClass rdfs:subClassOf ?class ;
                                    rdfs:subClassOf ?superClass .
                 ?subClass rdfs:subClassOf ?intermediateClass .
                 FILTER (?intermediateClass != ?class)
                 FILTER (?intermediateClass != ?subClass)
-              }
-            }
+              }}
+            }}
             GROUP BY ?class ?subClass # Group to allow GROUP_CONCAT
             ORDER BY ?class ?subClass
         """
@@ -67,6 +113,7 @@ def export_taxonomy_query():
         }
         WHERE {
           ?s ?p ?o .
+          FILTER (?s != <urn:x-taxonomy:repository>)
         }
     """
 
@@ -84,14 +131,16 @@ def add_top_concept_query(concept_uri):
 
 
 def add_subconcept_query(concept_uri, parent_uri):
+    concept = iri_term(concept_uri)
+    parent = iri_term(parent_uri)
     return f"""
         PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
         PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
         PREFIX ex: <http://example.org/taxonomy/>
 
         INSERT DATA {{
-          <{concept_uri}> rdf:type rdfs:Class .
-          <{concept_uri}> rdfs:subClassOf <{parent_uri}> .
+          {concept} rdf:type rdfs:Class .
+          {concept} rdfs:subClassOf {parent} .
         }}
     """
 
@@ -115,11 +164,20 @@ def delete_concept_query(concept_uri):
 
 
 def _escape_sparql_literal_value(value: str) -> str:
-    """Escapes double quotes and backslashes for SPARQL literals."""
+    """Escapes double quotes, backslashes and line breaks for SPARQL literals."""
     if value is None:
         return ""
     # Replace backslashes first, then double quotes
-    return value.replace('\\', '\\\\').replace('"', '\\"')
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def literal_term(value, lang=None):
+    """A SPARQL/N-Triples literal, language-tagged when lang is given."""
+    escaped_value = _escape_sparql_literal_value(value)
+    if lang and lang.strip():
+        return f'"{escaped_value}"@{lang}'
+    return f'"{escaped_value}"'
 
 
 def add_rdfs_label_query(concept_uri, label_value, label_lang):
@@ -177,3 +235,334 @@ def delete_rdfs_comment_query(concept_uri, comment_value, comment_lang):
           <{concept_uri}> rdfs:comment {literal_to_delete} .
         }}
     """
+
+
+# GraphDB pseudo-graph with explicit statements only, so inferred triples are neither copied nor diffed
+EXPLICIT_GRAPH_URI = "http://www.ontotext.com/explicit"
+TAXONOMY_NAMESPACE = "http://example.org/taxonomy/"
+
+
+def move_concept_operation(concept_uri, new_parent_uri):
+    """Replaces the concept's parents with new_parent_uri (or makes it a top concept when None)."""
+    concept = iri_term(concept_uri)
+    new_parent = iri_term(new_parent_uri) if new_parent_uri else None
+    delete_template = f"{concept} rdfs:subClassOf ?oldParent ."
+    insert_template = f"{concept} rdfs:subClassOf {new_parent} ." if new_parent else ""
+    where = f"""
+          {concept} a rdfs:Class .
+          OPTIONAL {{
+            {concept} rdfs:subClassOf ?oldParent .
+            FILTER (?oldParent != {concept})
+            FILTER STRSTARTS(STR(?oldParent), "{TAXONOMY_NAMESPACE}")
+          }}
+    """
+    return delete_template, insert_template, where
+
+
+def copy_subtree_operation(root_uri, target_parent_uri, suffix):
+    """
+    Copies the subtree under root_uri; every copied node gets the URI of the original plus suffix.
+    rdfs:subClassOf edges to concepts outside the subtree (the root's parents, and other parents
+    of polyhierarchy nodes) are not copied, so the copy hangs only under target_parent_uri.
+    """
+    root = iri_term(root_uri)
+    target_parent = iri_term(target_parent_uri) if target_parent_uri else None
+    delete_template = ""
+    insert_template = "?newNode ?p ?newObject ."
+    if target_parent:
+        insert_template += f"\n          ?newRoot rdfs:subClassOf {target_parent} ."
+    where = f"""
+          {{
+            ?node rdfs:subClassOf* {root} .
+            ?node ?p ?o .
+            OPTIONAL {{
+              ?o rdfs:subClassOf* {root} .
+              BIND(true AS ?objectInSubtree)
+            }}
+            FILTER (?p != rdfs:subClassOf || (BOUND(?objectInSubtree) && ?node != {root}))
+            BIND(IRI(CONCAT(STR(?node), "{suffix}")) AS ?newNode)
+            BIND(IF(BOUND(?objectInSubtree), IRI(CONCAT(STR(?o), "{suffix}")), ?o) AS ?newObject)
+          }}
+          UNION
+          {{
+            BIND(IRI(CONCAT(STR({root}), "{suffix}")) AS ?newRoot)
+          }}
+    """
+    return delete_template, insert_template, where
+
+
+def copy_collisions_query(root_uri, suffix, limit=10):
+    """URIs the copy of the subtree under root_uri would mint that are already used in the repository."""
+    root = iri_term(root_uri)
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        SELECT DISTINCT ?newNode
+        FROM <{EXPLICIT_GRAPH_URI}>
+        WHERE {{
+          ?node rdfs:subClassOf* {root} .
+          BIND(IRI(CONCAT(STR(?node), "{suffix}")) AS ?newNode)
+          {{ ?newNode ?p ?o . }} UNION {{ ?s ?q ?newNode . }}
+        }}
+        ORDER BY ?newNode
+        LIMIT {int(limit)}
+    """
+
+
+def merge_concepts_operation(source_uri, target_uri):
+    """
+    Merges source into target: every incoming edge of source (including rdfs:subClassOf of its
+    children) is redirected to target, source's parents become parents of target as well,
+    labels and comments are unioned, source is removed.
+    """
+    source = iri_term(source_uri)
+    target = iri_term(target_uri)
+    delete_template = f"""?s ?q {source} .
+          {source} ?p ?o ."""
+    insert_template = f"""?referrer ?referrerPredicate {target} .
+          {target} ?literalPredicate ?literal .
+          {target} rdfs:subClassOf ?sourceParent ."""
+    where = f"""
+          {{ ?s ?q {source} . }}
+          UNION
+          {{ {source} ?p ?o . }}
+          UNION
+          {{
+            ?referrer ?referrerPredicate {source} .
+            FILTER (?referrer != {source} && ?referrer != {target})
+          }}
+          UNION
+          {{
+            {source} ?literalPredicate ?literal .
+            FILTER (?literalPredicate IN (rdfs:label, rdfs:comment))
+          }}
+          UNION
+          {{
+            {source} rdfs:subClassOf ?sourceParent .
+            FILTER (?sourceParent != {source} && ?sourceParent != {target})
+            FILTER STRSTARTS(STR(?sourceParent), "{TAXONOMY_NAMESPACE}")
+          }}
+    """
+    return delete_template, insert_template, where
+
+
+def update_from_operation(operation):
+    delete_template, insert_template, where = operation
+    delete_clause = f"DELETE {{\n          {delete_template}\n        }}" if delete_template else ""
+    insert_clause = f"INSERT {{\n          {insert_template}\n        }}" if insert_template else ""
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        {delete_clause}
+        {insert_clause}
+        USING <{EXPLICIT_GRAPH_URI}>
+        WHERE {{{where}}}
+    """
+
+
+def construct_from_operation(operation, part):
+    """CONSTRUCT query returning the triples the operation would delete (part='delete') or insert."""
+    delete_template, insert_template, where = operation
+    template = delete_template if part == "delete" else insert_template
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        CONSTRUCT {{
+          {template}
+        }}
+        FROM <{EXPLICIT_GRAPH_URI}>
+        WHERE {{{where}}}
+    """
+
+
+def concept_exists_query(concept_uri):
+    concept = iri_term(concept_uri)
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        ASK {{ {concept} a rdfs:Class . }}
+    """
+
+
+def is_same_or_descendant_query(ancestor_uri, candidate_uri):
+    ancestor = iri_term(ancestor_uri)
+    candidate = iri_term(candidate_uri)
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        ASK
+        FROM <{EXPLICIT_GRAPH_URI}>
+        {{ {candidate} rdfs:subClassOf* {ancestor} . }}
+    """
+
+
+def merge_creates_cycle_query(source_uri, target_uri):
+    """
+    True if the merged graph would have a cycle: target lies below source through another concept,
+    or one of source's parents (which target inherits) lies below target.
+    """
+    source = iri_term(source_uri)
+    target = iri_term(target_uri)
+    return f"""
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        ASK
+        FROM <{EXPLICIT_GRAPH_URI}>
+        {{
+          {{
+            {target} rdfs:subClassOf+ ?middle .
+            ?middle rdfs:subClassOf+ {source} .
+            FILTER (?middle != {source} && ?middle != {target})
+          }}
+          UNION
+          {{
+            {source} rdfs:subClassOf ?sourceParent .
+            ?sourceParent rdfs:subClassOf+ {target} .
+            FILTER (?sourceParent != {source} && ?sourceParent != {target})
+          }}
+        }}
+    """
+
+
+def _stream_literal_projection(fields, langs):
+    projection = []
+    blocks = []
+    if "labels" in fields:
+        projection.append('(GROUP_CONCAT(DISTINCT ?classLabelConcat; SEPARATOR="||") AS ?labelsInfo)')
+        blocks.append(_literal_block("class", "rdfs:label", "classLabel", langs))
+    if "definitions" in fields:
+        projection.append('(GROUP_CONCAT(DISTINCT ?classCommentConcat; SEPARATOR="||") AS ?commentsInfo)')
+        blocks.append(_literal_block("class", "rdfs:comment", "classComment", langs))
+    return " ".join(projection), "\n              ".join(blocks)
+
+
+def get_root_concepts_query(langs=None, fields=None):
+    """Concepts without a parent in the taxonomy namespace, one row per concept."""
+    fields = TREE_FIELDS if fields is None else fields
+    projection, blocks = _stream_literal_projection(fields, langs)
+    return f"""
+            SELECT ?class {projection}
+            WHERE {{
+              ?class a rdfs:Class .
+              FILTER STRSTARTS(STR(?class), "{TAXONOMY_NAMESPACE}")
+              FILTER NOT EXISTS {{
+                ?class rdfs:subClassOf ?parent .
+                FILTER (?parent != ?class)
+                FILTER STRSTARTS(STR(?parent), "{TAXONOMY_NAMESPACE}")
+              }}
+              {blocks}
+            }}
+            GROUP BY ?class
+            ORDER BY ?class
+        """
+
+
+def get_children_query(parent_uris, langs=None, fields=None):
+    """Direct subclasses of a batch of parents, one row per (parent, child) edge."""
+    fields = TREE_FIELDS if fields is None else fields
+    projection, blocks = _stream_literal_projection(fields, langs)
+    values = " ".join(f"<{uri}>" for uri in parent_uris)
+    return f"""
+            SELECT ?parent ?class {projection}
+            WHERE {{
+              VALUES ?parent {{ {values} }}
+              ?class rdfs:subClassOf ?parent ;
+                     a rdfs:Class .
+              FILTER (?class != ?parent)
+              FILTER STRSTARTS(STR(?class), "{TAXONOMY_NAMESPACE}")
+              FILTER NOT EXISTS {{
+                ?class rdfs:subClassOf ?intermediateClass .
+                ?intermediateClass rdfs:subClassOf ?parent .
+                FILTER (?intermediateClass != ?class)
+                FILTER (?intermediateClass != ?parent)
+              }}
+              {blocks}
+            }}
+            GROUP BY ?parent ?class
+            ORDER BY ?parent ?class
+        """
+
+
+def taxonomy_structure_query():
+    """Every concept with its explicit direct parents (one row per edge, parent unbound for parentless concepts)."""
+    return f"""
+            SELECT ?class ?parent
+            FROM <{EXPLICIT_GRAPH_URI}>
+            WHERE {{
+              ?class a rdfs:Class .
+              FILTER STRSTARTS(STR(?class), "{TAXONOMY_NAMESPACE}")
+              OPTIONAL {{
+                ?class rdfs:subClassOf ?parent .
+                FILTER (?parent != ?class)
+                FILTER STRSTARTS(STR(?parent), "{TAXONOMY_NAMESPACE}")
+              }}
+            }}
+        """
+
+
+def taxonomy_literals_query():
+    """Labels and definitions of all concepts, with the language tag projected separately."""
+    return f"""
+            SELECT ?class ?kind ?value ?lang
+            FROM <{EXPLICIT_GRAPH_URI}>
+            WHERE {{
+              ?class a rdfs:Class .
+              FILTER STRSTARTS(STR(?class), "{TAXONOMY_NAMESPACE}")
+              {{ ?class rdfs:label ?literal . BIND("label" AS ?kind) }}
+              UNION
+              {{ ?class rdfs:comment ?literal . BIND("definition" AS ?kind) }}
+              BIND(STR(?literal) AS ?value)
+              BIND(LANG(?literal) AS ?lang)
+            }}
+        """
+
+
+def get_concept_parents_query(concept_uri, langs=None):
+    """Direct parents of a concept (every rdfs:subClassOf edge, not just the one shown in the tree)."""
+    concept = iri_term(concept_uri)
+    return f"""
+            SELECT ?parent (GROUP_CONCAT(DISTINCT ?parentLabelConcat; SEPARATOR="||") AS ?labelsInfo)
+            FROM <{EXPLICIT_GRAPH_URI}>
+            WHERE {{
+              {concept} rdfs:subClassOf ?parent .
+              FILTER (?parent != {concept})
+              FILTER STRSTARTS(STR(?parent), "{TAXONOMY_NAMESPACE}")
+              {_literal_block("parent", "rdfs:label", "parentLabel", langs)}
+            }}
+            GROUP BY ?parent
+            ORDER BY ?parent
+        """
+
+
+REVISION_GRAPH_URI = "urn:x-taxonomy:meta"
+REVISION_SUBJECT_URI = "urn:x-taxonomy:repository"
+REVISION_PREDICATE_URI = "urn:x-taxonomy:revision"
+
+
+def set_revision_marker_query(revision: int):
+    """Raises the stored write revision to `revision`; never lowers it when workers race."""
+    return f"""
+        DELETE {{ GRAPH <{REVISION_GRAPH_URI}> {{ <{REVISION_SUBJECT_URI}> <{REVISION_PREDICATE_URI}> ?old }} }}
+        INSERT {{ GRAPH <{REVISION_GRAPH_URI}> {{ <{REVISION_SUBJECT_URI}> <{REVISION_PREDICATE_URI}> {int(revision)} }} }}
+        WHERE {{
+          OPTIONAL {{ GRAPH <{REVISION_GRAPH_URI}> {{ <{REVISION_SUBJECT_URI}> <{REVISION_PREDICATE_URI}> ?old }} }}
+          FILTER (!BOUND(?old) || ?old < {int(revision)})
+        }}
+    """
+
+
+def revision_marker_query():
+    return f"""
+        SELECT ?revision
+        WHERE {{ GRAPH <{REVISION_GRAPH_URI}> {{ <{REVISION_SUBJECT_URI}> <{REVISION_PREDICATE_URI}> ?revision }} }}
+    """
+
+
+def concept_uris_in_namespace_query():
+    return f"""
+        SELECT DISTINCT ?concept
+        WHERE {{
+          ?concept ?p ?o .
+          FILTER STRSTARTS(STR(?concept), "{TAXONOMY_NAMESPACE}")
+        }}
+    """
+
+
+def insert_data_query(triples):
+    """One INSERT DATA update for pre-rendered triples (full IRIs)."""
+    body = "\n".join(triples)
+    return f"INSERT DATA {{\n{body}\n}}"
@@ -0,0 +1,300 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+from typing import Callable, Dict, Optional, Set
+
+from utils.change_events import change_broker, RESYNC_EVENT
+from utils.graphdb_routing import reading_at_revision
+from utils.sparql_queries import taxonomy_structure_query, taxonomy_literals_query
+from utils.tree_snapshot import tree_snapshot
+from utils.tree_stream import iter_sparql_rows
+
+logger = logging.getLogger(__name__)
+
+# Recompute from GraphDB after this many seconds even without local writes (changes made directly in GraphDB)
+TAXONOMY_STATS_MAX_AGE_SECONDS = float(os.getenv("TAXONOMY_STATS_MAX_AGE_SECONDS", 300))
+
+# Events whose effect on depths cannot be derived from the event alone
+RECOMPUTE_EVENTS = {"taxonomy_imported", "concept_moved", "subtree_copied", "concepts_merged", RESYNC_EVENT}
+LITERAL_KINDS = {"label": "labels", "definition": "definitions"}
+
+
+class StatsState:
+    """
+    Concept table plus the aggregate counters derived from it. Every mutation adjusts the
+    counters for the concepts it touches, so reading the aggregates never walks the table.
+    """
+
+    def __init__(self):
+        self.parents: Dict[str, Set[str]] = {}
+        self.children: Dict[str, Set[str]] = {}
+        self.depth: Dict[str, Optional[int]] = {}
+        self.literals = {"labels": {}, "definitions": {}}
+        self.kinds = Counter()
+        self.depths = Counter()
+        self.fan_out = Counter()
+        self.coverage = {"labels": Counter(), "definitions": Counter()}
+        self.without_labels = 0
+
+    @classmethod
+    def from_rows(cls, structure_rows, literal_rows) -> "StatsState":
+        """Builds the state in one pass over the structure rows plus a breadth-first depth walk."""
+        state = cls()
+        for row in structure_rows:
+            concept = row["class"]
+            state.parents.setdefault(concept, set())
+            if row.get("parent"):
+                state.parents[concept].add(row["parent"])
+                state.children.setdefault(row["parent"], set()).add(concept)
+
+        queue = deque()
+        for concept, parents in state.parents.items():
+            state.depth[concept] = None
+            if not any(parent in state.parents for parent in parents):
+                state.depth[concept] = 0
+                queue.append(concept)
+        while queue:
+            concept = queue.popleft()
+            for child in state.children.get(concept, ()):
+                if state.depth[child] is None:
+                    state.depth[child] = state.depth[concept] + 1
+                    queue.append(child)
+
+        for concept in state.parents:
+            state.kinds[state.kind(concept)] += 1
+            state.depths[state.depth[concept]] += 1
+            state.fan_out[len(state.children.get(concept, ()))] += 1
+        state.without_labels = len(state.parents)
+
+        for row in literal_rows:
+            state.add_literal(LITERAL_KINDS[row["kind"]], row["class"], row["value"], row.get("lang") or "")
+        return state
+
+    def kind(self, concept: str) -> str:
+        parents = self.parents[concept]
+        if not parents:
+            return "roots"
+        if not any(parent in self.parents for parent in parents):
+            return "orphans"
+        return "children"
+
+    def _set_fan_out(self, concept: str, delta: int):
+        count = len(self.children.get(concept, ()))
+        self.fan_out[count - delta] -= 1
+        self.fan_out[count] += 1
+
+    def add_concept(self, concept: str, parent: Optional[str]) -> bool:
+        """Adds a new leaf concept. Returns False if the change needs a full recompute."""
+        if concept in self.parents or self.children.get(concept):
+            return False
+        self.parents[concept] = {parent} if parent else set()
+        if parent in self.parents:
+            parent_depth = self.depth[parent]
+            self.depth[concept] = None if parent_depth is None else parent_depth + 1
+        else:
+            self.depth[concept] = 0
+        if parent:
+            self.children.setdefault(parent, set()).add(concept)
+            if parent in self.parents:
+                self._set_fan_out(parent, 1)
+        self.kinds[self.kind(concept)] += 1
+        self.depths[self.depth[concept]] += 1
+        self.fan_out[0] += 1
+        self.without_labels += 1
+        return True
+
+    def delete_concept(self, concept: str):
+        """Removes the concept with all its descendants, like delete_concept_query does."""
+        if concept not in self.parents:
+            return
+        subtree = {concept}
+        queue = deque([concept])
+        while queue:
+            for child in self.children.get(queue.popleft(), ()):
+                if child not in subtree:
+                    subtree.add(child)
+                    queue.append(child)
+
+        for node in subtree:
+            self.kinds[self.kind(node)] -= 1
+            self.depths[self.depth.pop(node)] -= 1
+            self.fan_out[len(self.children.get(node, ()))] -= 1
+            if node not in self.literals["labels"]:
+                self.without_labels -= 1
+            for field in self.literals:
+                for lang in self.literals[field].pop(node, {}):
+                    self.coverage[field][lang] -= 1
+        for node in subtree:
+            for parent in self.parents[node]:
+                if parent not in subtree and node in self.children.get(parent, ()):
+                    self.children[parent].discard(node)
+                    if parent in self.parents:
+                        self._set_fan_out(parent, -1)
+        for node in subtree:
+            del self.parents[node]
+            self.children.pop(node, None)
+        _drop_zero_counts(self.kinds, self.depths, self.fan_out, *self.coverage.values())
+
+    def add_literal(self, field: str, concept: str, value: str, lang: str):
+        if concept not in self.parents:
+            return
+        by_lang = self.literals[field].setdefault(concept, {})
+        if field == "labels" and not by_lang:
+            self.without_labels -= 1
+        if lang not in by_lang:
+            by_lang[lang] = set()
+            self.coverage[field][lang] += 1
+        by_lang[lang].add(value)
+
+    def delete_literal(self, field: str, concept: str, value: str, lang: str):
+        by_lang = self.literals[field].get(concept)
+        if not by_lang or value not in by_lang.get(lang, ()):
+            return
+        by_lang[lang].discard(value)
+        if not by_lang[lang]:
+            del by_lang[lang]
+            self.coverage[field][lang] -= 1
+            _drop_zero_counts(self.coverage[field])
+        if not by_lang:
+            del self.literals[field][concept]
+            if field == "labels":
+                self.without_labels += 1
+
+    def summary(self) -> dict:
+        concepts = len(self.parents)
+        reachable = {depth: count for depth, count in self.depths.items() if depth is not None}
+        edges = sum(size * count for size, count in self.fan_out.items())
+
+        def coverage(field):
+            return {lang or "none": {"concepts": count, "ratio": round(count / concepts, 4) if concepts else 0.0}
+                    for lang, count in sorted(self.coverage[field].items())}
+
+        return {
+            "concepts": concepts,
+            "roots": self.kinds["roots"],
+            "orphans": self.kinds["orphans"],
+            # Concepts that only sit on rdfs:subClassOf cycles and cannot be reached from any root
+            "unreachable": self.depths.get(None, 0),
+            "depth": {
+                "max": max(reachable, default=0),
+                "mean": round(sum(d * c for d, c in reachable.items()) / max(sum(reachable.values()), 1), 3),
+                "histogram": {str(depth): reachable[depth] for depth in sorted(reachable)},
+            },
+            "fan_out": {
+                "max": max((size for size, count in self.fan_out.items() if count), default=0),
+                "mean": round(edges / concepts, 3) if concepts else 0.0,
+                "leaves": self.fan_out.get(0, 0),
+                "histogram": {str(size): self.fan_out[size] for size in sorted(self.fan_out)},
+            },
+            "without_labels": self.without_labels,
+            "label_coverage": coverage("labels"),
+            "definition_coverage": coverage("definitions"),
+        }
+
+
+def _drop_zero_counts(*counters: Counter):
+    for counter in counters:
+        for key in [key for key, count in counter.items() if count <= 0]:
+            del counter[key]
+
+
+def _load_state() -> StatsState:
+    return StatsState.from_rows(iter_sparql_rows(taxonomy_structure_query()),
+                                iter_sparql_rows(taxonomy_literals_query()))
+
+
+class TaxonomyStats:
+    """
+    Taxonomy statistics kept up to date from change events. Simple edits (new leaf concepts,
+    deletions, labels, definitions) adjust the counters in place; imports and structural
+    operations mark the stats stale and the next read recomputes them in one pass.
+    Events published by other workers arrive through the shared change log like local ones.
+    """
+
+    def __init__(self, load_state: Callable[[], StatsState], required_revision: Callable[[], int]):
+        self._load_state = load_state
+        self._required_revision = required_revision
+        self._state: Optional[StatsState] = None
+        self._summary: Optional[dict] = None
+        self._stale = True
+        self._rebuilding = False
+        self._changed_during_rebuild = False
+        self.revision = 0
+        self.computed_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def on_change(self, event: dict):
+        self.revision = max(self.revision, event["rev"])
+        self._summary = None
+        if self._rebuilding:
+            self._changed_during_rebuild = True
+        if self._state is None or self._stale:
+            return
+        if not self._apply(event):
+            self._stale = True
+
+    def _apply(self, event: dict) -> bool:
+        event_type = event["type"]
+        state = self._state
+        if event_type in RECOMPUTE_EVENTS:
+            return False
+        if event_type == "repository_cleared":
+            self._state = StatsState()
+            return True
+        if event_type == "concept_added":
+            return state.add_concept(event["concept"], event.get("parent"))
+        if event_type == "concept_deleted":
+            state.delete_concept(event["concept"])
+            return True
+
+        kind, _, action = event_type.partition("_")
+        field = LITERAL_KINDS.get(kind)
+        if field is None:
+            logger.warning(f"Taxonomy stats: unknown change event {event_type}, recomputing.")
+            return False
+        if action in ("deleted", "updated"):
+            old = event["old"] if action == "updated" else event["literal"]
+            state.delete_literal(field, event["concept"], old["value"], old.get("lang") or "")
+        if action in ("added", "updated"):
+            new = event["new"] if action == "updated" else event["literal"]
+            state.add_literal(field, event["concept"], new["value"], new.get("lang") or "")
+        return True
+
+    def _is_fresh(self) -> bool:
+        if self._state is None or self._stale or self._required_revision() > self.revision:
+            return False
+        return TAXONOMY_STATS_MAX_AGE_SECONDS <= 0 or time.time() - self.computed_at < TAXONOMY_STATS_MAX_AGE_SECONDS
+
+    async def get(self) -> dict:
+        if not self._is_fresh():
+            async with self._lock:
+                if not self._is_fresh():
+                    await self._recompute()
+        if self._summary is None:
+            self._summary = self._state.summary()
+        return {"revision": self.revision, "computed_at": self.computed_at, **self._summary}
+
+    async def _recompute(self):
+        required = self._required_revision()
+        self._rebuilding = True
+        self._changed_during_rebuild = False
+        started = time.perf_counter()
+        try:
+            with reading_at_revision(required):
+                state = await asyncio.to_thread(self._load_state)
+        finally:
+            self._rebuilding = False
+        self._state = state
+        self._summary = None
+        self.computed_at = time.time()
+        self.revision = max(self.revision, required)
+        # A write that landed mid-load may or may not be in the result; serve it, recompute next time
+        self._stale = self._changed_during_rebuild
+        logger.info(f"Taxonomy stats recomputed in {time.perf_counter() - started:.2f}s "
+                    f"({len(state.parents)} concepts)")
+
+
+taxonomy_stats = TaxonomyStats(_load_state, tree_snapshot.required_revision)
+change_broker.add_listener(taxonomy_stats.on_change)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Callable, Optional
+
+from utils.change_events import change_broker, _exclusive
+from utils.graphdb_routing import reading_at_revision
+from utils.graphdb_utils import GRAPHDB_REPOSITORY, get_taxonomy_hierarchy, build_hierarchy_tree
+
+logger = logging.getLogger(__name__)
+
+TREE_SNAPSHOT_DIR = os.getenv("TREE_SNAPSHOT_DIR",
+                              os.path.join(tempfile.gettempdir(), "taxonomy-snapshots", GRAPHDB_REPOSITORY))
+# Rebuild even without a local write after this many seconds, to pick up changes made directly in GraphDB
+TREE_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("TREE_SNAPSHOT_MAX_AGE_SECONDS", 300))
+
+SNAPSHOT_MAGIC = b"TXSN"
+SNAPSHOT_VERSION = 1
+# magic, format version, revision, build time (unix seconds), payload length
+SNAPSHOT_HEADER = struct.Struct("<4sHQdQ")
+
+
+class MappedSnapshot:
+    """A snapshot file mapped read-only. The payload is the UTF-8 JSON tree, served without copying."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, revision, built_at, length = SNAPSHOT_HEADER.unpack_from(self._mmap, 0)
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Непідтримуваний формат знімка дерева: {path}")
+        self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.revision = revision
+        self.built_at = built_at
+        self.payload = memoryview(self._mmap)[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + length]
+
+
+class TreeSnapshot:
+    """
+    Host-wide snapshot of the built taxonomy tree. Every worker maps the same file, so the pages
+    are shared and a restarted worker is warm immediately. The snapshot records the change
+    revision it was built at; the next read in any worker after a write anywhere sees the
+    shared revision is newer, rebuilds it and publishes it with an atomic rename. Only one worker
+    builds at a time; the others wait for it and map its result.
+    """
+
+    def __init__(self, directory: str, build_tree: Callable[[], list], current_revision: Callable[[], int]):
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "tree.snap")
+        self.lock_path = os.path.join(directory, "tree.lock")
+        self._build_tree = build_tree
+        self._current_revision = current_revision
+        self._current: Optional[MappedSnapshot] = None
+        self._lock = asyncio.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def required_revision(self) -> int:
+        return self._current_revision()
+
+    def _is_fresh(self, snapshot: Optional[MappedSnapshot], required: int) -> bool:
+        if snapshot is None or snapshot.revision < required:
+            return False
+        return TREE_SNAPSHOT_MAX_AGE_SECONDS <= 0 or time.time() - snapshot.built_at < TREE_SNAPSHOT_MAX_AGE_SECONDS
+
+    def _map_from_disk(self) -> Optional[MappedSnapshot]:
+        try:
+            stat = os.stat(self.snapshot_path)
+        except OSError:
+            return None
+        if self._current is not None and self._current.identity == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return self._current
+        try:
+            return MappedSnapshot(self.snapshot_path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"Cannot map tree snapshot {self.snapshot_path}: {e}")
+            return None
+
+    async def get(self) -> MappedSnapshot:
+        required = self.required_revision()
+        if self._is_fresh(self._current, required):
+            return self._current
+
+        async with self._lock:
+            required = self.required_revision()
+            snapshot = self._map_from_disk()
+            if not self._is_fresh(snapshot, required):
+                # Labelled with required, so a replica that has not reached it must not answer
+                with reading_at_revision(required):
+                    snapshot = await asyncio.to_thread(self._rebuild, required)
+            # Previous mappings are released once responses still sending from them are done
+            self._current = snapshot
+            return snapshot
+
+    def _rebuild(self, required: int) -> MappedSnapshot:
+        # The asyncio lock only covers this worker; the file lock makes the other workers wait
+        # for the one that is building and then map its snapshot instead of querying GraphDB too
+        with _exclusive(self.lock_path):
+            snapshot = self._map_from_disk()
+            if self._is_fresh(snapshot, required):
+                return snapshot
+            self.publish(self._build_tree(), required)
+            snapshot = self._map_from_disk()
+        if snapshot is None:
+            raise RuntimeError("Не вдалося опублікувати знімок дерева таксономії")
+        return snapshot
+
+    def publish(self, tree: list, revision: int):
+        payload = json.dumps(tree, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, revision, time.time(), len(payload))
+        self._atomic_write(self.snapshot_path, header + payload)
+        logger.info(f"Published tree snapshot revision {revision} ({len(payload)} bytes)")
+
+    def _atomic_write(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+
+def _build_full_tree() -> list:
+    bindings = get_taxonomy_hierarchy()
+    if not bindings:
+        return []
+    return build_hierarchy_tree(bindings)
+
+
+tree_snapshot = TreeSnapshot(TREE_SNAPSHOT_DIR, _build_full_tree, lambda: change_broker.revision)
@@ -0,0 +1,132 @@
+import csv
+import io
+import json
+import logging
+import os
+from typing import Iterator, List, Optional
+
+import requests
+from fastapi import HTTPException
+
+from utils.graphdb_utils import read_router, parse_concat_results, select_languages, get_uri_display_name
+from utils.request_profiling import span
+from utils.sparql_queries import get_root_concepts_query, get_children_query
+
+logger = logging.getLogger(__name__)
+
+# Parents per children query; bounds both the VALUES clause and the DFS prefetch
+TREE_STREAM_BATCH_SIZE = int(os.getenv("TREE_STREAM_BATCH_SIZE", 200))
+
+
+def iter_sparql_rows(query: str) -> Iterator[dict]:
+    """Streams SELECT results row by row (SPARQL CSV results) instead of loading the whole JSON document."""
+    def post(endpoint):
+        with span("sparql"):
+            response = requests.post(endpoint, data={"query": query}, headers={"Accept": "text/csv"}, stream=True)
+            response.raise_for_status()
+        return response
+
+    try:
+        response = read_router.call(post)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Streaming query failed: {e}\nQuery used:\n{query}")
+        raise HTTPException(status_code=500, detail=f"Ошибка при запросе к GraphDB: {e}")
+
+    with response:
+        response.raw.decode_content = True
+        # TextIOWrapper reads past the end once more; an auto-closed body would raise there
+        response.raw.auto_close = False
+        yield from csv.DictReader(io.TextIOWrapper(response.raw, encoding="utf-8", newline=""))
+
+
+def _make_record(row: dict, parent: Optional[str], depth: int, langs, fields) -> dict:
+    key = row["class"]
+    record = {"key": key, "parent": parent, "depth": depth}
+    if fields is None or "title" in fields:
+        record["title"] = get_uri_display_name(key)
+    if fields is None or "labels" in fields:
+        record["labels"] = select_languages(parse_concat_results(row.get("labelsInfo")), langs)
+    if fields is None or "definitions" in fields:
+        record["definitions"] = select_languages(parse_concat_results(row.get("commentsInfo")), langs)
+    return record
+
+
+def _iter_children(parent_uris: List[str], langs, fields) -> Iterator[dict]:
+    for start in range(0, len(parent_uris), TREE_STREAM_BATCH_SIZE):
+        batch = parent_uris[start:start + TREE_STREAM_BATCH_SIZE]
+        yield from iter_sparql_rows(get_children_query(batch, langs=langs, fields=fields))
+
+
+def _make_reference(row: dict, parent: str, depth: int) -> dict:
+    """A concept already streamed under another parent (polyhierarchy or cycle); not expanded again."""
+    return {"key": row["class"], "parent": parent, "depth": depth, "ref": True}
+
+
+def iter_tree_bfs(langs=None, fields=None) -> Iterator[dict]:
+    """
+    Level by level; keeps the keys of the current level plus the set of keys already streamed.
+    Concepts already streamed come back as references and are not expanded, so cycles end.
+    """
+    frontier = []
+    seen = set()
+    for row in iter_sparql_rows(get_root_concepts_query(langs=langs, fields=fields)):
+        frontier.append(row["class"])
+        seen.add(row["class"])
+        yield _make_record(row, None, 0, langs, fields)
+
+    depth = 1
+    while frontier:
+        next_frontier = []
+        for row in _iter_children(frontier, langs, fields):
+            if row["class"] in seen:
+                yield _make_reference(row, row["parent"], depth)
+                continue
+            seen.add(row["class"])
+            next_frontier.append(row["class"])
+            yield _make_record(row, row["parent"], depth, langs, fields)
+        frontier = next_frontier
+        depth += 1
+
+
+def iter_tree_dfs(langs=None, fields=None) -> Iterator[dict]:
+    """
+    Pre-order depth-first. Children are fetched for a batch of pending stack entries at once,
+    so the stack is bounded by depth x fan-out; the set of streamed keys grows with the taxonomy.
+    A concept with several parents is streamed in full once and as a reference under the others,
+    which also ends subclass cycles.
+    """
+    # Stack entries: (row, parent key, depth)
+    stack = [(row, None, 0)
+             for row in reversed(list(iter_sparql_rows(get_root_concepts_query(langs=langs, fields=fields))))]
+    children_by_parent = {}
+    seen = set()
+
+    while stack:
+        row, parent, depth = stack.pop()
+        key = row["class"]
+        if key in seen:
+            # Not expanded, so children prefetched for this entry are not needed
+            children_by_parent.pop(key, None)
+            yield _make_reference(row, parent, depth)
+            continue
+        seen.add(key)
+        yield _make_record(row, parent, depth, langs, fields)
+
+        if key not in children_by_parent:
+            lookahead = stack[max(0, len(stack) - TREE_STREAM_BATCH_SIZE + 1):]
+            pending = list(dict.fromkeys([key] + [entry[0]["class"] for entry in reversed(lookahead)
+                                                  if entry[0]["class"] not in children_by_parent
+                                                  and entry[0]["class"] not in seen]))
+            for pending_key in pending:
+                children_by_parent[pending_key] = []
+            for child_row in _iter_children(pending, langs, fields):
+                children_by_parent[child_row["parent"]].append(child_row)
+
+        for child_row in reversed(children_by_parent.pop(key)):
+            stack.append((child_row, key, depth + 1))
+
+
+def iter_tree_ndjson(order: str = "dfs", langs=None, fields=None) -> Iterator[bytes]:
+    records = iter_tree_bfs(langs, fields) if order == "bfs" else iter_tree_dfs(langs, fields)
+    for record in records:
+        yield (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")